@@ -11,7 +11,9 @@ from alembic import context
 from app.core.config import settings
 from app.core.database import Base
 # Importa os modelos para que o Alembic os reconheça (mesmo que não uses aqui)
-from app.models.url import URL  
+from app.models.url import URL, URLHash
+from app.models.id_counter import IdCounter
+from app.models.click_rollup import ClickRollup
 
 config = context.config
 
@@ -0,0 +1,34 @@
+"""Contador de blocos de IDs (id_counters)
+
+Revision ID: 5c2e8f1d9a41
+Revises: 1a55b31ccc79
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8f1d9a41'
+down_revision: Union[str, None] = '1a55b31ccc79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A tabela pode já existir (create_all no startup de dev)
+    if sa.inspect(op.get_bind()).has_table('id_counters'):
+        return
+    op.create_table(
+        'id_counters',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('id_counters')
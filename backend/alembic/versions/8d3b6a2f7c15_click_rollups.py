@@ -0,0 +1,48 @@
+"""Rollups de cliques por tempo (url_click_rollups, particionada por hash)
+
+Revision ID: 8d3b6a2f7c15
+Revises: 5c2e8f1d9a41
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3b6a2f7c15'
+down_revision: Union[str, None] = '5c2e8f1d9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS = 16
+
+
+def upgrade() -> None:
+    # A tabela pode já existir (create_all no startup de dev)
+    if sa.inspect(op.get_bind()).has_table('url_click_rollups'):
+        return
+    op.create_table(
+        'url_click_rollups',
+        sa.Column('short_key', sa.String(length=16), nullable=False),
+        sa.Column('granularity', sa.String(length=1), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('short_key', 'granularity', 'bucket_start', 'dimension', 'value'),
+        postgresql_partition_by='HASH (short_key)',
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        for remainder in range(PARTITIONS):
+            op.execute(
+                f"CREATE TABLE url_click_rollups_p{remainder} PARTITION OF url_click_rollups "
+                f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+            )
+
+
+def downgrade() -> None:
+    # As partições caem junto com a tabela pai
+    op.drop_table('url_click_rollups')
@@ -0,0 +1,40 @@
+"""Índice em urls.clicks (ranking do warm-up)
+
+Revision ID: b7e4c9a0d2f3
+Revises: 8d3b6a2f7c15
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4c9a0d2f3'
+down_revision: Union[str, None] = '8d3b6a2f7c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # A migração inicial é vazia: num banco novo, urls (já com o índice)
+    # vem do create_all do startup
+    if not inspector.has_table('urls'):
+        return
+    if op.f('ix_urls_clicks') in {ix['name'] for ix in inspector.get_indexes('urls')}:
+        return
+    # CONCURRENTLY: não bloqueia escritas na tabela (fora de transação)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_urls_clicks'), 'urls', ['clicks'], unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('urls'):
+        return
+    op.drop_index(op.f('ix_urls_clicks'), table_name='urls')
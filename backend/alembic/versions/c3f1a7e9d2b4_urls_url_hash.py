@@ -0,0 +1,57 @@
+"""Coluna urls.url_hash (dedup de URLs longas)
+
+Revision ID: c3f1a7e9d2b4
+Revises: b7e4c9a0d2f3
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a7e9d2b4'
+down_revision: Union[str, None] = 'b7e4c9a0d2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    if bind.dialect.name != 'postgresql':
+        return False
+    relkind = bind.execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {'table': table}
+    ).scalar()
+    return relkind == 'p'
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # Sem urls (banco novo) não há o que alterar. Particionada, a tabela já
+    # veio no esquema de d4a8e2c6b1f9 (create_all de dev): o hash mora em url_hashes
+    if not inspector.has_table('urls') or _is_partitioned(bind, 'urls'):
+        return
+    if 'url_hash' not in {column['name'] for column in inspector.get_columns('urls')}:
+        # Nullable e sem default: ADD COLUMN só mexe no catálogo, sem reescrever a tabela
+        op.add_column('urls', sa.Column('url_hash', sa.LargeBinary(length=16), nullable=True))
+    if op.f('ix_urls_url_hash') in {ix['name'] for ix in inspector.get_indexes('urls')}:
+        return
+    # CONCURRENTLY: não bloqueia escritas na tabela (fora de transação)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_urls_url_hash'), 'urls', ['url_hash'], unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('urls'):
+        return
+    if op.f('ix_urls_url_hash') in {ix['name'] for ix in inspector.get_indexes('urls')}:
+        op.drop_index(op.f('ix_urls_url_hash'), table_name='urls')
+    if 'url_hash' in {column['name'] for column in inspector.get_columns('urls')}:
+        op.drop_column('urls', 'url_hash')
@@ -0,0 +1,180 @@
+"""Particiona urls por HASH(id) e move url_hash para url_hashes
+
+Revision ID: d4a8e2c6b1f9
+Revises: c3f1a7e9d2b4
+Create Date: 2026-10-18 19:00:00.000000
+
+A chave curta é o id codificado (Sqids): o repositório decodifica a chave e
+busca pela PK, que poda para uma única partição. Com isso saem os índices
+ix_urls_short_key e ix_urls_id (este duplicava a PK).
+
+Tabela particionada só aceita UNIQUE que inclua a coluna de partição, então
+o hash de dedup vai para url_hashes (PK = hash, particionada pelo hash).
+
+ATENÇÃO: a cópia para a tabela nova roda numa transação e bloqueia escritas
+em urls até o fim. Em tabelas grandes, rode numa janela de manutenção.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8e2c6b1f9'
+down_revision: Union[str, None] = 'c3f1a7e9d2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS = 32
+
+
+def _create_partitions(table: str) -> None:
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    relkind = bind.execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {'table': table}
+    ).scalar()
+    return relkind == 'p'
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Sem urls (banco novo), o create_all cria o esquema final
+    if not sa.inspect(bind).has_table('urls'):
+        return
+    if bind.dialect.name != 'postgresql':
+        _upgrade_plain()
+        return
+    # Já particionada (create_all de dev): url_hashes veio junto
+    if _is_partitioned(bind, 'urls'):
+        return
+
+    # 1. A tabela atual sai do caminho (nomes de índice são únicos no schema)
+    op.execute("ALTER TABLE urls RENAME TO urls_legacy")
+    op.execute("ALTER INDEX urls_pkey RENAME TO urls_legacy_pkey")
+    op.execute("ALTER INDEX ix_urls_clicks RENAME TO ix_urls_legacy_clicks")
+
+    # 2. urls particionada; o id continua vindo de urls_id_seq
+    op.execute(
+        """
+        CREATE TABLE urls (
+            id BIGINT NOT NULL DEFAULT nextval('urls_id_seq'),
+            original_url VARCHAR NOT NULL,
+            short_key VARCHAR(10),
+            clicks INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            CONSTRAINT urls_pkey PRIMARY KEY (id)
+        ) PARTITION BY HASH (id)
+        """
+    )
+    _create_partitions('urls')
+    op.execute(
+        "INSERT INTO urls (id, original_url, short_key, clicks, created_at) "
+        "SELECT id, original_url, short_key, clicks, created_at FROM urls_legacy"
+    )
+    op.create_index(op.f('ix_urls_clicks'), 'urls', ['clicks'], unique=False)
+
+    # 3. Hashes de dedup na tabela própria
+    op.execute(
+        """
+        CREATE TABLE url_hashes (
+            url_hash BYTEA NOT NULL,
+            short_key VARCHAR(10) NOT NULL,
+            CONSTRAINT url_hashes_pkey PRIMARY KEY (url_hash)
+        ) PARTITION BY HASH (url_hash)
+        """
+    )
+    _create_partitions('url_hashes')
+    op.execute(
+        "INSERT INTO url_hashes (url_hash, short_key) "
+        "SELECT url_hash, short_key FROM urls_legacy "
+        "WHERE url_hash IS NOT NULL AND short_key IS NOT NULL"
+    )
+
+    # 4. A sequence passa a pertencer à tabela nova antes do DROP da antiga
+    op.execute("ALTER SEQUENCE urls_id_seq OWNED BY urls.id")
+    op.execute("DROP TABLE urls_legacy")
+
+
+def _upgrade_plain() -> None:
+    """
+    SQLite de dev: sem particionamento, só o novo esquema de índices. Cada
+    passo confere o estado antes, pois o create_all do startup pode já ter
+    criado url_hashes (e urls sem os índices antigos).
+    """
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('url_hashes'):
+        op.create_table(
+            'url_hashes',
+            sa.Column('url_hash', sa.LargeBinary(length=16), nullable=False),
+            sa.Column('short_key', sa.String(length=10), nullable=False),
+            sa.PrimaryKeyConstraint('url_hash'),
+        )
+    columns = {column['name'] for column in inspector.get_columns('urls')}
+    if 'url_hash' in columns:
+        op.execute(
+            "INSERT INTO url_hashes (url_hash, short_key) "
+            "SELECT url_hash, short_key FROM urls "
+            "WHERE url_hash IS NOT NULL AND short_key IS NOT NULL "
+            "AND url_hash NOT IN (SELECT url_hash FROM url_hashes)"
+        )
+    indexes = {ix['name'] for ix in inspector.get_indexes('urls')}
+    with op.batch_alter_table('urls') as batch:
+        for index in ('ix_urls_url_hash', 'ix_urls_short_key', 'ix_urls_id'):
+            if index in indexes:
+                batch.drop_index(index)
+        if 'url_hash' in columns:
+            batch.drop_column('url_hash')
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('urls'):
+        return
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('urls') as batch:
+            batch.add_column(sa.Column('url_hash', sa.LargeBinary(length=16), nullable=True))
+            batch.create_index('ix_urls_id', ['id'])
+            batch.create_index('ix_urls_short_key', ['short_key'], unique=True)
+            batch.create_index('ix_urls_url_hash', ['url_hash'], unique=True)
+        op.execute(
+            "UPDATE urls SET url_hash = "
+            "(SELECT h.url_hash FROM url_hashes h WHERE h.short_key = urls.short_key)"
+        )
+        op.drop_table('url_hashes')
+        return
+
+    op.execute("ALTER TABLE urls RENAME TO urls_partitioned")
+    op.execute("ALTER INDEX urls_pkey RENAME TO urls_partitioned_pkey")
+    op.execute("ALTER INDEX ix_urls_clicks RENAME TO ix_urls_partitioned_clicks")
+    op.execute(
+        """
+        CREATE TABLE urls (
+            id BIGINT NOT NULL DEFAULT nextval('urls_id_seq'),
+            original_url VARCHAR NOT NULL,
+            short_key VARCHAR(10),
+            clicks INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            url_hash BYTEA,
+            CONSTRAINT urls_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO urls (id, original_url, short_key, clicks, created_at, url_hash) "
+        "SELECT u.id, u.original_url, u.short_key, u.clicks, u.created_at, h.url_hash "
+        "FROM urls_partitioned u LEFT JOIN url_hashes h ON h.short_key = u.short_key"
+    )
+    op.create_index(op.f('ix_urls_id'), 'urls', ['id'], unique=False)
+    op.create_index(op.f('ix_urls_short_key'), 'urls', ['short_key'], unique=True)
+    op.create_index(op.f('ix_urls_clicks'), 'urls', ['clicks'], unique=False)
+    op.create_index(op.f('ix_urls_url_hash'), 'urls', ['url_hash'], unique=True)
+    op.execute("ALTER SEQUENCE urls_id_seq OWNED BY urls.id")
+    op.execute("DROP TABLE urls_partitioned")
+    op.execute("DROP TABLE url_hashes")
@@ -0,0 +1,36 @@
+"""Coluna urls.redirect_status (status do redirect por link)
+
+Revision ID: e6b3d9f1a2c7
+Revises: d4a8e2c6b1f9
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b3d9f1a2c7'
+down_revision: Union[str, None] = 'd4a8e2c6b1f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # Banco novo ou create_all de dev: a coluna vem com a tabela
+    if not inspector.has_table('urls'):
+        return
+    if 'redirect_status' in {column['name'] for column in inspector.get_columns('urls')}:
+        return
+    # Nullable e sem default: só catálogo (propaga para as partições), sem reescrita.
+    # NULL = segue REDIRECT_STATUS
+    op.add_column('urls', sa.Column('redirect_status', sa.SmallInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('urls'):
+        return
+    op.drop_column('urls', 'redirect_status')
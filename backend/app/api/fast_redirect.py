@@ -0,0 +1,167 @@
+import time
+from typing import Optional, Set, Tuple
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.keygen import is_valid_short_key
+from app.core.logger import cache_tier_var, log_redirect, short_key_var
+from app.core.resources import resources
+from app.services.cache_policy import CachePolicy, cache_policy as shared_cache_policy
+from app.services.local_cache import LocalCache, local_cache as shared_local_cache
+from app.services.redirect_policy import (
+    RedirectPolicy, parse_entry, redirect_policy as shared_redirect_policy
+)
+
+# Chave em scope["state"] com a chave curta que já deu miss no L1 e no Redis
+# aqui: a rota de redirect pula esses níveis em vez de repetir o GET
+CACHE_MISS_STATE = "fast_redirect_miss"
+
+
+def single_segment_routes(app) -> Set[str]:
+    """Rotas fixas de um segmento (/health, /metrics...): nunca são chaves."""
+    return {
+        route.path[1:] for route in getattr(app, "routes", [])
+        if "{" not in getattr(route, "path", "{") and route.path.count("/") == 1
+    }
+
+
+class FastRedirectMiddleware:
+    """
+    Caminho rápido ASGI para GET /{short_key}.
+
+    Chaves com formato válido são procuradas no L1 e (sem XFetch ligado) no
+    Redis; num hit a resposta sai daqui com status e headers de cache da
+    RedirectPolicy, já pré-codificados, sem
+    roteamento do FastAPI, sem injeção de dependências e sem sessão de banco.
+    Qualquer outra coisa (miss, erro do Redis, rotas fixas como /health) segue
+    para a pilha completa, que continua sendo a fonte da verdade. Num miss
+    a chave vai em scope["state"][CACHE_MISS_STATE], e a pilha segue direto
+    para o Bloom Filter e o banco.
+    """
+
+    def __init__(
+        self,
+        app,
+        local_cache: Optional[LocalCache] = None,
+        redis_client: Optional[redis.Redis] = None,
+        cache_policy: Optional[CachePolicy] = None,
+        redirect_policy: Optional[RedirectPolicy] = None,
+    ):
+        self.app = app
+        self._local_cache = local_cache
+        self._redis = redis_client
+        self.cache_policy = cache_policy if cache_policy is not None else shared_cache_policy
+        self.redirect_policy = redirect_policy if redirect_policy is not None else shared_redirect_policy
+        self._reserved: Optional[Set[str]] = None
+
+        # Métricas
+        self.hits = 0
+        self.fallbacks = 0
+
+    @property
+    def local_cache(self) -> Optional[LocalCache]:
+        return self._local_cache if self._local_cache is not None else shared_local_cache
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis if self._redis is not None else resources.redis
+
+    def _reserved_paths(self, scope) -> Set[str]:
+        if self._reserved is None:
+            self._reserved = single_segment_routes(scope.get("app"))
+        return self._reserved
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not settings.FAST_REDIRECT_ENABLED
+        ):
+            return await self.app(scope, receive, send)
+
+        short_key = scope["path"][1:]
+        if not is_valid_short_key(short_key) or short_key in self._reserved_paths(scope):
+            return await self.app(scope, receive, send)
+
+        short_key_var.set(short_key)
+        entry, missed = await self._lookup(short_key)
+        if entry is None:
+            self.fallbacks += 1
+            metrics.FAST_FALLTHROUGH.inc()
+            if missed:
+                scope.setdefault("state", {})[CACHE_MISS_STATE] = short_key
+            return await self.app(scope, receive, send)
+
+        self.hits += 1
+        metrics.FAST_HIT.inc()
+        self._record_click(scope, short_key)
+        original_url, link_status = parse_entry(entry)
+        status, headers = self.redirect_policy.respond(
+            original_url, link_status, self._if_none_match(scope)
+        )
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        log_redirect(short_key, status)
+
+    async def _lookup(self, short_key: str) -> Tuple[Optional[str], bool]:
+        """
+        (entrada do link no L1/Redis - "url" ou "status|url" - ou None, e se
+        os dois níveis foram consultados e deram miss).
+        """
+        local_cache = self.local_cache
+        if local_cache is not None:
+            mark = time.perf_counter()
+            original_url = local_cache.get(short_key)
+            if original_url:
+                metrics.L1_HIT.observe(time.perf_counter() - mark)
+                cache_tier_var.set("l1")
+                await self.cache_policy.on_hit(self.redis, short_key)
+                return original_url, False
+            metrics.L1_MISS.observe(time.perf_counter() - mark)
+
+        # Com XFetch ligado a renovação antecipada fica com o URLService
+        if settings.CACHE_EARLY_REFRESH_BETA > 0:
+            return None, False
+        mark = time.perf_counter()
+        try:
+            original_url = await self.redis.get(short_key)
+        except RedisError:
+            metrics.REDIS_ERROR.observe(time.perf_counter() - mark)
+            return None, False
+        self.cache_policy.record_lookup(short_key, hit=bool(original_url))
+        if not original_url:
+            metrics.REDIS_MISS.observe(time.perf_counter() - mark)
+            return None, True
+
+        metrics.REDIS_HIT.observe(time.perf_counter() - mark)
+        cache_tier_var.set("redis")
+        original_url = self.cache_policy.decode(original_url)
+        await self.cache_policy.on_hit(self.redis, short_key)
+        if local_cache is not None:
+            local_cache.set(short_key, original_url)
+        return original_url, False
+
+    @staticmethod
+    def _if_none_match(scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                return value.decode("latin-1")
+        return None
+
+    @staticmethod
+    def _record_click(scope, short_key: str) -> None:
+        country_header = settings.ANALYTICS_COUNTRY_HEADER.lower().encode("latin-1")
+        visitor = referrer = country = None
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                visitor = value.decode("latin-1").split(",")[0].strip()
+            elif name == b"referer":
+                referrer = value.decode("latin-1")
+            elif name == country_header:
+                country = value.decode("latin-1")
+        if visitor is None and scope.get("client"):
+            visitor = scope["client"][0]
+        resources.record_click(short_key, visitor=visitor, referrer=referrer, country=country)
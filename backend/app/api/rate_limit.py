@@ -0,0 +1,123 @@
+import hashlib
+import ipaddress
+import json
+import math
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Set, Tuple, Union
+
+from app.api.fast_redirect import single_segment_routes
+from app.core.config import settings
+from app.core.keygen import is_valid_short_key
+from app.core.resources import resources
+from app.services.rate_limiter import CREATE, REDIRECT, RateLimiter
+
+TOO_MANY_REQUESTS_BODY = json.dumps({"detail": "Too Many Requests"}).encode()
+
+Networks = Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]
+
+
+def _key_digest(value: bytes) -> str:
+    return hashlib.blake2b(value, digest_size=8).hexdigest()
+
+
+def _split(value: str) -> Iterable[str]:
+    return (item.strip() for item in value.split(",") if item.strip())
+
+
+@lru_cache(maxsize=4096)
+def _is_trusted(peer: str, networks: Networks) -> bool:
+    try:
+        address = ipaddress.ip_address(peer)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+class RateLimitMiddleware:
+    """
+    Aplica o RateLimiter antes do caminho rápido e da pilha do FastAPI.
+
+    Classes de rota: POST /urls* (criação) e GET /{short_key} (redirect). O
+    cliente é a API key (header RATE_LIMIT_API_KEY_HEADER), se for uma das
+    RATE_LIMIT_API_KEYS, ou o IP. O IP é o X-Real-IP repassado pelo Nginx
+    quando o peer do socket está em RATE_LIMIT_TRUSTED_PROXIES, senão o
+    próprio peer - o X-Forwarded-For começa com o que o cliente mandou e não
+    serve para limitar. Chaves e IPs forjados não ganham buckets novos.
+    Acima do limite: 429 com Retry-After, sem tocar em Redis nem banco.
+    """
+
+    def __init__(
+        self,
+        app,
+        limiter: Optional[RateLimiter] = None,
+        api_keys: Optional[Iterable[str]] = None,
+        trusted_proxies: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
+        self._limiter = limiter
+        self._reserved: Optional[Set[str]] = None
+        self._api_key_header = settings.RATE_LIMIT_API_KEY_HEADER.lower().encode("latin-1")
+        if api_keys is None:
+            api_keys = _split(settings.RATE_LIMIT_API_KEYS)
+        # Só os hashes ficam em memória
+        self._api_keys: FrozenSet[str] = frozenset(_key_digest(key.encode()) for key in api_keys)
+        if trusted_proxies is None:
+            trusted_proxies = _split(settings.RATE_LIMIT_TRUSTED_PROXIES)
+        self._trusted_proxies: Networks = tuple(
+            ipaddress.ip_network(network, strict=False) for network in trusted_proxies
+        )
+
+    @property
+    def limiter(self) -> Optional[RateLimiter]:
+        return self._limiter if self._limiter is not None else resources.rate_limiter
+
+    def _route(self, scope) -> Optional[str]:
+        method, path = scope["method"], scope["path"]
+        if method == "POST" and (path == "/urls" or path.startswith("/urls/")):
+            return CREATE
+        if method == "GET":
+            short_key = path[1:]
+            if self._reserved is None:
+                self._reserved = single_segment_routes(scope.get("app"))
+            if is_valid_short_key(short_key) and short_key not in self._reserved:
+                return REDIRECT
+        return None
+
+    def _client(self, scope) -> str:
+        api_key = real_ip = None
+        for name, value in scope["headers"]:
+            if name == self._api_key_header and value:
+                api_key = value
+            elif name == b"x-real-ip":
+                real_ip = value.decode("latin-1").strip()
+        if api_key is not None and self._api_keys:
+            digest = _key_digest(api_key)
+            if digest in self._api_keys:
+                return "key:" + digest
+        peer = scope["client"][0] if scope.get("client") else None
+        if real_ip and peer is not None and _is_trusted(peer, self._trusted_proxies):
+            return f"ip:{real_ip}"
+        return f"ip:{peer or 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limiter = self.limiter
+        route = self._route(scope) if limiter is not None else None
+        if route is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = limiter.check(route, self._client(scope))
+        if retry_after is None:
+            return await self.app(scope, receive, send)
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(TOO_MANY_REQUESTS_BODY)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": TOO_MANY_REQUESTS_BODY})
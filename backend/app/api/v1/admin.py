@@ -0,0 +1,77 @@
+import hmac
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.api.v1.endpoints import get_read_service
+from app.core.config import settings
+from app.core.keygen import is_valid_short_key
+from app.core.resources import resources
+from app.services.corpus import FORMATS, SessionScope, export_corpus
+from app.services.edge_purge import EdgePurger, edge_purger
+from app.services.url_service import URLService
+
+router = APIRouter(prefix="/admin", include_in_schema=False)
+
+
+async def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Bearer ADMIN_TOKEN. Sem token configurado, as rotas nem existem (404)."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def get_export_sessions() -> SessionScope:
+    """Leituras do export vão para uma réplica (roteador de leituras)."""
+    return resources.read_router.session
+
+
+def get_edge_purger() -> EdgePurger:
+    return edge_purger
+
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_urls(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    compress: bool = False,
+    after_id: int = Query(0, ge=0),
+    sessions: SessionScope = Depends(get_export_sessions),
+):
+    """
+    Exporta a tabela `urls` inteira em streaming (ordem de id), com memória
+    constante. `after_id` retoma um download interrompido a partir do último
+    id recebido; `compress=true` devolve gzip.
+    """
+    filename = f"urls.{format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        export_corpus(sessions, format, compress, settings.EXPORT_BATCH_SIZE, after_id),
+        media_type="application/gzip" if compress else FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/purge/{short_key}", dependencies=[Depends(require_admin)])
+async def purge_url(
+    short_key: str,
+    service: URLService = Depends(get_read_service),
+    purger: EdgePurger = Depends(get_edge_purger),
+):
+    """
+    Tira a chave dos caches depois de mudar o destino ou o status do link:
+    Redis e L1 deste worker na hora, depois as bordas (REDIRECT_PURGE_URLS).
+    Os L1 dos outros workers convergem em até L1_CACHE_TTL; 301/308 já
+    entregues ficam no navegador até REDIRECT_PERMANENT_MAX_AGE.
+    """
+    if not is_valid_short_key(short_key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+    await service.invalidate(short_key)
+    return {"short_key": short_key, "edges": await purger.purge(short_key)}
@@ -1,31 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import RedirectResponse
+import json
+from datetime import datetime, timedelta, timezone
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Iterator, List, Literal, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-import os
 
+from app.api.fast_redirect import CACHE_MISS_STATE
+from app.core import metrics
+from app.core.config import settings
 from app.core.database import get_db, get_read_db
+from app.core.logger import log_redirect, logger, short_key_var
+from app.core.resources import resources
+from app.repositories.analytics_repository import ClickRollupRepository
 from app.repositories.url_repository import URLRepository
+from app.services.analytics import GRANULARITIES
+from app.services.redirect_policy import redirect_policy
 from app.services.url_service import URLService
-from app.schemas.url import URLCreate, URLResponse
-from app.core.keygen import generate_short_key  # Certifique-se de ter criado este arquivo
+from app.schemas.url import (
+    ClickStatsPoint, ClickStatsResponse, ClickStatsValue,
+    URLBatchCreate, URLBatchItem, URLBatchResponse, URLCreate, URLResponse
+)
 
 router = APIRouter()
 
-# Pega a URL base dos Secrets/Env (ex: https://jsaxac.com.br)
-# Se não estiver definida, usa localhost como fallback
-BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
-
 # -----------------------------------------------------------------------------
 # Dependency Injection Factories
 # -----------------------------------------------------------------------------
 
 async def get_write_service(db: AsyncSession = Depends(get_db)) -> URLService:
     repo = URLRepository(db)
-    return URLService(repo)
+    return URLService(repo, redis_client=resources.redis)
 
 async def get_read_service(db: AsyncSession = Depends(get_read_db)) -> URLService:
     repo = URLRepository(db)
-    return URLService(repo)
+    return URLService(repo, redis_client=resources.redis)
+
+async def get_stats_repository(db: AsyncSession = Depends(get_read_db)) -> ClickRollupRepository:
+    return ClickRollupRepository(db)
+
+# -----------------------------------------------------------------------------
+# Helpers de estatísticas
+# -----------------------------------------------------------------------------
+
+STATS_GRANULARITIES = {"minute": "m", "hour": "h", "day": "d"}
+STATS_DEFAULT_WINDOW = {"m": timedelta(hours=1), "h": timedelta(days=1), "d": timedelta(days=30)}
+STATS_MAX_BUCKETS = 2000
+
+def _stats_window(
+    granularity: str, start: Optional[datetime], end: Optional[datetime]
+) -> Tuple[datetime, datetime]:
+    """Intervalo [start, end) em UTC, com padrão por granularidade e limite de buckets."""
+    end = end or datetime.now(timezone.utc)
+    start = start or end - STATS_DEFAULT_WINDOW[granularity]
+    # Datas sem fuso são interpretadas como UTC
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="'start' deve ser anterior a 'end'.")
+    if (end - start).total_seconds() / GRANULARITIES[granularity] > STATS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Intervalo grande demais: máximo de {STATS_MAX_BUCKETS} buckets por consulta."
+        )
+    return start, end
+
+# -----------------------------------------------------------------------------
+# Helpers de lote
+# -----------------------------------------------------------------------------
+
+def _validate_batch(
+    urls: Sequence[Optional[str]], offset: int = 0
+) -> Tuple[List[Optional[URLBatchItem]], List[Tuple[int, str]]]:
+    """
+    Valida cada item com URLCreate. Retorna a lista de resultados (erros já
+    preenchidos, válidos como None) e os (posição, url) válidos.
+    """
+    results: List[Optional[URLBatchItem]] = []
+    valid: List[Tuple[int, str]] = []
+    for position, raw_url in enumerate(urls):
+        try:
+            url = str(URLCreate(url=raw_url).url)
+        except ValidationError as e:
+            results.append(URLBatchItem(index=offset + position, error=e.errors()[0]["msg"]))
+        else:
+            valid.append((position, url))
+            results.append(None)
+    return results, valid
+
+async def _shorten_batch(
+    service: URLService, urls: Sequence[Optional[str]], offset: int = 0
+) -> List[URLBatchItem]:
+    """Valida, grava os válidos de uma vez e devolve tudo na ordem de entrada."""
+    results, valid = _validate_batch(urls, offset)
+    short_urls = await service.shorten_many([url for _, url in valid])
+    for (position, url), short_url in zip(valid, short_urls):
+        results[position] = URLBatchItem(
+            index=offset + position, short_url=short_url, original_url=url
+        )
+    return results
+
+async def _spool_body(request: Request) -> SpooledTemporaryFile:
+    """
+    Copia o corpo para um arquivo temporário (em memória até 1 MB, depois em
+    disco). O corpo precisa ser lido antes de a resposta começar: durante um
+    StreamingResponse o Starlette também consome o receive() do ASGI.
+    """
+    spool = SpooledTemporaryFile(max_size=1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+def _iter_ndjson_urls(spool: SpooledTemporaryFile) -> Iterator[Optional[str]]:
+    """Lê o NDJSON ({"url": "..."} por linha) linha a linha."""
+    for line in spool:
+        if line.strip():
+            yield _parse_ndjson_line(line)
+
+def _client_ip(request: Request) -> Optional[str]:
+    """IP real do cliente (o Nginx repassa em X-Forwarded-For)."""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+def _parse_ndjson_line(line: bytes) -> Optional[str]:
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return None  # Vira erro de validação do item
+    return item.get("url") if isinstance(item, dict) else None
 
 # -----------------------------------------------------------------------------
 # Endpoints
@@ -38,59 +145,171 @@ async def get_read_service(db: AsyncSession = Depends(get_read_db)) -> URLServic
 )
 async def create_short_url(
     item: URLCreate, 
-    db: AsyncSession = Depends(get_db)
+    service: URLService = Depends(get_write_service)
 ):
     """
     Cria uma nova URL encurtada com hash curto e bonito (Sqids).
     
     Fluxo:
-    1. Persiste a URL original no banco para obter um ID único (Sequencial).
+    1. Reserva um ID único no banco (sequence) antes de gravar.
     2. Gera um código Sqids (ex: '8kMx9') baseado nesse ID.
-    3. Atualiza o registro no banco com esse código.
-    4. Retorna a URL completa com HTTPS.
+    3. Grava a linha já com o código (um INSERT, uma transação).
+    4. Registra a chave no Bloom Filter e no cache.
+    5. Retorna a URL completa com HTTPS.
+    
+    `redirect_status` (opcional) fixa o status do redirect do link
+    (301/302/307/308); sem ele vale REDIRECT_STATUS.
     """
     try:
-        # 1. Instancia o repositório diretamente para ter controle fino da transação
-        repo = URLRepository(db)
-        
-        # 2. Cria apenas com a URL original para gerar o ID
-        new_url = await repo.create(str(item.url))
-        
-        # 3. Gera a chave bonita baseada no ID numérico (ex: ID 55 -> 'a9Xk2')
-        code = generate_short_key(new_url.id)
-        
-        # 4. Atualiza o banco com a chave gerada
-        await repo.update_short_key(new_url.id, code)
-        
-        # 5. Monta a URL final usando o domínio HTTPS configurado
-        full_short_url = f"{BASE_URL}/{code}"
+        full_short_url = await service.shorten_url(str(item.url), item.redirect_status)
         
         return URLResponse(
             short_url=full_short_url,
-            original_url=str(item.url)
+            original_url=str(item.url),
+            redirect_status=item.redirect_status
         )
         
-    except Exception as e:
-        print(f"Error creating short URL: {str(e)}")
+    except Exception:
+        logger.exception("Erro ao criar URL curta")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Erro ao processar a solicitação."
         )
 
+@router.post("/urls/batch", response_model=URLBatchResponse)
+async def create_short_urls_batch(
+    batch: URLBatchCreate,
+    service: URLService = Depends(get_write_service)
+):
+    """
+    Cria várias URLs curtas de uma vez (campanhas, pipelines de marketing).
+    
+    Cada item é validado isoladamente: inválidos voltam com `error` e não
+    impedem os demais. Os resultados seguem a ordem de entrada.
+    """
+    if len(batch.urls) > settings.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Lote maior que o limite de {settings.BATCH_MAX_SIZE} URLs."
+        )
+
+    results = await _shorten_batch(service, batch.urls)
+    failed = sum(1 for item in results if item.error)
+    return URLBatchResponse(
+        created=len(results) - failed,
+        failed=failed,
+        results=results
+    )
+
+@router.post("/urls/batch/stream")
+async def create_short_urls_stream(
+    request: Request,
+    service: URLService = Depends(get_write_service)
+):
+    """
+    Variante em streaming: recebe NDJSON ({"url": "..."} por linha) de
+    qualquer tamanho e devolve NDJSON, gravando em blocos de
+    BATCH_STREAM_CHUNK itens. O corpo é "spooled" em arquivo temporário,
+    então a memória fica constante, sem limite de lote.
+    """
+    spool = await _spool_body(request)
+
+    async def results() -> AsyncIterator[str]:
+        chunk: List[Optional[str]] = []
+        offset = 0
+        for url in _iter_ndjson_urls(spool):
+            chunk.append(url)
+            if len(chunk) >= settings.BATCH_STREAM_CHUNK:
+                for item in await _shorten_batch(service, chunk, offset):
+                    yield item.model_dump_json(exclude_none=True) + "\n"
+                offset += len(chunk)
+                chunk = []
+        if chunk:
+            for item in await _shorten_batch(service, chunk, offset):
+                yield item.model_dump_json(exclude_none=True) + "\n"
+        spool.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.get("/urls/{short_key}/stats", response_model=ClickStatsResponse)
+async def get_url_stats(
+    short_key: str,
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    top: int = Query(10, ge=1, le=100),
+    service: URLService = Depends(get_read_service),
+    stats: ClickRollupRepository = Depends(get_stats_repository)
+):
+    """
+    Série temporal de cliques do link, com top referrers e países.
+    
+    Lê só os rollups pré-agregados (nunca linhas cruas). Referrer e país são
+    agregados por hora/dia: em `granularity=minute` eles vêm dos buckets
+    horários do intervalo. Os dados atrasam até ANALYTICS_FLUSH_INTERVAL.
+    """
+    if not await service.get_original_url(short_key):
+        raise HTTPException(status_code=404, detail="URL not found")
+
+    code = STATS_GRANULARITIES[granularity]
+    start, end = _stats_window(code, start, end)
+    series = await stats.series(short_key, code, start, end)
+    dimension_code = "h" if code == "m" else code
+    referrers = await stats.top_values(short_key, dimension_code, "referrer", start, end, top)
+    countries = await stats.top_values(short_key, dimension_code, "country", start, end, top)
+
+    return ClickStatsResponse(
+        short_key=short_key,
+        granularity=granularity,
+        start=start,
+        end=end,
+        total=sum(count for _, count in series),
+        series=[ClickStatsPoint(bucket=bucket, clicks=count) for bucket, count in series],
+        top_referrers=[ClickStatsValue(value=value, clicks=count) for value, count in referrers],
+        countries=[ClickStatsValue(value=value, clicks=count) for value, count in countries],
+    )
+
 @router.get("/{short_key}")
 async def redirect_to_url(
     short_key: str, 
+    request: Request,
     service: URLService = Depends(get_read_service)
 ):
     """
     Redireciona para a URL original.
+    
+    Status e headers de cache (Cache-Control, Expires, ETag) vêm da
+    RedirectPolicy: 301/308 ficam no navegador e na borda; 302/307 ficam só
+    na borda por REDIRECT_EDGE_MAX_AGE (s-maxage), então a maior parte dos
+    cliques é respondida pelo Nginx/CDN sem chegar aqui.
     """
+    short_key_var.set(short_key)
     # A lógica de leitura permanece a mesma (Cache -> Banco -> 404)
-    original_url = await service.get_original_url(short_key)
+    # Miss no L1/Redis já visto pelo FastRedirectMiddleware: não repete o GET
+    cache_missed = request.scope.get("state", {}).get(CACHE_MISS_STATE) == short_key
+    redirect = await service.get_redirect(short_key, cache_missed)
     
-    if original_url:
-        # 301 = Permanente (Melhor para SEO e Cache de navegador)
-        # 302 = Temporário (Melhor se você precisa contar cliques com precisão absoluta no server)
-        return RedirectResponse(url=original_url, status_code=301)
+    if redirect:
+        original_url, link_status = redirect
+        metrics.FULL_FOUND.inc()
+        # Clique contado em memória (write-behind): nenhuma latência extra
+        resources.record_click(
+            short_key,
+            visitor=_client_ip(request),
+            referrer=request.headers.get("referer"),
+            country=request.headers.get(settings.ANALYTICS_COUNTRY_HEADER),
+        )
+        
+        # 301/308 = Permanente (SEO; o navegador nem volta a pedir)
+        # 302/307 = Temporário (todo clique passa pela borda; com s-maxage ela responde sozinha)
+        status_code, headers = redirect_policy.respond(
+            original_url, link_status, request.headers.get("if-none-match")
+        )
+        response = Response(status_code=status_code)
+        response.raw_headers = list(headers)
+        log_redirect(short_key, status_code)
+        return response
     
+    metrics.FULL_NOT_FOUND.inc()
+    log_redirect(short_key, 404)
     raise HTTPException(status_code=404, detail="URL not found")
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Back-fill do Bloom Filter a partir da tabela `urls`.
+
+Rode ANTES de ligar BLOOM_NEGATIVE_LOOKUPS (e depois de qualquer perda do
+filtro no Redis). No fim ele grava a sentinela de completude; sem ela o
+redirect ignora o filtro e consulta o banco:
+
+    python -m app.commands.bloom_backfill --batch-size 10000
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.logger import logger
+from app.core.resources import resources
+from app.services.bloom_filter import backfill_bloom
+
+
+async def backfill(batch_size: int = 10000) -> int:
+    """Adiciona todas as chaves existentes ao filtro. Retorna o total."""
+    bloom = resources.bloom
+    if bloom is None:
+        raise RuntimeError("BLOOM_ENABLED=False: nada a fazer.")
+
+    start = time.perf_counter()
+    # Lê do master: numa réplica atrasada faltariam as chaves recém-criadas,
+    # e com a sentinela gravada no fim elas virariam 404
+    total = await backfill_bloom(bloom, resources.session_master, batch_size=batch_size)
+    logger.info(f"Bloom back-fill: {total} chaves em {time.perf_counter() - start:.1f}s")
+    return total
+
+
+async def main(batch_size: int) -> None:
+    try:
+        total = await backfill(batch_size)
+        logger.info(f"Bloom back-fill concluído: {total} chaves")
+    finally:
+        await resources.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Popula o Bloom Filter a partir do banco")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
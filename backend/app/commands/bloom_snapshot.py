@@ -0,0 +1,48 @@
+"""
+Snapshot do Bloom Filter em arquivo local (warm-start de um nó).
+
+    python -m app.commands.bloom_snapshot save /data/bloom.snap
+    python -m app.commands.bloom_snapshot load /data/bloom.snap
+
+Com BLOOM_SNAPSHOT_PATH configurado, o startup carrega o arquivo sozinho
+quando o filtro não existe no Redis. O snapshot guarda o high-water (maior
+id menos BLOOM_SNAPSHOT_ID_MARGIN); ao carregar, os ids acima dele são
+re-adicionados antes de o filtro voltar a responder "não existe".
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.logger import logger
+from app.core.resources import resources
+from app.services.bloom_filter import restore_snapshot, snapshot_high_water
+
+
+async def main(action: str, path: str) -> None:
+    bloom = resources.bloom
+    if bloom is None:
+        raise RuntimeError("BLOOM_ENABLED=False: nada a fazer.")
+
+    start = time.perf_counter()
+    try:
+        if action == "save":
+            # High-water lido antes dos bits: o que vier depois é re-adicionado no load
+            high_water = await snapshot_high_water(resources.session_master)
+            size = await bloom.snapshot(path, resources.redis_binary, high_water)
+            logger.info(f"Snapshot salvo em {path}: {size} bytes ({time.perf_counter() - start:.1f}s)")
+        else:
+            added = await restore_snapshot(bloom, path, resources.redis_binary, resources.session_master)
+            logger.info(
+                f"Snapshot {path} carregado, {added} chaves recentes re-adicionadas "
+                f"({time.perf_counter() - start:.1f}s)"
+            )
+    finally:
+        await resources.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Salva/carrega o Bloom Filter em arquivo")
+    parser.add_argument("action", choices=["save", "load"])
+    parser.add_argument("path")
+    args = parser.parse_args()
+    asyncio.run(main(args.action, args.path))
@@ -0,0 +1,32 @@
+"""
+Warm-up do cache: carrega as chaves mais quentes no Redis.
+
+Rode depois de um failover/flush do Redis ou antes de liberar tráfego para
+um deploy novo (WARMUP_ON_STARTUP faz o mesmo no startup dos workers):
+
+    python -m app.commands.warmup --top 10000
+    python -m app.commands.warmup --source log --access-log /var/log/nginx/access.log
+"""
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.resources import resources
+
+
+async def main(source: str, top: int, access_log: str) -> None:
+    try:
+        report = await resources.cache_warmer().run(source, top, access_log)
+        logger.info(f"Warm-up concluído: {report['keys']} chaves em {report['seconds']:.2f}s")
+    finally:
+        await resources.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-carrega as chaves mais quentes no Redis")
+    parser.add_argument("--source", choices=("clicks", "log"), default=settings.WARMUP_SOURCE)
+    parser.add_argument("--top", type=int, default=settings.WARMUP_TOP_N)
+    parser.add_argument("--access-log", default=settings.WARMUP_ACCESS_LOG)
+    args = parser.parse_args()
+    asyncio.run(main(args.source, args.top, args.access_log))
@@ -15,6 +15,153 @@ class Settings(BaseSettings):
     # URLs das Réplicas (Leitura) - String separada por vírgula
     DATABASE_READ_URLS: str 
     
+    # --- Pools de conexão (por worker) ---
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_POOL_PREWARM: int = 5      # Conexões abertas já no startup
+    DB_POOL_SIZE: int = 10           # Por engine (master e cada réplica)
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800      # segundos
+    DB_POOL_PREWARM: int = 2         # Conexões abertas já no startup, por engine
+    
+    # --- Roteamento de leituras entre réplicas ---
+    REPLICA_PROBE_INTERVAL: float = 2.0  # segundos entre health/lag checks
+    REPLICA_PROBE_TIMEOUT: float = 1.0
+    REPLICA_MAX_LAG: float = 5.0         # segundos; acima disso a réplica sai do rodízio
+    REPLICA_EJECT_AFTER: int = 3         # falhas seguidas para ejetar uma réplica
+    # Miss na réplica para uma chave que pode ser recém-criada -> relê no master
+    READ_MASTER_FALLBACK: bool = True
+    
+    # --- Alocação de IDs em blocos ---
+    # "database": nextval em lote na sequence urls_id_seq (master, uma ida por bloco),
+    #             a mesma fonte do DEFAULT da coluna e de ID_ALLOCATOR="none"
+    # "redis": INCRBY num contador do Redis
+    # "none": um nextval por criação (sem blocos)
+    ID_ALLOCATOR: str = "database"
+    ID_BLOCK_SIZE: int = 10000
+    
+    # --- Criação em lote (POST /urls/batch) ---
+    BATCH_MAX_SIZE: int = 10000       # Itens por requisição no endpoint JSON
+    BATCH_STREAM_CHUNK: int = 1000    # Itens gravados por vez no endpoint NDJSON
+    
+    # --- Contagem de cliques (write-behind) ---
+    CLICK_COUNTING_ENABLED: bool = True
+    CLICK_FLUSH_INTERVAL: float = 5.0      # segundos entre flushes para o Postgres
+    CLICK_FLUSH_BATCH: int = 1000          # chaves por UPDATE em lote
+    CLICK_MAX_PENDING_KEYS: int = 100_000  # antecipa o flush se o buffer crescer
+    CLICK_MAX_BUFFERED_KEYS: int = 1_000_000  # teto do buffer (banco fora): chaves novas são descartadas
+    CLICK_TRACK_UNIQUES: bool = False      # HyperLogLog de visitantes no Redis
+    
+    # --- Analytics (séries temporais de cliques) ---
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_BUFFER_SIZE: int = 100_000   # Eventos no ring buffer (os mais antigos são descartados)
+    ANALYTICS_FLUSH_INTERVAL: float = 10.0 # segundos entre flushes dos rollups
+    ANALYTICS_FLUSH_BATCH: int = 1000      # linhas por upsert
+    ANALYTICS_COUNTRY_HEADER: str = "X-Country-Code"  # Preenchido pelo Nginx/CDN (GeoIP)
+    
+    # --- Bloom Filter (Redis) ---
+    BLOOM_ENABLED: bool = True             # Registra toda chave criada no filtro
+    # Responde 404 sem ir ao banco quando o filtro diz "não existe".
+    # Ligue depois de rodar o back-fill (python -m app.commands.bloom_backfill): só com
+    # a sentinela que ele grava o filtro responde "não existe" (sem ela, vale o banco).
+    BLOOM_NEGATIVE_LOOKUPS: bool = False
+    # 100M itens a 1% ~ 120 MB. Acima de 2^31 bits o filtro é dividido em shards.
+    # No modo 'scalable', é a capacidade da primeira geração.
+    BLOOM_ITEM_COUNT: int = 100_000_000
+    BLOOM_FP_PROB: float = 0.01
+    BLOOM_MODE: str = "fixed"          # "fixed" (sharded) | "scalable" (gerações)
+    BLOOM_SHARDS: int = 0              # 0 = automático (cada shard <= 256 MB)
+    BLOOM_GROWTH: int = 2              # Modo scalable: fator de crescimento por geração
+    # Snapshot local para warm-start: carregado no startup se o filtro não existir no Redis
+    BLOOM_SNAPSHOT_PATH: str = ""
+    # Ao carregar um snapshot, os ids acima de (maior id no snapshot - margem) são
+    # re-adicionados. A margem cobre blocos de IDs ainda abertos nos workers
+    BLOOM_SNAPSHOT_ID_MARGIN: int = 1_000_000
+    
+    # --- Cache L1 (memória do processo, por worker) ---
+    L1_CACHE_ENABLED: bool = True
+    L1_CACHE_MAX_ENTRIES: int = 10000
+    L1_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # 16 MB
+    L1_CACHE_TTL: float = 30.0  # segundos
+    
+    # --- Política de cache (Redis) ---
+    CACHE_TTL: int = 3600                # TTL base (segundos) de toda chave cacheada
+    CACHE_HOT_TTL: int = 86400           # TTL das chaves quentes, renovado enquanto forem acessadas
+    CACHE_HOT_THRESHOLD: int = 20        # hits numa janela (por worker) para a chave virar quente
+    CACHE_HOT_WINDOW: float = 60.0       # segundos
+    CACHE_TTL_JITTER: float = 0.1        # ±10% para espalhar as expirações
+    CACHE_COMPRESSION: bool = False      # zlib + base85 ("z:") para URLs longas
+    CACHE_COMPRESS_MIN_BYTES: int = 200
+    CACHE_MEMORY_SAMPLE_RATE: float = 0.001  # fração das gravações amostradas com MEMORY USAGE
+    
+    # --- Warm-up do cache (deploy / failover do Redis) ---
+    WARMUP_ON_STARTUP: bool = False
+    WARMUP_SOURCE: str = "clicks"        # "clicks" (ranking de URL.clicks) | "log" (access log)
+    WARMUP_ACCESS_LOG: str = ""          # Access log do Nginx ou arquivo com uma chave por linha
+    WARMUP_TOP_N: int = 10000
+    WARMUP_CHUNK_SIZE: int = 500         # chaves por consulta/pipeline
+    WARMUP_CONCURRENCY: int = 4          # chunks em paralelo
+    
+    # --- Deduplicação de URLs longas (POST /urls) ---
+    DEDUP_ENABLED: bool = False          # mesma URL longa devolve a chave existente
+    DEDUP_LOCAL_SIZE: int = 10000        # hashes recentes guardados no worker
+    DEDUP_TTL: int = 86400               # TTL de dedup:<hash> no Redis (segundos)
+    
+    # --- Efeitos da criação (cache/Bloom/dedup) em background ---
+    SIDE_EFFECTS_ASYNC: bool = True      # False = tudo inline, antes da resposta
+    SIDE_EFFECTS_CAPACITY: int = 50_000  # fila cheia -> executa inline
+    SIDE_EFFECTS_BATCH: int = 500
+    SIDE_EFFECTS_INTERVAL: float = 0.05  # segundos entre drenagens (janela de agrupamento)
+    SIDE_EFFECTS_MAX_ATTEMPTS: int = 5
+    SIDE_EFFECTS_BACKOFF: float = 0.1    # segundos; dobra a cada tentativa (máx. 5s)
+    
+    # --- Rate limiting (por cliente: API key ou IP) ---
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_WINDOW: float = 60.0      # segundos
+    RATE_LIMIT_CREATE: int = 600         # POST /urls* por janela, somando os workers
+    RATE_LIMIT_CREATE_BURST: int = 30
+    RATE_LIMIT_REDIRECT: int = 6000      # GET /{short_key} por janela
+    RATE_LIMIT_REDIRECT_BURST: int = 200
+    RATE_LIMIT_SYNC_INTERVAL: float = 1.0  # segundos entre syncs com o Redis
+    RATE_LIMIT_MAX_CLIENTS: int = 100_000  # buckets locais por worker (LRU)
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    # API keys com bucket próprio, separadas por vírgula. Chave desconhecida
+    # (ou inventada a cada requisição) cai no bucket do IP
+    RATE_LIMIT_API_KEYS: str = ""
+    # Peers (IPs/redes, separados por vírgula) cujo X-Real-IP é aceito: o Nginx.
+    # De qualquer outro peer vale o IP do socket
+    RATE_LIMIT_TRUSTED_PROXIES: str = "127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    
+    # --- Exportação / importação do corpus (urls) ---
+    ADMIN_TOKEN: str = ""                # Bearer do /admin/*; vazio = endpoints desligados (404)
+    EXPORT_BATCH_SIZE: int = 10000       # linhas por página do export (keyset no id)
+    IMPORT_CHUNK_SIZE: int = 10000       # registros por COPY/commit no import
+    
+    # --- Redirects (status e cache na borda) ---
+    REDIRECT_STATUS: int = 301           # Padrão global (301/302/307/308); o link pode sobrescrever
+    REDIRECT_PERMANENT_MAX_AGE: int = 86400  # Cache-Control de 301/308 (navegador e borda)
+    REDIRECT_MAX_AGE: int = 0            # max-age de 302/307: 0 = todo clique passa pela borda
+    REDIRECT_EDGE_MAX_AGE: int = 60      # s-maxage de 302/307 (Nginx/CDN); 0 e max-age 0 = no-store
+    # URLs chamadas no purge de uma chave, separadas por vírgula ("{short_key}" é substituído),
+    # ex.: "https://shorturlv1.online/{short_key}" (o Nginx só aceita o refresh de redes internas)
+    REDIRECT_PURGE_URLS: str = ""
+    REDIRECT_PURGE_TIMEOUT: float = 2.0  # segundos por URL de purge
+    
+    # --- Logs ---
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000          # registros pendentes antes de descartar (stdout lento)
+    LOG_REDIRECT_SAMPLE_RATE: float = 0.01  # fração dos redirects logados (warnings/erros sempre)
+    
+    # --- Métricas (Prometheus) ---
+    METRICS_ENABLED: bool = True         # expõe GET /metrics
+    METRICS_LOOP_LAG_INTERVAL: float = 0.5  # segundos entre medições do atraso do event loop
+    
+    # Redirect servido direto do cache por um middleware ASGI (sem FastAPI/DI)
+    FAST_REDIRECT_ENABLED: bool = True
+    
+    # Renovação antecipada probabilística do Redis (XFetch). 0 = desligado.
+    # Valores > 1 renovam mais cedo as chaves quentes.
+    CACHE_EARLY_REFRESH_BETA: float = 0.0
+    
     # Propriedade computada para compatibilidade legacy
     @property
     def DATABASE_URL(self) -> str:
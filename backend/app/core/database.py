@@ -1,24 +1,56 @@
-import random
 from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.replica_router import build_replica_router
+
+
+def _engine_options(url: str) -> dict:
+    """Opções de pool por engine (SQLite de dev/testes não aceita pool_size)."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def _session_factory(engine) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+    )
+
 
 # 1. Engine Master (Escrita e Leituras Críticas)
-engine_master = create_async_engine(settings.DATABASE_WRITE_URL, echo=False)
-SessionMaster = async_sessionmaker(
-    bind=engine_master, class_=AsyncSession, expire_on_commit=False, autoflush=False
+engine_master = create_async_engine(
+    settings.DATABASE_WRITE_URL, echo=False, **_engine_options(settings.DATABASE_WRITE_URL)
 )
+SessionMaster = _session_factory(engine_master)
 
 # 2. Engines de Réplica (Apenas Leitura)
 engines_read = [
-    create_async_engine(url, echo=False) 
+    create_async_engine(url, echo=False, **_engine_options(url))
     for url in settings.get_read_urls
 ]
 # Se não houver réplicas (dev), usa o master como leitura também
 if not engines_read:
     engines_read = [engine_master]
 
+# Uma fábrica de sessão por réplica, criada UMA vez por processo
+SessionsRead = [_session_factory(engine) for engine in engines_read]
+
+# Roteador de leituras: saúde, atraso de replicação e carga de cada réplica
+read_router = build_replica_router(
+    list(zip(engines_read, SessionsRead)), (engine_master, SessionMaster)
+)
+
+# Latência por round trip ao banco, por engine (Prometheus)
+instrument_engine(engine_master, "master")
+for _engine in engines_read:
+    instrument_engine(_engine, f"replica:{_engine.url.host or _engine.url.database}")
+
 # Base para Models
 Base = declarative_base()
 
@@ -32,17 +64,11 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 # 4. Dependência de Banco de Dados (Leitura)
-# Injeta uma sessão conectada a uma RÉPLICA ALEATÓRIA
+# Injeta uma sessão na réplica escolhida pelo roteador (saudável, em dia e
+# com menos carga) ou no master se nenhuma estiver elegível
 async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
-    # Seleciona uma engine de leitura aleatoriamente (Load Balancing)
-    engine = random.choice(engines_read)
-    
-    SessionRead = async_sessionmaker(
-        bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
-    )
-    
-    async with SessionRead() as session:
+    async with read_router.session() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
@@ -1,10 +1,198 @@
+"""
+Codec das chaves curtas: id numérico <-> chave Sqids (ex.: "8kMx9").
+
+O formato é o do Sqids com KEY_ALPHABET e KEY_MIN_LENGTH, então chaves já
+gravadas continuam válidas. O Sqids recalcula o alfabeto rotacionado e varre
+a blocklist inteira (~560 palavras) a cada encode; aqui as tabelas por
+offset são montadas uma vez, a blocklist vira conjuntos por tamanho e o
+decode é memoizado. Chave que cai na blocklist (raro) é gerada pelo Sqids.
+"""
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
 from sqids import Sqids
+from sqids.constants import DEFAULT_BLOCKLIST
 
-# Gera IDs tipo "8kMx9" (mínimo 5 letras, base62)
+KEY_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+KEY_MIN_LENGTH = 5
+KEY_MAX_LENGTH = 10  # Tamanho da coluna urls.short_key
+KEY_DECODE_CACHE_SIZE = 65536
+_KEY_CHARS = frozenset(KEY_ALPHABET)
+
+# Referência (e fallback para ids que caem na blocklist)
 sqids = Sqids(
-    min_length=5,
-    alphabet="0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    min_length=KEY_MIN_LENGTH,
+    alphabet=KEY_ALPHABET
 )
 
+
+def _shuffle(alphabet: str) -> str:
+    """Embaralhamento determinístico do Sqids."""
+    chars = list(alphabet)
+    i, j = 0, len(chars) - 1
+    while j > 0:
+        r = (i * j + ord(chars[i]) + ord(chars[j])) % len(chars)
+        chars[i], chars[r] = chars[r], chars[i]
+        i += 1
+        j -= 1
+    return "".join(chars)
+
+
+class ShortKeyCodec:
+    """
+    Encode/decode de UM id por chave, compatível byte a byte com
+    `Sqids.encode([id])` / `Sqids.decode(key)`.
+
+    Para um único número o Sqids só depende de `id % len(alfabeto)` para
+    escolher o offset; daí saem o prefixo, o alfabeto dos dígitos (base 61)
+    e o padding até o tamanho mínimo - tudo pré-calculado por offset.
+    """
+
+    def __init__(self, alphabet: str, min_length: int, blocklist: Iterable[str] = DEFAULT_BLOCKLIST):
+        self.alphabet = _shuffle(alphabet)
+        self.min_length = min_length
+        size = len(self.alphabet)
+
+        # Offset do Sqids para um número: ord(alfabeto[id % n]) + 1 (len(numbers))
+        self._offsets = [(ord(self.alphabet[mod]) + 1) % size for mod in range(size)]
+        self._prefixes: List[str] = []
+        self._digits: List[str] = []
+        self._padding: List[str] = []
+        self._digit_values: List[Dict[str, int]] = []
+        self._offset_by_prefix: Dict[str, int] = {}
+        for offset in range(size):
+            rotated = (self.alphabet[offset:] + self.alphabet[:offset])[::-1]
+            digits = rotated[1:]
+            # Separador + alfabetos embaralhados em sequência, cortado no mínimo
+            padding, shuffled = rotated[0], rotated
+            while len(padding) < min_length:
+                shuffled = _shuffle(shuffled)
+                padding += shuffled
+            self._prefixes.append(self.alphabet[offset])
+            self._digits.append(digits)
+            self._padding.append(padding[:min_length])
+            self._digit_values.append({char: value for value, char in enumerate(digits)})
+            self._offset_by_prefix[self.alphabet[offset]] = offset
+        self._base = size - 1
+
+        # Blocklist do Sqids: palavras >= 3 letras, todas no alfabeto
+        alphabet_lower = alphabet.lower()
+        words = {
+            word.lower() for word in blocklist
+            if len(word) >= 3 and all(char in alphabet_lower for char in word.lower())
+        }
+        self._blocked_exact: Set[str] = words
+        self._blocked_affix: Dict[int, Set[str]] = {}   # Palavras com dígito: só prefixo/sufixo
+        self._blocked_infix: Dict[int, Set[str]] = {}   # Demais: em qualquer posição
+        for word in words:
+            if len(word) <= 3:
+                continue  # Só bloqueiam chaves idênticas a elas
+            group = self._blocked_affix if any(char.isdigit() for char in word) else self._blocked_infix
+            group.setdefault(len(word), set()).add(word)
+        self._fallback = Sqids(alphabet=alphabet, min_length=min_length, blocklist=list(blocklist))
+
+    def _is_blocked(self, key: str) -> bool:
+        key = key.lower()
+        size = len(key)
+        if size <= 3:
+            return key in self._blocked_exact
+        for length, words in self._blocked_affix.items():
+            if length <= size and (key[:length] in words or key[-length:] in words):
+                return True
+        for length, words in self._blocked_infix.items():
+            for start in range(size - length + 1):
+                if key[start:start + length] in words:
+                    return True
+        return False
+
+    def encode(self, number: int) -> str:
+        if not 0 <= number <= sys.maxsize:
+            raise ValueError(f"Encoding supports numbers between 0 and {sys.maxsize}")
+        offset = self._offsets[number % len(self.alphabet)]
+        digits, base = self._digits[offset], self._base
+        body, rest = [], number
+        while True:
+            rest, rem = divmod(rest, base)
+            body.append(digits[rem])
+            if not rest:
+                break
+        key = self._prefixes[offset] + "".join(reversed(body))
+        if len(key) < self.min_length:
+            key += self._padding[offset][:self.min_length - len(key)]
+        if self._is_blocked(key):
+            return self._fallback.encode([number])
+        return key
+
+    def encode_many(self, numbers: Sequence[int]) -> List[str]:
+        encode = self.encode
+        return [encode(number) for number in numbers]
+
+    def decode_unchecked(self, key: str) -> Optional[int]:
+        """Primeiro número da chave (como o Sqids leria), sem conferir se é canônica."""
+        offset = self._offset_by_prefix.get(key[:1])
+        if offset is None:
+            return None
+        body = key[1:].split(self._padding[offset][0], 1)[0]
+        if not body:
+            return None
+        values, base = self._digit_values[offset], self._base
+        number = 0
+        for char in body:
+            value = values.get(char)
+            if value is None:
+                return None
+            number = number * base + value
+        return number
+
+    def decode(self, key: str) -> Optional[int]:
+        """ID da chave, ou None se ela não for exatamente a que encode(id) geraria."""
+        number = self.decode_unchecked(key)
+        if number is None or number > sys.maxsize or self.encode(number) != key:
+            return None
+        return number
+
+
+codec = ShortKeyCodec(KEY_ALPHABET, KEY_MIN_LENGTH)
+
+
 def generate_short_key(db_id: int) -> str:
-    return sqids.encode([db_id])
\ No newline at end of file
+    return codec.encode(db_id)
+
+
+def generate_short_keys(db_ids: Sequence[int]) -> List[str]:
+    """Lote de chaves (criação em massa, back-fills) - mesma saída, em ordem."""
+    return codec.encode_many(db_ids)
+
+
+@lru_cache(maxsize=KEY_DECODE_CACHE_SIZE)
+def _decode_canonical(short_key: str) -> Optional[int]:
+    return codec.decode(short_key)
+
+
+def is_valid_short_key(short_key: str) -> bool:
+    """
+    Validação estrita, antes de qualquer cache ou banco: tamanho, alfabeto e
+    forma canônica (a chave é exatamente a que generate_short_key geraria).
+    """
+    return (
+        KEY_MIN_LENGTH <= len(short_key) <= KEY_MAX_LENGTH
+        and _KEY_CHARS.issuperset(short_key)
+        and _decode_canonical(short_key) is not None
+    )
+
+
+def decode_short_key(short_key: str) -> Optional[int]:
+    """
+    ID de origem da chave, ou None se ela não for canônica (não poderia ter
+    sido gerada por generate_short_key - o Sqids decodifica strings que não
+    gerou, então conferimos o caminho de volta).
+    """
+    if not (KEY_MIN_LENGTH <= len(short_key) <= KEY_MAX_LENGTH and _KEY_CHARS.issuperset(short_key)):
+        return None
+    return _decode_canonical(short_key)
+
+
+def decode_short_keys(short_keys: Iterable[str]) -> List[Optional[int]]:
+    """decode_short_key em lote, na ordem (None para chaves inválidas)."""
+    return [decode_short_key(short_key) for short_key in short_keys]
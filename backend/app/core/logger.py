@@ -1,17 +1,137 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.core.config import settings
+
+# Contexto da requisição (preenchido pelo middleware e pelo caminho do redirect)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+short_key_var: ContextVar[Optional[str]] = ContextVar("short_key", default=None)
+cache_tier_var: ContextVar[Optional[str]] = ContextVar("cache_tier", default=None)
+
+CONTEXT_VARS = (
+    ("request_id", request_id_var),
+    ("short_key", short_key_var),
+    ("cache_tier", cache_tier_var),
+)
+
+# Atributos de todo LogRecord; o que sobrar veio de `extra=` e vai para o JSON
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro (json.dumps: aspas e quebras de linha escapadas)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRS and value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Enfileira o registro sem fazer I/O no event loop.
+
+    O contexto (request_id, short_key, cache_tier) só existe na task que
+    logou, então é copiado para o registro aqui; a serialização e a escrita
+    no stdout ficam com a thread do QueueListener. Fila cheia (stdout lento)
+    descarta o registro e conta em `dropped`, em vez de bloquear.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        for name, var in CONTEXT_VARS:
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+        # Resolve a mensagem e a exceção agora: args/traceback não atravessam threads com segurança
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém uma fração `rate` dos registros abaixo de WARNING. Warnings e
+    erros passam sempre. Registros já sorteados por `sample()` (extra
+    sampled=True) também passam, para não serem amostrados duas vezes.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def sample(self) -> bool:
+        return self.rate >= 1 or random.random() < self.rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(record, "sampled", False):
+            return True
+        return self.sample()
+
 
 def setup_logger():
     logger = logging.getLogger("url_shortener")
-    logger.setLevel(logging.INFO)
-    
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.propagate = False
+
     # Formato JSON é melhor para ferramentas como Datadog/CloudWatch
-    handler = logging.StreamHandler(sys.stdout)
-    formatter = logging.Formatter(
-        '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}'
-    )
-    handler.setFormatter(formatter)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handler = ContextQueueHandler(log_queue)
     logger.addHandler(handler)
-    return logger
 
-logger = setup_logger()
\ No newline at end of file
+    # Escrita numa thread própria: stdout lento não trava o event loop
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Drena a fila ao sair
+    return logger, handler, listener
+
+
+logger, log_handler, log_listener = setup_logger()
+
+# Logs de redirect (alto volume): amostrados por LOG_REDIRECT_SAMPLE_RATE
+redirect_logger = logging.getLogger("url_shortener.redirect")
+redirect_sampler = SamplingFilter(settings.LOG_REDIRECT_SAMPLE_RATE)
+redirect_logger.addFilter(redirect_sampler)
+
+
+def log_redirect(short_key: str, status: int, cache_tier: Optional[str] = None) -> None:
+    """Registra um redirect servido. Sorteia antes de montar o registro."""
+    if not redirect_sampler.sample() or not redirect_logger.isEnabledFor(logging.INFO):
+        return
+    redirect_logger.info(
+        "redirect",
+        extra={"sampled": True, "short_key": short_key, "cache_tier": cache_tier, "status": status},
+    )
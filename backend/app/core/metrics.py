@@ -0,0 +1,319 @@
+"""
+Métricas Prometheus (expostas em GET /metrics).
+
+Caminho quente: histogramas e contadores com os labels JÁ resolvidos no
+import (`REDIS_HIT.observe(...)` não procura label nem aloca nada por
+requisição). O resto - contadores que os serviços já mantêm (L1, Bloom,
+cliques, pools...) - é lido só no scrape, por um collector customizado.
+
+Cada worker uvicorn tem seu próprio registro: o Prometheus deve raspar os
+workers individualmente (ou agregar por instância).
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# 25 µs .. 1 s: hits de L1 ficam nos primeiros buckets, banco nos do meio
+STAGE_BUCKETS = (
+    0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+# -----------------------------------------------------------------------------
+# Redirect
+# -----------------------------------------------------------------------------
+
+REDIRECT_STAGE = Histogram(
+    "shortener_redirect_stage_seconds",
+    "Latência de cada etapa do redirect, por resultado",
+    ["stage", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+L1_HIT = REDIRECT_STAGE.labels("l1", "hit")
+L1_MISS = REDIRECT_STAGE.labels("l1", "miss")
+REDIS_HIT = REDIRECT_STAGE.labels("redis", "hit")
+REDIS_MISS = REDIRECT_STAGE.labels("redis", "miss")
+REDIS_ERROR = REDIRECT_STAGE.labels("redis", "error")
+BLOOM_MAYBE = REDIRECT_STAGE.labels("bloom", "maybe")
+BLOOM_ABSENT = REDIRECT_STAGE.labels("bloom", "absent")
+BLOOM_ERROR = REDIRECT_STAGE.labels("bloom", "error")
+DB_FOUND = REDIRECT_STAGE.labels("db", "found")
+DB_NOT_FOUND = REDIRECT_STAGE.labels("db", "not_found")
+
+REDIRECTS = Counter(
+    "shortener_redirects",
+    "Redirects por caminho (fast = middleware ASGI, full = rota FastAPI) e resultado",
+    ["path", "outcome"],
+)
+FAST_HIT = REDIRECTS.labels("fast", "hit")
+FAST_FALLTHROUGH = REDIRECTS.labels("fast", "fallthrough")
+FULL_FOUND = REDIRECTS.labels("full", "found")
+FULL_NOT_FOUND = REDIRECTS.labels("full", "not_found")
+
+# -----------------------------------------------------------------------------
+# Criação
+# -----------------------------------------------------------------------------
+
+CREATE_STAGE = Histogram(
+    "shortener_create_stage_seconds",
+    "Latência de cada etapa da criação de uma URL",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+CREATE_ID = CREATE_STAGE.labels("allocate_id")
+CREATE_INSERT = CREATE_STAGE.labels("insert")
+CREATE_BLOOM = CREATE_STAGE.labels("bloom")
+CREATE_CACHE = CREATE_STAGE.labels("cache")
+CREATE_TOTAL = CREATE_STAGE.labels("total")
+
+DB_ROUND_TRIP = Histogram(
+    "shortener_db_round_trip_seconds",
+    "Latência de cada comando enviado ao banco, por engine",
+    ["engine"],
+    buckets=STAGE_BUCKETS,
+)
+
+# -----------------------------------------------------------------------------
+# Event loop
+# -----------------------------------------------------------------------------
+
+EVENT_LOOP_LAG = Histogram(
+    "shortener_event_loop_lag_seconds",
+    "Atraso do event loop (quanto um sleep acordou depois do previsto)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+# engine -> label ("master", "replica:<host>")
+engine_labels: Dict[AsyncEngine, str] = {}
+
+
+def instrument_engine(engine: AsyncEngine, label: str) -> None:
+    """Mede cada round trip ao banco (before/after_cursor_execute)."""
+    if engine in engine_labels:
+        return
+    engine_labels[engine] = label
+    child = DB_ROUND_TRIP.labels(label)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            child.observe(time.perf_counter() - starts.pop())
+
+
+class EventLoopLagMonitor:
+    """Dorme `interval` segundos em loop e registra quanto acordou atrasado."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, time.perf_counter() - start - self.interval)
+            EVENT_LOOP_LAG.observe(self.last_lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# -----------------------------------------------------------------------------
+# Collector (lido só no scrape)
+# -----------------------------------------------------------------------------
+
+def _counter(name: str, doc: str, value: float) -> CounterMetricFamily:
+    return CounterMetricFamily(name, doc, value=value)
+
+
+def _gauge(name: str, doc: str, value: float) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, doc, value=value)
+
+
+class ShortenerCollector:
+    """
+    Exporta os contadores que os componentes já mantêm em memória (cache L1,
+    política do Redis, Bloom, single-flight, cliques, analytics, alocador de
+    IDs, roteador de réplicas) e o estado dos pools do banco e do Redis.
+    """
+
+    def __init__(self, resources, local_cache=None, cache_policy=None, flight=None, lag_monitor=None):
+        self.resources = resources
+        self.local_cache = local_cache
+        self.cache_policy = cache_policy
+        self.flight = flight
+        self.lag_monitor = lag_monitor
+
+    def collect(self):
+        yield from self._local_cache()
+        yield from self._cache_policy()
+        yield from self._bloom()
+        yield from self._background()
+        yield from self._db_pools()
+        yield from self._redis_pool()
+        yield from self._replicas()
+        if self.flight is not None:
+            yield _counter("shortener_singleflight_calls", "Cargas no banco executadas", self.flight.calls)
+            yield _counter("shortener_singleflight_shared", "Chamadas que aproveitaram uma carga em andamento", self.flight.shared)
+        if self.lag_monitor is not None:
+            yield _gauge("shortener_event_loop_lag_last_seconds", "Último atraso medido do event loop", self.lag_monitor.last_lag)
+
+    def _local_cache(self):
+        cache = self.local_cache
+        if cache is None:
+            return
+        stats = cache.stats()
+        yield _counter("shortener_l1_cache_hits", "Hits do cache L1", stats["hits"])
+        yield _counter("shortener_l1_cache_misses", "Misses do cache L1", stats["misses"])
+        yield _counter("shortener_l1_cache_evictions", "Remoções por LRU", stats["evictions"])
+        yield _counter("shortener_l1_cache_expirations", "Remoções por TTL", stats["expirations"])
+        yield _gauge("shortener_l1_cache_entries", "Entradas no cache L1", stats["entries"])
+        yield _gauge("shortener_l1_cache_bytes", "Bytes aproximados no cache L1", stats["bytes"])
+        yield _gauge("shortener_l1_cache_hit_ratio", "Hit ratio do cache L1", stats["hit_ratio"])
+
+    def _cache_policy(self):
+        policy = self.cache_policy
+        if policy is None:
+            return
+        stats = policy.stats()
+        lookups = CounterMetricFamily(
+            "shortener_redis_cache_lookups", "Lookups no Redis por classe de TTL", labels=["ttl_class", "outcome"]
+        )
+        ratio = GaugeMetricFamily(
+            "shortener_redis_cache_hit_ratio", "Hit ratio do Redis por classe de TTL", labels=["ttl_class"]
+        )
+        for ttl_class, values in stats["classes"].items():
+            lookups.add_metric([ttl_class, "hit"], values["hits"])
+            lookups.add_metric([ttl_class, "miss"], values["misses"])
+            ratio.add_metric([ttl_class], values["hit_ratio"])
+        yield lookups
+        yield ratio
+        yield _counter("shortener_cache_promotions", "Chaves promovidas ao TTL quente", stats["promotions"])
+        yield _gauge("shortener_cache_hot_keys", "Chaves quentes conhecidas pelo worker", stats["hot_keys"])
+        yield _gauge("shortener_redis_memory_per_link_bytes", "MEMORY USAGE médio por link (amostrado)", stats["memory_per_link"])
+        yield _counter("shortener_cache_compressed_bytes_saved", "Bytes economizados pela compressão", stats["bytes_saved"])
+
+    def _bloom(self):
+        bloom = self.resources._bloom
+        if bloom is None:
+            return
+        yield _counter("shortener_bloom_checks", "Consultas ao Bloom Filter", bloom.checks)
+        yield _counter("shortener_bloom_negatives", "Respostas 'com certeza não existe'", bloom.negatives)
+        yield _counter("shortener_bloom_false_positives", "Falsos positivos observados", bloom.false_positives)
+        yield _gauge("shortener_bloom_observed_fp_rate", "Taxa de falsos positivos observada", bloom.observed_fp_rate)
+        yield _counter("shortener_bloom_unavailable", "Consultas com o filtro incompleto (sem sentinela)", bloom.unavailable)
+
+    def _background(self):
+        clicks = self.resources._click_counter
+        if clicks is not None:
+            yield _counter("shortener_clicks_recorded", "Cliques registrados em memória", clicks.recorded)
+            yield _counter("shortener_clicks_flushed", "Cliques gravados no banco", clicks.flushed)
+            yield _counter("shortener_clicks_flush_errors", "Flushes de cliques que falharam", clicks.flush_errors)
+            yield _counter("shortener_clicks_dropped", "Cliques descartados (buffer no limite)", clicks.dropped)
+            yield _gauge("shortener_clicks_pending", "Cliques aguardando flush", clicks.pending)
+        analytics = self.resources._analytics
+        if analytics is not None:
+            yield _counter("shortener_analytics_events", "Eventos de analytics registrados", analytics.recorded)
+            yield _counter("shortener_analytics_dropped", "Eventos descartados (ring buffer cheio)", analytics.dropped)
+            yield _counter("shortener_analytics_rows_flushed", "Linhas de rollup gravadas", analytics.flushed_rows)
+            yield _counter("shortener_analytics_flush_errors", "Flushes de analytics que falharam", analytics.flush_errors)
+        dedup = self.resources._deduplicator
+        if dedup is not None:
+            lookups = CounterMetricFamily(
+                "shortener_dedup_lookups", "Consultas de dedup por resultado", labels=["outcome"]
+            )
+            lookups.add_metric(["local_hit"], dedup.local_hits)
+            lookups.add_metric(["redis_hit"], dedup.redis_hits)
+            lookups.add_metric(["miss"], dedup.misses)
+            yield lookups
+        queue = self.resources._side_effects
+        if queue is not None:
+            stats = queue.stats()
+            yield _gauge("shortener_side_effects_depth", "Efeitos da criação na fila", stats["depth"])
+            yield _gauge("shortener_side_effects_lag_seconds", "Idade do efeito mais antigo na fila", stats["lag"])
+            yield _counter("shortener_side_effects_processed", "Efeitos executados pela fila", stats["processed"])
+            yield _counter("shortener_side_effects_retried", "Efeitos reenfileirados após falha", stats["retried"])
+            yield _counter("shortener_side_effects_dropped", "Efeitos descartados após max_attempts", stats["dropped"])
+            yield _counter("shortener_side_effects_inline", "Efeitos executados inline (fila cheia)", stats["rejected"])
+        limiter = self.resources._rate_limiter
+        if limiter is not None:
+            shed = CounterMetricFamily(
+                "shortener_rate_limited", "Requisições recusadas com 429", labels=["route", "reason"]
+            )
+            for (route, reason), count in limiter.shed.items():
+                shed.add_metric([route, reason], count)
+            yield shed
+            yield _counter("shortener_rate_limit_allowed", "Requisições dentro do limite", limiter.allowed)
+            yield _counter("shortener_rate_limit_sync_errors", "Syncs com o Redis que falharam", limiter.flush_errors)
+            yield _gauge("shortener_rate_limit_blocked_clients", "Clientes bloqueados pelo limite global", limiter.stats()["blocked_clients"])
+        allocator = self.resources._id_allocator
+        if allocator is not None:
+            yield _counter("shortener_id_block_leases", "Blocos de IDs alugados", allocator.leases)
+
+    def _db_pools(self):
+        checked_out = GaugeMetricFamily("shortener_db_pool_checked_out", "Conexões em uso", labels=["engine"])
+        idle = GaugeMetricFamily("shortener_db_pool_idle", "Conexões ociosas no pool", labels=["engine"])
+        capacity = GaugeMetricFamily("shortener_db_pool_capacity", "pool_size + max_overflow", labels=["engine"])
+        saturation = GaugeMetricFamily("shortener_db_pool_saturation", "Em uso / capacidade", labels=["engine"])
+        for engine, label in engine_labels.items():
+            pool = engine.sync_engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue  # NullPool/StaticPool (SQLite de dev/testes)
+            in_use = pool.checkedout()
+            limit = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+            checked_out.add_metric([label], in_use)
+            idle.add_metric([label], pool.checkedin())
+            capacity.add_metric([label], limit)
+            saturation.add_metric([label], in_use / limit if limit else 0.0)
+        yield checked_out
+        yield idle
+        yield capacity
+        yield saturation
+
+    def _redis_pool(self):
+        pool = self.resources._redis_pool
+        if pool is None:
+            return
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        yield _gauge("shortener_redis_pool_in_use", "Conexões Redis em uso", in_use)
+        yield _gauge("shortener_redis_pool_idle", "Conexões Redis ociosas", len(getattr(pool, "_available_connections", ())))
+        yield _gauge("shortener_redis_pool_saturation", "Em uso / max_connections", in_use / pool.max_connections)
+
+    def _replicas(self):
+        router = self.resources.read_router
+        healthy = GaugeMetricFamily("shortener_replica_healthy", "1 se a réplica está no rodízio", labels=["replica"])
+        lag = GaugeMetricFamily("shortener_replica_lag_seconds", "Atraso de replicação", labels=["replica"])
+        latency = GaugeMetricFamily("shortener_replica_probe_latency_seconds", "EWMA da latência do probe", labels=["replica"])
+        outstanding = GaugeMetricFamily("shortener_replica_outstanding", "Sessões abertas na réplica", labels=["replica"])
+        for replica in router.replicas:
+            healthy.add_metric([replica.name], float(replica.healthy))
+            lag.add_metric([replica.name], replica.lag)
+            latency.add_metric([replica.name], replica.latency)
+            outstanding.add_metric([replica.name], replica.outstanding)
+        yield healthy
+        yield lag
+        yield latency
+        yield outstanding
+        yield _counter("shortener_replica_master_reads", "Leituras no master por falta de réplica", router.master_reads)
+        yield _counter("shortener_replica_master_fallbacks", "Releituras no master após miss na réplica", router.master_fallbacks)
@@ -0,0 +1,208 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Atraso de replay em segundos. Réplica em dia (LSN recebido == aplicado)
+# conta como 0: sem escrita no master, now() - último replay cresceria à toa
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+# Erros que indicam réplica fora do ar (não erros de consulta)
+CONNECTION_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+
+class Replica:
+    """Estado de uma réplica visto por este worker."""
+
+    def __init__(self, engine: AsyncEngine, session_factory: async_sessionmaker):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.name = engine.url.host or engine.url.database or "replica"
+        self.healthy = True
+        self.lag = 0.0
+        self.latency = 0.001  # EWMA do tempo de probe (s)
+        self.outstanding = 0  # Sessões abertas agora
+        self.failures = 0     # Falhas seguidas
+
+    def score(self) -> float:
+        # Menos requisições em andamento, ponderado pela latência
+        return (self.outstanding + 1) * self.latency
+
+    def __repr__(self):
+        return (
+            f"<Replica(name='{self.name}', healthy={self.healthy}, lag={self.lag:.2f}, "
+            f"latency={self.latency * 1000:.1f}ms, outstanding={self.outstanding})>"
+        )
+
+
+class ReplicaRouter:
+    """
+    Escolhe a réplica de cada sessão de leitura.
+
+    Um probe periódico mede latência e atraso de replicação de cada réplica.
+    Réplicas com `eject_after` falhas seguidas (probe ou conexão durante uma
+    requisição) ou atrasadas mais que `max_lag` saem do rodízio e voltam
+    sozinhas no primeiro probe bom. Entre as elegíveis, vence a de menor
+    (requisições em andamento + 1) x latência. Sem nenhuma elegível, lê do
+    master.
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[Tuple[AsyncEngine, async_sessionmaker]],
+        master: Tuple[AsyncEngine, async_sessionmaker],
+        max_lag: float = 5.0,
+        probe_interval: float = 2.0,
+        probe_timeout: float = 1.0,
+        eject_after: int = 3,
+        alpha: float = 0.2,
+    ):
+        self.replicas: List[Replica] = [Replica(engine, factory) for engine, factory in replicas]
+        self.master_engine, self.master_factory = master
+        self.max_lag = max_lag
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.eject_after = eject_after
+        self.alpha = alpha
+        self._task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self.master_reads = 0      # Leituras que caíram no master por falta de réplica
+        self.master_fallbacks = 0  # Releituras no master após miss na réplica
+
+    def eligible(self) -> List[Replica]:
+        return [r for r in self.replicas if r.healthy and r.lag <= self.max_lag]
+
+    def pick(self) -> Optional[Replica]:
+        candidates = self.eligible()
+        if not candidates:
+            return None
+        # Desempate aleatório para não concentrar tudo na primeira com carga baixa
+        return min(candidates, key=lambda r: (r.score(), random.random()))
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Sessão de leitura na melhor réplica (ou no master)."""
+        replica = self.pick()
+        if replica is None:
+            self.master_reads += 1
+            async with self.master_factory() as session:
+                yield session
+            return
+
+        replica.outstanding += 1
+        try:
+            async with replica.session_factory() as session:
+                yield session
+        except CONNECTION_ERRORS:
+            self._record_failure(replica)
+            raise
+        finally:
+            replica.outstanding -= 1
+
+    def master_session(self) -> AsyncSession:
+        """Sessão no master para reler uma chave que a réplica ainda não tem."""
+        self.master_fallbacks += 1
+        return self.master_factory()
+
+    def is_master(self, engine: AsyncEngine) -> bool:
+        return engine is self.master_engine
+
+    def _record_failure(self, replica: Replica) -> None:
+        replica.failures += 1
+        if replica.healthy and replica.failures >= self.eject_after:
+            replica.healthy = False
+            logger.warning(f"Réplica {replica.name} ejetada após {replica.failures} falhas")
+
+    async def probe(self, replica: Replica) -> None:
+        """Health check + atraso de replicação de uma réplica."""
+        start = time.perf_counter()
+        try:
+            lag = await asyncio.wait_for(self._measure_lag(replica.engine), self.probe_timeout)
+        except Exception as e:
+            self._record_failure(replica)
+            logger.debug(f"Probe da réplica {replica.name} falhou: {e}")
+            return
+
+        replica.latency += self.alpha * (time.perf_counter() - start - replica.latency)
+        replica.lag = lag
+        replica.failures = 0
+        if not replica.healthy:
+            replica.healthy = True
+            logger.info(f"Réplica {replica.name} readmitida (lag {lag:.2f}s)")
+
+    @staticmethod
+    async def _measure_lag(engine: AsyncEngine) -> float:
+        async with engine.connect() as conn:
+            if engine.dialect.name != "postgresql":
+                await conn.execute(text("SELECT 1"))
+                return 0.0
+            result = await conn.execute(LAG_QUERY)
+            return float(result.scalar_one())
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*[self.probe(replica) for replica in self.replicas])
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.probe_all()
+
+    def start(self) -> None:
+        if self._task is None and self.replicas:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [
+                {
+                    "name": r.name,
+                    "healthy": r.healthy,
+                    "lag": r.lag,
+                    "latency": r.latency,
+                    "outstanding": r.outstanding,
+                }
+                for r in self.replicas
+            ],
+            "master_reads": self.master_reads,
+            "master_fallbacks": self.master_fallbacks,
+        }
+
+
+def build_replica_router(
+    replicas: Sequence[Tuple[AsyncEngine, async_sessionmaker]],
+    master: Tuple[AsyncEngine, async_sessionmaker],
+) -> ReplicaRouter:
+    return ReplicaRouter(
+        replicas,
+        master,
+        max_lag=settings.REPLICA_MAX_LAG,
+        probe_interval=settings.REPLICA_PROBE_INTERVAL,
+        probe_timeout=settings.REPLICA_PROBE_TIMEOUT,
+        eject_after=settings.REPLICA_EJECT_AFTER,
+    )
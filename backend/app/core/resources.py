@@ -0,0 +1,329 @@
+import asyncio
+import os
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis, from_url
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import (
+    engine_master, engines_read, read_router, SessionMaster, SessionsRead
+)
+from app.core.logger import logger
+from app.core.metrics import EventLoopLagMonitor
+from app.services.analytics import ClickAnalytics
+from app.services.bloom_filter import AnyBloomFilter, build_bloom_filter, restore_snapshot
+from app.services.cache_policy import cache_policy
+from app.services.click_counter import ClickCounter
+from app.services.dedup import URLDeduplicator
+from app.services.id_allocator import DatabaseBlockSource, IdAllocator, RedisBlockSource
+from app.services.local_cache import LocalCache, local_cache
+from app.services.side_effects import SideEffectQueue
+from app.services.rate_limiter import CREATE, REDIRECT, RateLimiter, RouteLimit
+from app.services.warmup import CacheWarmer
+
+# Só um worker por deploy faz o warm-up (os demais encontram o lock)
+WARMUP_LOCK_KEY = "warmup:lock"
+WARMUP_LOCK_TTL = 300
+
+
+class Resources:
+    """
+    Recursos de vida longa do processo (um por worker uvicorn).
+
+    Dono do pool de conexões do Redis e das fábricas de sessão já montadas
+    para o master e cada réplica. Abre conexões no startup (pre-warm) e fecha
+    tudo no shutdown, para que nenhuma requisição pague a criação de pool.
+    """
+
+    def __init__(self):
+        self.session_master = SessionMaster
+        self.sessions_read = SessionsRead
+        self.read_router = read_router
+        self._redis_pool: Optional[ConnectionPool] = None
+        self._redis: Optional[Redis] = None
+        self._redis_binary: Optional[Redis] = None
+        self._bloom: Optional[AnyBloomFilter] = None
+        self._id_allocator: Optional[IdAllocator] = None
+        self._click_counter: Optional[ClickCounter] = None
+        self._analytics: Optional[ClickAnalytics] = None
+        self._deduplicator: Optional[URLDeduplicator] = None
+        self._rate_limiter: Optional[RateLimiter] = None
+        self._side_effects: Optional[SideEffectQueue] = None
+        self._bloom_restore: Optional[asyncio.Task] = None
+        self.loop_monitor = EventLoopLagMonitor(settings.METRICS_LOOP_LAG_INTERVAL)
+
+    @property
+    def redis(self) -> Redis:
+        """Cliente Redis compartilhado (criado sob demanda, sem conectar)."""
+        if self._redis is None:
+            self._redis_pool = ConnectionPool.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+            )
+            self._redis = Redis(connection_pool=self._redis_pool)
+        return self._redis
+
+    @property
+    def redis_binary(self) -> Redis:
+        """Cliente sem decode (bytes crus), para snapshots e dados binários."""
+        if self._redis_binary is None:
+            self._redis_binary = from_url(
+                settings.REDIS_URL, decode_responses=False, max_connections=4
+            )
+        return self._redis_binary
+
+    @property
+    def bloom(self) -> Optional[AnyBloomFilter]:
+        """Bloom Filter compartilhado (None se BLOOM_ENABLED=False)."""
+        if not settings.BLOOM_ENABLED:
+            return None
+        if self._bloom is None:
+            self._bloom = build_bloom_filter(self.redis)
+        return self._bloom
+
+    @property
+    def id_allocator(self) -> Optional[IdAllocator]:
+        """Alocador de IDs do worker (None se ID_ALLOCATOR='none')."""
+        if settings.ID_ALLOCATOR == "none":
+            return None
+        if self._id_allocator is None:
+            if settings.ID_ALLOCATOR == "redis":
+                source = RedisBlockSource(self.redis, self.session_master)
+            else:
+                source = DatabaseBlockSource(self.session_master)
+            self._id_allocator = IdAllocator(source, block_size=settings.ID_BLOCK_SIZE)
+        return self._id_allocator
+
+    @property
+    def click_counter(self) -> Optional[ClickCounter]:
+        """Contador de cliques write-behind (None se desabilitado)."""
+        if not settings.CLICK_COUNTING_ENABLED:
+            return None
+        if self._click_counter is None:
+            self._click_counter = ClickCounter(
+                self.session_master,
+                redis_client=self.redis,
+                flush_interval=settings.CLICK_FLUSH_INTERVAL,
+                batch_size=settings.CLICK_FLUSH_BATCH,
+                max_pending_keys=settings.CLICK_MAX_PENDING_KEYS,
+                max_buffered_keys=settings.CLICK_MAX_BUFFERED_KEYS,
+                track_uniques=settings.CLICK_TRACK_UNIQUES,
+            )
+        return self._click_counter
+
+    @property
+    def analytics(self) -> Optional[ClickAnalytics]:
+        """Agregador de séries temporais de cliques (None se desabilitado)."""
+        if not settings.ANALYTICS_ENABLED:
+            return None
+        if self._analytics is None:
+            self._analytics = ClickAnalytics(
+                self.session_master,
+                buffer_size=settings.ANALYTICS_BUFFER_SIZE,
+                flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+                batch_size=settings.ANALYTICS_FLUSH_BATCH,
+            )
+        return self._analytics
+
+    @property
+    def deduplicator(self) -> Optional[URLDeduplicator]:
+        """Hashes de URLs recém-encurtadas (None se DEDUP_ENABLED=False)."""
+        if not settings.DEDUP_ENABLED:
+            return None
+        if self._deduplicator is None:
+            self._deduplicator = URLDeduplicator(
+                self.redis,
+                local=LocalCache(max_entries=settings.DEDUP_LOCAL_SIZE, ttl=settings.DEDUP_TTL),
+                ttl=settings.DEDUP_TTL,
+            )
+        return self._deduplicator
+
+    @property
+    def side_effects(self) -> Optional[SideEffectQueue]:
+        """Fila dos efeitos da criação (None se SIDE_EFFECTS_ASYNC=False)."""
+        if not settings.SIDE_EFFECTS_ASYNC:
+            return None
+        if self._side_effects is None:
+            self._side_effects = SideEffectQueue(
+                capacity=settings.SIDE_EFFECTS_CAPACITY,
+                batch_size=settings.SIDE_EFFECTS_BATCH,
+                flush_interval=settings.SIDE_EFFECTS_INTERVAL,
+                max_attempts=settings.SIDE_EFFECTS_MAX_ATTEMPTS,
+                backoff=settings.SIDE_EFFECTS_BACKOFF,
+            )
+        return self._side_effects
+
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """Rate limit por cliente (None se RATE_LIMIT_ENABLED=False)."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        if self._rate_limiter is None:
+            self._rate_limiter = RateLimiter(
+                self.redis,
+                {
+                    CREATE: RouteLimit(settings.RATE_LIMIT_CREATE, settings.RATE_LIMIT_CREATE_BURST),
+                    REDIRECT: RouteLimit(settings.RATE_LIMIT_REDIRECT, settings.RATE_LIMIT_REDIRECT_BURST),
+                },
+                window=settings.RATE_LIMIT_WINDOW,
+                sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL,
+                max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+            )
+        return self._rate_limiter
+
+    def cache_warmer(self) -> CacheWarmer:
+        """Warm-up lendo das réplicas (via roteador) e gravando no Redis e no L1."""
+        return CacheWarmer(
+            self.read_router.session,
+            self.redis,
+            cache_policy,
+            local_cache=local_cache,
+            chunk_size=settings.WARMUP_CHUNK_SIZE,
+            concurrency=settings.WARMUP_CONCURRENCY,
+            lock_key=WARMUP_LOCK_KEY,
+            lock_ttl=WARMUP_LOCK_TTL,
+        )
+
+    def record_click(
+        self,
+        short_key: str,
+        visitor: Optional[str] = None,
+        referrer: Optional[str] = None,
+        country: Optional[str] = None,
+    ) -> None:
+        """Registra um redirect servido (contador + analytics), sem I/O."""
+        if self.click_counter is not None:
+            self.click_counter.record(short_key, visitor)
+        if self.analytics is not None:
+            self.analytics.record(short_key, referrer=referrer, country=country)
+
+    @property
+    def engines(self) -> list:
+        # O master pode aparecer em engines_read (dev sem réplicas)
+        return list(dict.fromkeys([engine_master, *engines_read]))
+
+    async def startup(self) -> None:
+        """Pre-warm: abre conexões antes da primeira requisição."""
+        try:
+            await asyncio.gather(
+                *[self.redis.ping() for _ in range(settings.REDIS_POOL_PREWARM)]
+            )
+        except Exception as e:
+            logger.warning(f"Redis pre-warm falhou: {e}")
+
+        for engine in self.engines:
+            try:
+                await asyncio.gather(
+                    *[self._touch(engine) for _ in range(settings.DB_POOL_PREWARM)]
+                )
+            except Exception as e:
+                logger.warning(f"DB pre-warm falhou ({engine.url.host}): {e}")
+
+        # Primeira rodada de probes já no startup: réplica fora do ar nem entra
+        await self.read_router.probe_all()
+        self.read_router.start()
+
+        await self._warm_start_bloom()
+        await self._warm_up_cache()
+
+        if self.click_counter is not None:
+            self.click_counter.start()
+        if self.analytics is not None:
+            self.analytics.start()
+        if self.rate_limiter is not None:
+            self.rate_limiter.start()
+        if self.side_effects is not None:
+            self.side_effects.start()
+        if settings.METRICS_ENABLED:
+            self.loop_monitor.start()
+
+    async def _warm_start_bloom(self) -> None:
+        """
+        Restaura o snapshot local do Bloom Filter se ele sumiu do Redis. O
+        back-fill do que veio depois do snapshot roda em background; até ele
+        gravar a sentinela, os redirects ignoram o filtro e consultam o banco.
+        """
+        path = settings.BLOOM_SNAPSHOT_PATH
+        if not path or self.bloom is None or not os.path.exists(path):
+            return
+        try:
+            if await self.redis.exists(*self.bloom.keys()):
+                return
+        except Exception as e:
+            logger.warning(f"Warm-start do Bloom Filter falhou: {e}")
+            return
+        self._bloom_restore = asyncio.ensure_future(self._restore_bloom(path))
+
+    async def _restore_bloom(self, path: str) -> None:
+        try:
+            # Do master (ver backfill_bloom): réplica atrasada deixaria chaves de fora
+            added = await restore_snapshot(self.bloom, path, self.redis_binary, self.session_master)
+            logger.info(f"Bloom Filter restaurado do snapshot {path} (+{added} chaves recentes)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Warm-start do Bloom Filter falhou: {e}")
+
+    async def _warm_up_cache(self) -> None:
+        """
+        Pré-carrega as chaves quentes (WARMUP_ON_STARTUP). Todo worker enche o
+        próprio L1; o lock da frota só evita gravações repetidas no Redis.
+        """
+        if not settings.WARMUP_ON_STARTUP:
+            return
+        try:
+            await self.cache_warmer().run(
+                settings.WARMUP_SOURCE, settings.WARMUP_TOP_N, settings.WARMUP_ACCESS_LOG
+            )
+        except Exception as e:
+            logger.warning(f"Warm-up do cache falhou: {e}")
+
+    @staticmethod
+    async def _touch(engine) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def shutdown(self) -> None:
+        await self.loop_monitor.stop()
+        if self._bloom_restore is not None:
+            # Interrompido, o filtro fica sem sentinela: o próximo startup refaz
+            self._bloom_restore.cancel()
+            self._bloom_restore = None
+
+        # Drena efeitos da criação, cliques e analytics ANTES de fechar Redis e engines
+        if self._side_effects is not None:
+            await self._side_effects.stop()
+            self._side_effects = None
+        if self._click_counter is not None:
+            await self._click_counter.stop()
+            self._click_counter = None
+        if self._analytics is not None:
+            await self._analytics.stop()
+            self._analytics = None
+        if self._rate_limiter is not None:
+            await self._rate_limiter.stop()
+            self._rate_limiter = None
+
+        await self.read_router.stop()
+
+        if self._id_allocator is not None:
+            await self._id_allocator.close()
+            self._id_allocator = None
+
+        if self._redis_pool is not None:
+            await self._redis_pool.disconnect()
+            self._redis_pool = None
+            self._redis = None
+            self._bloom = None
+            self._deduplicator = None
+        if self._redis_binary is not None:
+            await self._redis_binary.connection_pool.disconnect()
+            self._redis_binary = None
+
+        for engine in self.engines:
+            await engine.dispose()
+
+
+resources = Resources()
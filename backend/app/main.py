@@ -1,14 +1,45 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from app.api.fast_redirect import FastRedirectMiddleware
+from app.api.rate_limit import RateLimitMiddleware
+from app.api.request_context import RequestContextMiddleware
+from app.api.v1.admin import router as admin_router
 from app.api.v1.endpoints import router
+from app.core.config import settings
 from app.core.database import engine_master, Base
+from app.core.metrics import ShortenerCollector
+from app.core.resources import resources
+from app.services.cache_policy import cache_policy
+from app.services.local_cache import local_cache
+from app.services.single_flight import redirect_flight
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida do worker.
+    Startup: cria as tabelas (apenas para desenvolvimento - em produção, use
+    Alembic para migrações controladas) e abre os pools (pre-warm).
+    Shutdown: fecha o pool do Redis e descarta as engines.
+    """
+    async with engine_master.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await resources.startup()
+    yield
+    await resources.shutdown()
 
 app = FastAPI(
     title="URL Shortener High-Scale",
     description="Implementação robusta baseada em SOLID e Clean Architecture",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Redirects com hit de cache saem direto do middleware (sem DI nem sessão);
+# misses seguem para a rota GET /{short_key}
+app.add_middleware(FastRedirectMiddleware)
+
 # -----------------------------------------------------------------------------
 # SEGURANÇA: Configuração de CORS (Cross-Origin Resource Sharing)
 # -----------------------------------------------------------------------------
@@ -30,18 +61,32 @@ app.add_middleware(
     allow_headers=["*"],              # Permite headers comuns (Content-Type, etc)
 )
 
-@app.on_event("startup")
-async def startup():
-    """
-    Cria as tabelas no banco de dados (apenas para desenvolvimento).
-    Em produção, use Alembic para migrações controladas.
-    """
-    async with engine_master.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+# Rate limit antes do caminho rápido: cliente acima do limite recebe 429
+# sem tocar em cache nem banco
+app.add_middleware(RateLimitMiddleware)
+
+# Por último = mais externo: request_id disponível para todos os logs
+app.add_middleware(RequestContextMiddleware)
 
 @app.get("/health")
 async def health_check():
     """Endpoint de health check para o Load Balancer"""
     return {"status": "healthy", "service": "url-shortener"}
 
+if settings.METRICS_ENABLED:
+    # Contadores dos componentes lidos só no scrape (nada roda por requisição)
+    REGISTRY.register(ShortenerCollector(
+        resources,
+        local_cache=local_cache,
+        cache_policy=cache_policy,
+        flight=redirect_flight,
+        lag_monitor=resources.loop_monitor,
+    ))
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Métricas no formato texto do Prometheus (por worker)"""
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+app.include_router(admin_router)
 app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,36 @@
+from sqlalchemy import BigInteger, Column, DateTime, String
+from app.core.database import Base
+from app.models.partitions import create_hash_partitions
+
+# Partições por hash da chave: as consultas de /stats sempre filtram por
+# short_key, então cada uma toca uma única partição (e índices menores)
+ROLLUP_PARTITIONS = 16
+
+class ClickRollup(Base):
+    """
+    Cliques pré-agregados por (link, granularidade, bucket, dimensão, valor).
+
+    granularity: 'm' (minuto), 'h' (hora) ou 'd' (dia).
+    dimension: 'total' (value vazio), 'referrer' (host) ou 'country'.
+
+    A PK composta começa por (short_key, granularity, bucket_start): a série
+    de um link num intervalo é uma varredura de intervalo no índice, sem
+    contar linhas cruas.
+    """
+    __tablename__ = "url_click_rollups"
+    __table_args__ = {"postgresql_partition_by": "HASH (short_key)"}
+
+    short_key = Column(String(16), primary_key=True)
+    granularity = Column(String(1), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    dimension = Column(String(16), primary_key=True)
+    value = Column(String(255), primary_key=True, default="")
+    count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<ClickRollup(short_key='{self.short_key}', granularity='{self.granularity}', "
+            f"bucket_start={self.bucket_start}, dimension='{self.dimension}', count={self.count})>"
+        )
+
+create_hash_partitions(ClickRollup.__table__, ROLLUP_PARTITIONS)
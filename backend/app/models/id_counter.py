@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, BigInteger
+from app.core.database import Base
+
+class IdCounter(Base):
+    """
+    Contador persistido de IDs. No SQLite de dev emula a sequence (reserve_ids
+    e os blocos do IdAllocator saem daqui); no Postgres a fonte é urls_id_seq
+    e o import só o mantém acima do maior id carregado.
+    `next_value` é o primeiro ID ainda não entregue: avançá-lo no commit É a
+    persistência da reserva, então um restart nunca reusa IDs.
+    """
+    __tablename__ = "id_counters"
+
+    name = Column(String(50), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<IdCounter(name='{self.name}', next_value={self.next_value})>"
@@ -0,0 +1,19 @@
+from sqlalchemy import DDL, Table, event
+
+
+def create_hash_partitions(table: Table, partitions: int) -> None:
+    """
+    Tabela particionada por HASH no Postgres não aceita linhas sem partição:
+    cria as `partitions` partições ({tabela}_p0..) junto com a tabela
+    (create_all de dev; as migrações fazem o mesmo). Fora do Postgres, nada.
+    """
+    for remainder in range(partitions):
+        event.listen(
+            table,
+            "after_create",
+            DDL(
+                f"CREATE TABLE IF NOT EXISTS {table.name}_p{remainder} "
+                f"PARTITION OF {table.name} "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            ).execute_if(dialect="postgresql"),
+        )
@@ -1,16 +1,53 @@
-from sqlalchemy import Column, String, BigInteger, DateTime, Integer
+from sqlalchemy import Column, String, BigInteger, DateTime, Integer, LargeBinary, SmallInteger
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.partitions import create_hash_partitions
+
+# Partições por hash do id. A chave curta é o id codificado (Sqids), então
+# toda busca por chave vira "WHERE id = ..." e toca uma única partição
+URL_PARTITIONS = 32
 
 class URL(Base):
     __tablename__ = "urls"
+    __table_args__ = {"postgresql_partition_by": "HASH (id)"}
 
     # BigInteger é essencial para suportar "1000 Bilhões" de registros
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    # (no SQLite de dev/testes só INTEGER PRIMARY KEY é autoincremento)
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True, autoincrement=True
+    )
     original_url = Column(String, nullable=False)
-    short_key = Column(String(10), unique=True, index=True, nullable=True)
-    clicks = Column(Integer, default=0)
+    # Sem índice: é derivada do id (único) e as buscas decodificam a chave.
+    # Tabela particionada também não aceitaria UNIQUE sem a coluna de partição
+    short_key = Column(String(10), nullable=True)
+    # Indexado para o ranking do warm-up (ORDER BY clicks DESC LIMIT N)
+    clicks = Column(Integer, default=0, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Status do redirect deste link (301/302/307/308); NULL = REDIRECT_STATUS
+    redirect_status = Column(SmallInteger, nullable=True)
 
     def __repr__(self):
-        return f"<URL(id={self.id}, short_key='{self.short_key}', original_url='{self.original_url}')>"
\ No newline at end of file
+        return f"<URL(id={self.id}, short_key='{self.short_key}', original_url='{self.original_url}')>"
+
+
+class URLHash(Base):
+    """
+    Índice de deduplicação: blake2b(original_url) -> chave (DEDUP_ENABLED).
+
+    Tabela própria, particionada pelo próprio hash: a PK garante que a mesma
+    URL longa nunca ganha duas chaves, o que um índice único em `urls` (por
+    id) não conseguiria.
+    """
+    __tablename__ = "url_hashes"
+    __table_args__ = {"postgresql_partition_by": "HASH (url_hash)"}
+
+    url_hash = Column(LargeBinary(16), primary_key=True)
+    short_key = Column(String(10), nullable=False)
+
+    def __repr__(self):
+        return f"<URLHash(url_hash={self.url_hash.hex()}, short_key='{self.short_key}')>"
+
+
+create_hash_partitions(URL.__table__, URL_PARTITIONS)
+create_hash_partitions(URLHash.__table__, URL_PARTITIONS)
@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.click_rollup import ClickRollup
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite devolve datetimes sem fuso; tudo é gravado em UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class ClickRollupRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def series(
+        self, short_key: str, granularity: str, start: datetime, end: datetime
+    ) -> List[Tuple[datetime, int]]:
+        """Série total do link no intervalo [start, end) - varredura da PK."""
+        result = await self.db.execute(
+            select(ClickRollup.bucket_start, ClickRollup.count)
+            .where(
+                ClickRollup.short_key == short_key,
+                ClickRollup.granularity == granularity,
+                ClickRollup.bucket_start >= start,
+                ClickRollup.bucket_start < end,
+                ClickRollup.dimension == "total",
+            )
+            .order_by(ClickRollup.bucket_start)
+        )
+        return [(_as_utc(bucket), count) for bucket, count in result.all()]
+
+    async def top_values(
+        self,
+        short_key: str,
+        granularity: str,
+        dimension: str,
+        start: datetime,
+        end: datetime,
+        limit: int = 10,
+    ) -> List[Tuple[str, int]]:
+        """Valores mais frequentes de uma dimensão (referrer, country) no intervalo."""
+        total = func.sum(ClickRollup.count).label("total")
+        result = await self.db.execute(
+            select(ClickRollup.value, total)
+            .where(
+                ClickRollup.short_key == short_key,
+                ClickRollup.granularity == granularity,
+                ClickRollup.bucket_start >= start,
+                ClickRollup.bucket_start < end,
+                ClickRollup.dimension == dimension,
+            )
+            .group_by(ClickRollup.value)
+            .order_by(total.desc(), ClickRollup.value)
+            .limit(limit)
+        )
+        return [(value, int(count)) for value, count in result.all()]
@@ -1,31 +1,185 @@
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import func, insert, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models.url import URL
+from app.core.keygen import decode_short_key, decode_short_keys
+from app.models.id_counter import IdCounter
+from app.models.url import URL, URLHash
 
 class URLRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def create(self, original_url: str) -> URL:
-        # Apenas cria o registro para obter o ID (estratégia de ID incremental)
-        # Em arquitetura distribuída (Zookeeper), o ID viria de fora.
-        db_url = URL(original_url=original_url)
-        self.db.add(db_url)
-        await self.db.commit()
-        await self.db.refresh(db_url)
-        return db_url
-
-    async def update_short_key(self, url_id: int, short_key: str):
-        query = select(URL).where(URL.id == url_id)
-        result = await self.db.execute(query)
-        db_url = result.scalar_one_or_none()
-        if db_url:
-            db_url.short_key = short_key
+    async def reserve_id(self) -> int:
+        """
+        Reserva o próximo ID ANTES do INSERT, para a chave ser calculada
+        antes e a linha ser gravada uma única vez.
+        Em arquitetura distribuída (Zookeeper), o ID viria de fora.
+        """
+        return (await self.reserve_ids(1))[0]
+
+    async def reserve_ids(self, count: int) -> List[int]:
+        """
+        Reserva `count` IDs de uma vez (um round trip no Postgres). A fonte é
+        sempre a mesma dos blocos do IdAllocator e do DEFAULT da coluna: a
+        sequence urls_id_seq no Postgres, o contador de id_counters no SQLite.
+        """
+        if self.db.bind.dialect.name == "postgresql":
+            result = await self.db.execute(
+                text("SELECT nextval('urls_id_seq') FROM generate_series(1, :n)"),
+                {"n": count},
+            )
+            return list(result.scalars())
+        # SQLite (dev/testes) não tem sequence: id_counters faz o papel dela
+        start = await self._advance_counter(count)
+        return list(range(start, start + count))
+
+    async def _advance_counter(self, count: int, name: str = "urls") -> int:
+        """Avança o contador em `count` e devolve o primeiro ID reservado (commitado)."""
+        for _ in range(3):
+            result = await self.db.execute(
+                update(IdCounter)
+                .where(IdCounter.name == name)
+                .values(next_value=IdCounter.next_value + count)
+                .returning(IdCounter.next_value)
+            )
+            next_value = result.scalar_one_or_none()
+            if next_value is not None:
+                await self.db.commit()
+                return next_value - count
+
+            # Primeira reserva: semeia o contador acima do maior ID existente
+            await self.db.rollback()
+            start = (await self.db.execute(select(func.coalesce(func.max(URL.id), 0) + 1))).scalar_one()
+            try:
+                await self.db.execute(insert(IdCounter).values(name=name, next_value=start + count))
+                await self.db.commit()
+                return start
+            except IntegrityError:
+                # Outro worker semeou ao mesmo tempo: tenta o UPDATE de novo
+                await self.db.rollback()
+        raise RuntimeError(f"Não foi possível reservar IDs do contador '{name}'")
+
+    async def create(
+        self,
+        original_url: str,
+        url_id: int,
+        short_key: str,
+        url_hash: Optional[bytes] = None,
+        redirect_status: Optional[int] = None,
+    ) -> URL:
+        """
+        Grava a linha completa (id + chave) num único INSERT e commit. Com
+        `url_hash`, o hash entra em url_hashes na mesma transação; hash
+        repetido (IntegrityError) desfaz tudo e sobe.
+        """
+        try:
+            if url_hash is not None:
+                await self.db.execute(insert(URLHash).values(url_hash=url_hash, short_key=short_key))
+            await self.db.execute(
+                insert(URL).values(
+                    id=url_id, original_url=original_url, short_key=short_key,
+                    redirect_status=redirect_status,
+                )
+            )
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            raise
+        return URL(
+            id=url_id, original_url=original_url, short_key=short_key, clicks=0,
+            redirect_status=redirect_status,
+        )
+
+    async def bulk_create(
+        self, rows: Sequence[Tuple[int, str, str]], url_hashes: Optional[Sequence[bytes]] = None
+    ) -> None:
+        """
+        Grava vários (id, original_url, short_key) num só commit. O SQLAlchemy
+        agrupa a lista num INSERT multi-linha (insertmanyvalues).
+        """
+        try:
+            if url_hashes is not None:
+                await self.db.execute(
+                    insert(URLHash),
+                    [
+                        {"url_hash": url_hash, "short_key": short_key}
+                        for url_hash, (_, _, short_key) in zip(url_hashes, rows)
+                    ],
+                )
+            await self.db.execute(
+                insert(URL),
+                [
+                    {"id": url_id, "original_url": original_url, "short_key": short_key}
+                    for url_id, original_url, short_key in rows
+                ],
+            )
             await self.db.commit()
-            await self.db.refresh(db_url)
-        return db_url
+        except IntegrityError:
+            await self.db.rollback()
+            raise
 
     async def get_by_key(self, short_key: str) -> URL:
-        query = select(URL).where(URL.short_key == short_key)
-        result = await self.db.execute(query)
-        return result.scalar_one_or_none()
\ No newline at end of file
+        """
+        Decodifica a chave no id e busca pela PK: no Postgres o planner poda
+        para a única partição que pode conter o id. Chave não canônica nem
+        chega ao banco.
+        """
+        url_id = decode_short_key(short_key)
+        if url_id is None:
+            return None
+        result = await self.db.execute(select(URL).where(URL.id == url_id))
+        return result.scalar_one_or_none()
+
+    async def get_keys_by_hashes(self, url_hashes: Sequence[bytes]) -> Dict[bytes, str]:
+        """url_hash -> short_key das URLs já encurtadas (PK de url_hashes)."""
+        if not url_hashes:
+            return {}
+        query = select(URLHash.url_hash, URLHash.short_key).where(URLHash.url_hash.in_(url_hashes))
+        return {row.url_hash: row.short_key for row in (await self.db.execute(query)).all()}
+
+    async def iter_rows(
+        self, batch_size: int = 10000, after_id: int = 0, columns: Optional[Sequence] = None
+    ) -> AsyncIterator[list]:
+        """
+        Percorre a tabela inteira em lotes por keyset no id (WHERE id >
+        último_id ORDER BY id LIMIT n): memória de um lote, sem OFFSET, e
+        cada página é uma consulta curta - nada de cursor aberto por horas
+        numa réplica. `after_id` retoma de onde uma leitura anterior parou.
+        """
+        last_id = after_id
+        while True:
+            rows = await self.page_after(last_id, batch_size, columns)
+            if not rows:
+                break
+            last_id = rows[-1].id
+            yield rows
+
+    async def page_after(
+        self, after_id: int, batch_size: int = 10000, columns: Optional[Sequence] = None
+    ) -> list:
+        """Uma página do keyset de iter_rows: até `batch_size` linhas com id > after_id."""
+        columns = columns or (
+            URL.id, URL.short_key, URL.original_url, URL.clicks, URL.created_at, URL.redirect_status
+        )
+        query = select(*columns).where(URL.id > after_id).order_by(URL.id).limit(batch_size)
+        return (await self.db.execute(query)).all()
+
+    async def top_by_clicks(self, limit: int) -> List[Tuple[str, str, Optional[int]]]:
+        """(short_key, original_url, redirect_status) dos links mais clicados (índice em clicks)."""
+        query = (
+            select(URL.short_key, URL.original_url, URL.redirect_status)
+            .where(URL.short_key.is_not(None))
+            .order_by(URL.clicks.desc())
+            .limit(limit)
+        )
+        return [tuple(row) for row in (await self.db.execute(query)).all()]
+
+    async def get_many_by_keys(self, short_keys: Sequence[str]) -> List[Tuple[str, str, Optional[int]]]:
+        """(short_key, original_url, redirect_status) das chaves existentes, numa só consulta."""
+        ids = [url_id for url_id in decode_short_keys(short_keys) if url_id is not None]
+        if not ids:
+            return []
+        query = select(URL.short_key, URL.original_url, URL.redirect_status).where(URL.id.in_(ids))
+        return [tuple(row) for row in (await self.db.execute(query)).all()]
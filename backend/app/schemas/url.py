@@ -1,7 +1,11 @@
+from datetime import datetime
+from typing import List, Literal, Optional
 from pydantic import BaseModel, HttpUrl, field_validator
 
 class URLCreate(BaseModel):
     url: HttpUrl
+    # Status do redirect deste link; None = REDIRECT_STATUS (padrão global)
+    redirect_status: Optional[Literal[301, 302, 307, 308]] = None
 
     @field_validator('url')
     def validate_scheme(cls, v):
@@ -19,4 +23,38 @@ class URLCreate(BaseModel):
 
 class URLResponse(BaseModel):
     short_url: str
-    original_url: str
\ No newline at end of file
+    original_url: str
+    redirect_status: Optional[int] = None
+
+class URLBatchCreate(BaseModel):
+    # Strings cruas: cada item é validado com URLCreate para o erro sair por item
+    urls: List[str]
+
+class URLBatchItem(BaseModel):
+    index: int
+    short_url: Optional[str] = None
+    original_url: Optional[str] = None
+    error: Optional[str] = None
+
+class URLBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[URLBatchItem]
+
+class ClickStatsPoint(BaseModel):
+    bucket: datetime
+    clicks: int
+
+class ClickStatsValue(BaseModel):
+    value: str
+    clicks: int
+
+class ClickStatsResponse(BaseModel):
+    short_key: str
+    granularity: str
+    start: datetime
+    end: datetime
+    total: int
+    series: List[ClickStatsPoint]
+    top_referrers: List[ClickStatsValue]
+    countries: List[ClickStatsValue]
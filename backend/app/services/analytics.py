@@ -0,0 +1,177 @@
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.click_rollup import ClickRollup
+from app.services.flusher import PeriodicFlusher
+
+# Tamanho de cada bucket em segundos, por granularidade
+GRANULARITIES = {"m": 60, "h": 3600, "d": 86400}
+
+# Referrer/país só em hora e dia: por minuto a cardinalidade explode e a
+# série total já responde o que se quer ver nessa escala
+DIMENSION_GRANULARITIES = ("h", "d")
+
+DIRECT = "(direct)"
+UNKNOWN = "(unknown)"
+
+# (short_key, granularity, bucket_start, dimension, value)
+RollupKey = Tuple[str, str, datetime, str, str]
+
+
+class ClickEvent(NamedTuple):
+    short_key: str
+    ts: float
+    referrer: str
+    country: str
+
+
+def referrer_host(referrer: Optional[str]) -> str:
+    """Reduz o Referer ao host (sem path/query): menos cardinalidade e nada de PII."""
+    if not referrer:
+        return DIRECT
+    host = urlsplit(referrer).hostname
+    return host[:255] if host else UNKNOWN
+
+
+def normalize_country(country: Optional[str]) -> str:
+    if not country or len(country) != 2 or not country.isalpha():
+        return UNKNOWN
+    return country.upper()
+
+
+def bucket_start(ts: float, granularity: str) -> datetime:
+    size = GRANULARITIES[granularity]
+    return datetime.fromtimestamp(ts - ts % size, tz=timezone.utc)
+
+
+def rollup(events: Iterable[ClickEvent]) -> Dict[RollupKey, int]:
+    """Agrega eventos crus em contagens por bucket/dimensão."""
+    counts: Dict[RollupKey, int] = {}
+    for event in events:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(event.ts, granularity)
+            keys = [(event.short_key, granularity, bucket, "total", "")]
+            if granularity in DIMENSION_GRANULARITIES:
+                keys.append((event.short_key, granularity, bucket, "referrer", event.referrer))
+                keys.append((event.short_key, granularity, bucket, "country", event.country))
+            for key in keys:
+                counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+class ClickAnalytics(PeriodicFlusher):
+    """
+    Agregador de analytics de cliques (ring buffer + rollups).
+
+    `record` só faz append num deque de tamanho fixo (síncrono, sem I/O). Se
+    o flush atrasar e o buffer encher, os eventos mais antigos são
+    descartados (contados em `dropped`): analytics nunca segura o redirect
+    nem cresce a memória sem limite.
+
+    No flush os eventos viram contagens por bucket e são somados na tabela
+    de rollups com upsert (ON CONFLICT DO UPDATE count = count + excluded).
+    Rollups que falham ficam guardados e são somados no próximo flush.
+    """
+
+    name = "analytics"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        buffer_size: int = 100_000,
+        flush_interval: float = 10.0,
+        batch_size: int = 1000,
+        clock=time.time,
+    ):
+        super().__init__(flush_interval)
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._clock = clock
+        self._buffer: Deque[ClickEvent] = deque(maxlen=buffer_size)
+        self._retry: Dict[RollupKey, int] = {}
+
+        # Métricas
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed_rows = 0
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._buffer) or bool(self._retry)
+
+    def record(
+        self, short_key: str, referrer: Optional[str] = None, country: Optional[str] = None
+    ) -> None:
+        """Registra um clique. Nunca bloqueia nem faz I/O."""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+            self.wakeup()
+        self._buffer.append(
+            ClickEvent(short_key, self._clock(), referrer_host(referrer), normalize_country(country))
+        )
+        self.recorded += 1
+
+    def _drain(self) -> List[ClickEvent]:
+        events = []
+        buffer = self._buffer
+        while buffer:
+            events.append(buffer.popleft())
+        return events
+
+    async def flush(self) -> int:
+        """Soma os rollups pendentes no banco. Retorna quantas linhas tocou."""
+        counts = rollup(self._drain())
+        retry, self._retry = self._retry, {}
+        for key, count in retry.items():
+            counts[key] = counts.get(key, 0) + count
+        if not counts:
+            return 0
+
+        items = list(counts.items())
+        applied = 0
+        try:
+            async with self.session_factory() as session:
+                insert = _dialect_insert(session.bind.dialect.name)
+                for start in range(0, len(items), self.batch_size):
+                    batch = items[start:start + self.batch_size]
+                    stmt = insert(ClickRollup).values([
+                        {
+                            "short_key": key[0],
+                            "granularity": key[1],
+                            "bucket_start": key[2],
+                            "dimension": key[3],
+                            "value": key[4],
+                            "count": count,
+                        }
+                        for key, count in batch
+                    ])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[c.name for c in ClickRollup.__table__.primary_key],
+                        set_={"count": ClickRollup.count + stmt.excluded.count},
+                    )
+                    await session.execute(stmt)
+                    await session.commit()
+                    applied += len(batch)
+        except Exception:
+            self.flush_errors += 1
+            for key, count in items[applied:]:
+                self._retry[key] = self._retry.get(key, 0) + count
+            raise
+
+        self.flushed_rows += applied
+        return applied
+
+
+def _dialect_insert(dialect: str):
+    """INSERT com ON CONFLICT do dialeto (Postgres em produção, SQLite nos testes)."""
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upsert de rollups não suportado em {dialect}")
@@ -1,26 +1,164 @@
 import hashlib
+from abc import ABC, abstractmethod
+import json
 import math
+import os
+import struct
+from typing import AsyncContextManager, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from redis.asyncio import Redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-class BloomFilter:
-    def __init__(self, redis_client: Redis, item_count: int = 1000000000, fp_prob: float = 0.01):
+from app.core.config import settings
+from app.core.logger import logger
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository
+
+# Uma string do Redis tem no máximo 512 MB (2^32 bits). Cada shard fica com
+# até 2^31 bits (256 MB) para deixar folga e não criar uma chave gigante.
+MAX_SHARD_BITS = 2 ** 31
+
+# Formato do snapshot em arquivo (warm-start de um nó)
+SNAPSHOT_MAGIC = b"URLBLOOM1\n"
+SNAPSHOT_CHUNK = 8 * 1024 * 1024  # Lê/escreve em blocos de 8 MB (GETRANGE/SETRANGE)
+
+DEFAULT_KEY_PREFIX = "filter:url_bloom:v2"
+
+
+class BloomStats(ABC):
+    """Métricas (por processo) para acompanhar a taxa de falso positivo real."""
+
+    fp_prob: float
+    redis: Redis
+    ready_key: str
+
+    def _init_stats(self):
+        self.checks = 0           # Consultas ao filtro
+        self.negatives = 0        # "Com certeza não existe" -> banco poupado
+        self.false_positives = 0  # Filtro disse "pode existir" e o banco não achou
+        self.unavailable = 0      # Consultas com o filtro incompleto (sem a sentinela)
+        self._warned_unavailable = False
+
+    @abstractmethod
+    async def _query(self, items: Sequence[str], check_ready: bool) -> Tuple[bool, List[bool]]:
+        """(sentinela presente, "pode existir" por item) num único round trip."""
+
+    async def exists_many(self, items: Sequence[str]) -> List[bool]:
         """
-        Inicializa o Bloom Filter apoiado no Redis.
-        
+        Verifica vários itens num único pipeline (um round trip, em vez de
+        k round trips sequenciais por item). Não confere a sentinela.
+        """
+        _, results = await self._query(items, check_ready=False)
+        self.checks += len(results)
+        self.negatives += results.count(False)
+        return results
+
+    async def exists(self, item: str) -> bool:
+        """
+        Verifica se um item PODE existir.
+        Retorna True: Pode existir (pequena chance de falso positivo)
+        Retorna False: Com certeza NÃO existe
+        """
+        return (await self.exists_many([item]))[0]
+
+    async def may_contain(self, item: str) -> Optional[bool]:
+        """
+        Como `exists`, mas None se o filtro não está completo: a sentinela
+        (`ready_key`) é lida no mesmo pipeline dos bits. Sem ela (FLUSHALL,
+        failover para uma réplica vazia, eviction, back-fill pendente) um
+        "não existe" seria falso negativo, então quem chama vai ao banco.
+        """
+        ready, results = await self._query([item], check_ready=True)
+        if not ready:
+            self.unavailable += 1
+            if not self._warned_unavailable:
+                self._warned_unavailable = True
+                logger.warning(
+                    "Bloom Filter sem a sentinela de completude: respostas negativas "
+                    "desligadas até o back-fill (python -m app.commands.bloom_backfill)"
+                )
+            return None
+        self._warned_unavailable = False
+        self.checks += 1
+        self.negatives += results.count(False)
+        return results[0]
+
+    async def mark_ready(self) -> None:
+        """Marca o filtro como completo (todas as chaves do banco estão nele)."""
+        await self.redis.set(self.ready_key, 1)
+
+    async def mark_incomplete(self) -> None:
+        await self.redis.delete(self.ready_key)
+
+    def record_false_positive(self):
+        """Chamado quando o filtro disse 'pode existir' mas o banco não achou."""
+        self.false_positives += 1
+
+    @property
+    def observed_fp_rate(self) -> float:
+        """Fração das chaves inexistentes que o filtro deixou passar."""
+        absent = self.negatives + self.false_positives
+        return self.false_positives / absent if absent else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "negatives": self.negatives,
+            "false_positives": self.false_positives,
+            "observed_fp_rate": self.observed_fp_rate,
+            "expected_fp_rate": self.fp_prob,
+            "unavailable": self.unavailable,
+        }
+
+
+class BloomFilter(BloomStats):
+    def __init__(
+        self,
+        redis_client: Redis,
+        item_count: int = 1000000000,
+        fp_prob: float = 0.01,
+        shards: int = 0,
+        key_prefix: str = DEFAULT_KEY_PREFIX,
+    ):
+        """
+        Inicializa o Bloom Filter apoiado no Redis, dividido em N chaves (shards).
+
+        Cada item vai para UM shard (roteamento determinístico pelo hash) e
+        seus k bits ficam todos nele: um lookup continua tocando uma chave só.
+
         :param redis_client: Cliente Redis async
         :param item_count: Número estimado de itens (n) - Default 1 Bilião
         :param fp_prob: Probabilidade de falso positivo desejada (p) - Default 1%
+        :param shards: Número de chaves; 0 = o mínimo para cada uma caber em MAX_SHARD_BITS
+        :param key_prefix: Prefixo das chaves no Redis
         """
         self.redis = redis_client
         self.item_count = item_count
         self.fp_prob = fp_prob
-        
+
         # Cálculos ótimos para m (tamanho do bit array) e k (número de hashes)
         self.size = self.get_size(item_count, fp_prob)
         self.hash_count = self.get_hash_count(self.size, item_count)
-        
-        # Nome da chave no Redis
-        self.redis_key = "filter:url_bloom"
+
+        self.shards = shards or max(1, math.ceil(self.size / MAX_SHARD_BITS))
+        self.shard_size = math.ceil(self.size / self.shards)
+        if self.shard_size > 2 ** 32:
+            raise ValueError(
+                f"Shard de {self.shard_size} bits passa do limite de 512 MB do Redis; "
+                "aumente o número de shards."
+            )
+
+        # Nomes das chaves no Redis (v2: hashing BLAKE2b, incompatível com o v1).
+        # Com um shard só, a chave é o próprio prefixo.
+        self.key_prefix = key_prefix
+        if self.shards == 1:
+            self.redis_keys = [key_prefix]
+        else:
+            self.redis_keys = [f"{key_prefix}:{i}" for i in range(self.shards)]
+        # Sentinela: existe só enquanto o filtro contém todas as chaves do banco
+        self.ready_key = f"{key_prefix}:ready"
+
+        self._init_stats()
 
     def get_size(self, n: int, p: float) -> int:
         """Calcula o tamanho ótimo do bit array (m)"""
@@ -32,35 +170,358 @@ class BloomFilter:
         k = (m / n) * math.log(2)
         return int(k)
 
-    def _get_hashes(self, item: str):
+    def _locate(self, item: str) -> Tuple[str, List[int]]:
         """
-        Gera 'k' posições de hash usando Double Hashing para performance.
-        hash(i) = (h1 + i * h2) % m
+        Retorna a chave (shard) do item e suas 'k' posições, usando Double
+        Hashing (Kirsch-Mitzenmacher): hash(i) = (h1 + i * h2) % m
+
+        Um único BLAKE2b de 16 bytes fornece h1 e h2 (64 bits cada) direto
+        dos bytes do digest. O resto de h1 pelo nº de shards escolhe o shard
+        e o quociente alimenta as posições (com 1 shard, é o próprio h1).
         """
-        # Hashing duplo usando libs padrão (rápido e sem deps externas)
-        encoded = item.encode('utf-8')
-        h1 = int(hashlib.sha256(encoded).hexdigest(), 16)
-        h2 = int(hashlib.md5(encoded).hexdigest(), 16)
-        
-        for i in range(self.hash_count):
-            yield (h1 + i * h2) % self.size
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1  # ímpar: passo nunca é zero
+        h1, shard = divmod(h1, self.shards)
+        m = self.shard_size
+        return self.redis_keys[shard], [(h1 + i * h2) % m for i in range(self.hash_count)]
+
+    def keys(self) -> List[str]:
+        return list(self.redis_keys)
 
     async def add(self, item: str):
-        """Adiciona um item ao filtro"""
-        async with self.redis.pipeline() as pipe:
-            for position in self._get_hashes(item):
-                pipe.setbit(self.redis_key, position, 1)
+        """Adiciona um item ao filtro (um round trip)"""
+        await self.add_many([item])
+
+    async def add_many(self, items: Iterable[str]):
+        """Adiciona vários itens num único pipeline (um round trip)"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for item in items:
+                key, positions = self._locate(item)
+                for position in positions:
+                    pipe.setbit(key, position, 1)
             await pipe.execute()
 
-    async def exists(self, item: str) -> bool:
+    async def _query(self, items: Sequence[str], check_ready: bool) -> Tuple[bool, List[bool]]:
+        """Os k GETBITs de cada item (e a sentinela, se pedida) num único pipeline."""
+        k = self.hash_count
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if check_ready:
+                pipe.exists(self.ready_key)
+            for item in items:
+                key, positions = self._locate(item)
+                for position in positions:
+                    pipe.getbit(key, position)
+            bits = await pipe.execute()
+
+        ready = True
+        if check_ready:
+            ready, bits = bool(bits[0]), bits[1:]
+        # Se algum dos k bits de um item for 0, o item não existe.
+        return ready, [all(bits[i * k:(i + 1) * k]) for i in range(len(items))]
+
+    def describe(self) -> dict:
+        """Parâmetros que um snapshot precisa ter para ser carregado aqui."""
+        return {
+            "type": "fixed",
+            "size": self.size,
+            "hash_count": self.hash_count,
+            "shards": self.shards,
+            "keys": self.redis_keys,
+        }
+
+    async def snapshot(self, path: str, raw_redis: Redis, high_water: int = 0) -> int:
         """
-        Verifica se um item PODE existir.
-        Retorna True: Pode existir (pequena chance de falso positivo)
-        Retorna False: Com certeza NÃO existe
+        Salva os shards em arquivo. `raw_redis` precisa de decode_responses=False.
+        `high_water`: todo id até ele já estava no filtro (ver snapshot_high_water).
         """
-        # Verifica todos os bits. Se algum for 0, o item não existe.
-        for position in self._get_hashes(item):
-            bit = await self.redis.getbit(self.redis_key, position)
-            if not bit:
-                return False
-        return True
\ No newline at end of file
+        header = dict(self.describe(), high_water=high_water,
+                      complete=bool(await raw_redis.exists(self.ready_key)))
+        return await save_snapshot(raw_redis, path, header, self.redis_keys)
+
+    async def load(self, path: str, raw_redis: Redis) -> dict:
+        """
+        Carrega um snapshot salvo por `snapshot` (substitui os shards atuais).
+        O filtro fica incompleto (sem sentinela) até o back-fill do que veio
+        depois do snapshot: ver restore_snapshot.
+        """
+        await self.mark_incomplete()
+        return await load_snapshot(raw_redis, path, expected=self.describe())
+
+
+class ScalableBloomFilter(BloomStats):
+    """
+    Bloom Filter escalável (Almeida et al., 2007): quando a geração atual
+    enche, uma nova geração maior (x growth) e mais rígida (fp x tightening)
+    é criada. A taxa de falso positivo total fica limitada por fp_prob sem
+    precisar saber o tamanho final nem reconstruir o filtro.
+
+    O estado (nº de gerações e itens por geração) fica num hash no Redis,
+    compartilhado por todos os workers e nós.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        initial_capacity: int = 100_000_000,
+        fp_prob: float = 0.01,
+        growth: int = 2,
+        tightening: float = 0.5,
+        key_prefix: str = f"{DEFAULT_KEY_PREFIX}:scalable",
+    ):
+        self.redis = redis_client
+        self.initial_capacity = initial_capacity
+        self.fp_prob = fp_prob
+        self.growth = growth
+        self.tightening = tightening
+        self.key_prefix = key_prefix
+        self.meta_key = f"{key_prefix}:meta"
+        self.ready_key = f"{key_prefix}:ready"
+        self.generations: List[BloomFilter] = []
+        self._ensure_generations(1)
+        self._init_stats()
+
+    def _ensure_generations(self, count: int) -> None:
+        while len(self.generations) < count:
+            g = len(self.generations)
+            self.generations.append(BloomFilter(
+                self.redis,
+                item_count=self.initial_capacity * self.growth ** g,
+                # Série geométrica: soma das fp de todas as gerações <= fp_prob
+                fp_prob=self.fp_prob * (1 - self.tightening) * self.tightening ** g,
+                key_prefix=f"{self.key_prefix}:g{g}",
+            ))
+
+    def keys(self) -> List[str]:
+        return [key for generation in self.generations for key in generation.keys()]
+
+    async def add(self, item: str):
+        await self.add_many([item])
+
+    async def add_many(self, items: Iterable[str]):
+        """Adiciona na geração mais nova; cria a próxima quando ela enche."""
+        items = list(items)
+        g = len(self.generations) - 1
+        current = self.generations[g]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for item in items:
+                key, positions = current._locate(item)
+                for position in positions:
+                    pipe.setbit(key, position, 1)
+            pipe.hsetnx(self.meta_key, "generations", 1)
+            pipe.hincrby(self.meta_key, f"count:{g}", len(items))
+            pipe.hget(self.meta_key, "generations")
+            results = await pipe.execute()
+
+        count, remote_generations = results[-2], int(results[-1])
+        if remote_generations == g + 1 and count >= current.item_count:
+            # HSETNX garante que só um worker/nó abre a próxima geração
+            if await self.redis.hsetnx(self.meta_key, f"grown:{g}", 1):
+                remote_generations = await self.redis.hincrby(self.meta_key, "generations", 1)
+        self._ensure_generations(int(remote_generations))
+
+    async def _query(self, items: Sequence[str], check_ready: bool) -> Tuple[bool, List[bool]]:
+        """Consulta todas as gerações (e a sentinela, se pedida) num único pipeline."""
+        generations = list(self.generations)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hget(self.meta_key, "generations")
+            if check_ready:
+                pipe.exists(self.ready_key)
+            for generation in generations:
+                for item in items:
+                    key, positions = generation._locate(item)
+                    for position in positions:
+                        pipe.getbit(key, position)
+            bits = await pipe.execute()
+
+        remote_generations = int(bits[0] or 1)
+        if remote_generations > len(generations):
+            # Outro worker abriu uma geração nova: passa a consultá-la também
+            self._ensure_generations(remote_generations)
+            return await self._query(items, check_ready)
+
+        ready = bool(bits[1]) if check_ready else True
+        results = [False] * len(items)
+        offset = 2 if check_ready else 1
+        for generation in generations:
+            k = generation.hash_count
+            for i in range(len(items)):
+                if all(bits[offset:offset + k]):
+                    results[i] = True
+                offset += k
+        return ready, results
+
+    def describe(self) -> dict:
+        return {
+            "type": "scalable",
+            "initial_capacity": self.initial_capacity,
+            "fp_prob": self.fp_prob,
+            "growth": self.growth,
+            "tightening": self.tightening,
+        }
+
+    async def snapshot(self, path: str, raw_redis: Redis, high_water: int = 0) -> int:
+        meta = await raw_redis.hgetall(self.meta_key)
+        header = dict(self.describe(), high_water=high_water,
+                      complete=bool(await raw_redis.exists(self.ready_key)))
+        header["meta"] = {k.decode(): v.decode() for k, v in meta.items()}
+        self._ensure_generations(int(header["meta"].get("generations", 1)))
+        return await save_snapshot(raw_redis, path, header, self.keys())
+
+    async def load(self, path: str, raw_redis: Redis) -> dict:
+        await self.mark_incomplete()
+        header = await load_snapshot(raw_redis, path, expected=self.describe())
+        async with raw_redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.meta_key)
+            if header["meta"]:
+                pipe.hset(self.meta_key, mapping=header["meta"])
+            await pipe.execute()
+        self._ensure_generations(int(header["meta"].get("generations", 1)))
+        return header
+
+
+AnyBloomFilter = Union[BloomFilter, ScalableBloomFilter]
+
+
+def build_bloom_filter(redis_client: Redis) -> AnyBloomFilter:
+    """Cria o filtro conforme Settings (BLOOM_MODE = 'fixed' | 'scalable')."""
+    if settings.BLOOM_MODE == "scalable":
+        return ScalableBloomFilter(
+            redis_client,
+            initial_capacity=settings.BLOOM_ITEM_COUNT,
+            fp_prob=settings.BLOOM_FP_PROB,
+            growth=settings.BLOOM_GROWTH,
+        )
+    return BloomFilter(
+        redis_client,
+        item_count=settings.BLOOM_ITEM_COUNT,
+        fp_prob=settings.BLOOM_FP_PROB,
+        shards=settings.BLOOM_SHARDS,
+    )
+
+
+# -----------------------------------------------------------------------------
+# Back-fill a partir do banco
+# -----------------------------------------------------------------------------
+
+SessionScope = Callable[[], AsyncContextManager[AsyncSession]]
+
+
+async def backfill_bloom(
+    bloom: AnyBloomFilter, session_scope: SessionScope, after_id: int = 0, batch_size: int = 10000
+) -> int:
+    """
+    Adiciona ao filtro as chaves com id > `after_id` (0 = todas), em lotes
+    por keyset no id, e grava a sentinela no fim. Retorna o total.
+    `session_scope` deve ser o master: o que uma réplica ainda não aplicou
+    ficaria fora do filtro e, com a sentinela, viraria 404.
+    """
+    total = 0
+    async with session_scope() as session:
+        pages = URLRepository(session).iter_rows(batch_size, after_id, columns=(URL.id, URL.short_key))
+        async for rows in pages:
+            await bloom.add_many([row.short_key for row in rows if row.short_key])
+            total += len(rows)
+            logger.info(f"Bloom back-fill: {total} chaves acima do id {after_id}")
+    # Só agora o filtro pode responder "não existe" (sentinela de completude)
+    await bloom.mark_ready()
+    return total
+
+
+async def snapshot_high_water(session_scope: SessionScope) -> int:
+    """
+    Id até o qual o filtro certamente já contém as chaves, lido ANTES dos
+    bits: o maior id menos BLOOM_SNAPSHOT_ID_MARGIN. Com IDs em blocos, um
+    worker ainda grava ids abaixo do maior já visto (blocos abertos); a
+    folga cobre esses blocos e os INSERTs em andamento.
+    """
+    async with session_scope() as session:
+        max_id = (await session.execute(select(func.coalesce(func.max(URL.id), 0)))).scalar_one()
+    return max(0, max_id - settings.BLOOM_SNAPSHOT_ID_MARGIN)
+
+
+async def restore_snapshot(
+    bloom: AnyBloomFilter,
+    path: str,
+    raw_redis: Redis,
+    session_scope: SessionScope,
+    batch_size: int = 10000,
+) -> int:
+    """
+    Carrega o snapshot e re-adiciona tudo acima do high-water dele, só então
+    gravando a sentinela: até lá as respostas negativas ficam desligadas, e
+    chaves criadas depois do snapshot nunca viram 404. Snapshot de um filtro
+    que já estava incompleto (ou sem high-water) exige o back-fill inteiro.
+    """
+    header = await bloom.load(path, raw_redis)
+    after_id = header.get("high_water", 0) if header.get("complete") else 0
+    return await backfill_bloom(bloom, session_scope, after_id, batch_size)
+
+
+# -----------------------------------------------------------------------------
+# Snapshot em arquivo
+# -----------------------------------------------------------------------------
+# Layout: MAGIC | u32 len + header JSON | por chave: u16 len + nome, u64 len + bytes
+
+async def save_snapshot(raw_redis: Redis, path: str, header: dict, keys: Sequence[str]) -> int:
+    """Copia as strings de bits para `path` em blocos. Retorna os bytes salvos."""
+    total = 0
+    tmp_path = f"{path}.tmp"
+    header = dict(header, keys=list(keys))
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        header_bytes = json.dumps(header).encode()
+        f.write(struct.pack(">I", len(header_bytes)))
+        f.write(header_bytes)
+
+        for key in keys:
+            length = await raw_redis.strlen(key)
+            name = key.encode()
+            f.write(struct.pack(">H", len(name)))
+            f.write(name)
+            f.write(struct.pack(">Q", length))
+            for start in range(0, length, SNAPSHOT_CHUNK):
+                end = min(start + SNAPSHOT_CHUNK, length) - 1
+                f.write(await raw_redis.getrange(key, start, end))
+            total += length
+
+    # Troca atômica: nunca deixa um snapshot pela metade no caminho final
+    os.replace(tmp_path, path)
+    return total
+
+
+async def load_snapshot(raw_redis: Redis, path: str, expected: Dict) -> dict:
+    """
+    Restaura as chaves de um snapshot. Cada chave é escrita numa chave
+    temporária e trocada com RENAME, então leitores nunca veem um filtro
+    pela metade (o que geraria falsos negativos).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} não é um snapshot de Bloom Filter")
+        (header_len,) = struct.unpack(">I", f.read(4))
+        header = json.loads(f.read(header_len))
+
+        mismatched = {
+            name: (header.get(name), value)
+            for name, value in expected.items()
+            if name != "keys" and header.get(name) != value
+        }
+        if mismatched:
+            raise ValueError(f"Snapshot incompatível com a configuração atual: {mismatched}")
+
+        for _ in header["keys"]:
+            (name_len,) = struct.unpack(">H", f.read(2))
+            key = f.read(name_len).decode()
+            (length,) = struct.unpack(">Q", f.read(8))
+            loading_key = f"{key}:loading"
+            await raw_redis.delete(loading_key)
+            for start in range(0, length, SNAPSHOT_CHUNK):
+                chunk = f.read(min(SNAPSHOT_CHUNK, length - start))
+                await raw_redis.setrange(loading_key, start, chunk)
+            if length:
+                await raw_redis.rename(loading_key, key)
+            else:
+                await raw_redis.delete(key)
+
+    return header
@@ -0,0 +1,203 @@
+import base64
+import random
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.single_flight import MovingAverage
+
+# Prefixo dos valores comprimidos (URLs sempre começam com http, sem ambiguidade)
+COMPRESSED_PREFIX = "z:"
+
+BASE = "base"
+HOT = "hot"
+
+
+class CachePolicy:
+    """
+    Política de TTL e codificação dos valores no Redis.
+
+    - TTL base com jitter (±`jitter`), para chaves criadas na mesma janela
+      não expirarem todas juntas.
+    - Popularidade: cada worker conta hits (L1 ou Redis) por chave numa janela
+      de `hot_window` segundos; ao atingir `hot_threshold` a chave recebe um
+      EXPIRE com o TTL quente. Enquanto continuar quente, o EXPIRE se repete
+      uma vez por janela (TTL deslizante) - link popular nunca sai do Redis,
+      link frio some depois do TTL base.
+    - Codificação compacta opcional: zlib + base85 com prefixo "z:", usada só
+      quando de fato economiza bytes (URLs longas com muita query string).
+
+    Estado por worker e síncrono (sem lock), como o cache L1.
+    """
+
+    def __init__(
+        self,
+        base_ttl: int = 3600,
+        hot_ttl: int = 86400,
+        hot_threshold: int = 20,
+        hot_window: float = 60.0,
+        jitter: float = 0.1,
+        compression: bool = False,
+        compress_min_bytes: int = 200,
+        memory_sample_rate: float = 0.0,
+        max_tracked: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.base_ttl = base_ttl
+        self.hot_ttl = hot_ttl
+        self.hot_threshold = hot_threshold
+        self.hot_window = hot_window
+        self.jitter = jitter
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.memory_sample_rate = memory_sample_rate
+        self.max_tracked = max_tracked
+        self._clock = clock
+
+        self._window_start = clock()
+        self._window_hits: Dict[str, int] = {}
+        # Chaves promovidas por este worker (LRU limitada)
+        self._hot: "OrderedDict[str, None]" = OrderedDict()
+
+        # Métricas
+        self.hits = {BASE: 0, HOT: 0}
+        self.misses = {BASE: 0, HOT: 0}
+        self.promotions = 0
+        self.compressed = 0
+        self.bytes_saved = 0
+        self.memory_per_link = MovingAverage(alpha=0.05)
+        self.memory_samples = 0
+
+    # --- TTL ---
+
+    def ttl_class(self, short_key: str) -> str:
+        return HOT if short_key in self._hot else BASE
+
+    def ttl(self, short_key: Optional[str] = None, hot: bool = False) -> int:
+        """TTL (com jitter) para gravar a chave, conforme a classe dela."""
+        hot = hot or (short_key is not None and short_key in self._hot)
+        ttl = self.hot_ttl if hot else self.base_ttl
+        if self.jitter:
+            ttl = ttl * (1 + random.uniform(-self.jitter, self.jitter))
+        return max(1, int(ttl))
+
+    def record_lookup(self, short_key: str, hit: bool) -> None:
+        """Conta um lookup no Redis (hit ratio por classe de TTL)."""
+        counters = self.hits if hit else self.misses
+        counters[self.ttl_class(short_key)] += 1
+
+    def _rotate_window(self) -> None:
+        now = self._clock()
+        if now - self._window_start >= self.hot_window:
+            self._window_start = now
+            self._window_hits.clear()
+
+    def touch(self, short_key: str) -> bool:
+        """
+        Conta um hit. True quando a chave acabou de atingir o limiar na janela
+        atual, ou seja, quando o TTL quente deve ser (re)aplicado no Redis.
+        """
+        self._rotate_window()
+        hits = self._window_hits.get(short_key)
+        if hits is None:
+            if len(self._window_hits) >= self.max_tracked:
+                return False  # Janela cheia: volta a contar na próxima
+            hits = 0
+        hits += 1
+        self._window_hits[short_key] = hits
+        if hits != self.hot_threshold:
+            return False
+
+        self._hot[short_key] = None
+        self._hot.move_to_end(short_key)
+        while len(self._hot) > self.max_tracked:
+            self._hot.popitem(last=False)
+        self.promotions += 1
+        return True
+
+    async def on_hit(self, redis, short_key: str) -> None:
+        """Hit servido do cache: estende o TTL no Redis se a chave ficou quente."""
+        if self.touch(short_key):
+            try:
+                await redis.expire(short_key, self.ttl(short_key))
+            except RedisError:
+                pass  # Sem extensão desta vez; a chave só expira no TTL atual
+
+    # --- Codificação ---
+
+    def encode(self, original_url: str) -> str:
+        if not self.compression or len(original_url) < self.compress_min_bytes:
+            return original_url
+        packed = COMPRESSED_PREFIX + base64.b85encode(
+            zlib.compress(original_url.encode("utf-8"), 9)
+        ).decode("ascii")
+        if len(packed) >= len(original_url):
+            return original_url
+        self.compressed += 1
+        self.bytes_saved += len(original_url) - len(packed)
+        return packed
+
+    @staticmethod
+    def decode(value: Optional[str]) -> Optional[str]:
+        # Decodifica mesmo com a compressão desligada (valores antigos no Redis)
+        if value is None or not value.startswith(COMPRESSED_PREFIX):
+            return value
+        return zlib.decompress(base64.b85decode(value[len(COMPRESSED_PREFIX):])).decode("utf-8")
+
+    async def set(self, redis, short_key: str, original_url: str) -> None:
+        """Grava a chave com o TTL e a codificação da política."""
+        await redis.set(short_key, self.encode(original_url), ex=self.ttl(short_key))
+        await self.maybe_sample_memory(redis, short_key)
+
+    # --- Memória ---
+
+    async def maybe_sample_memory(self, redis, short_key: str) -> None:
+        """Amostra MEMORY USAGE de uma fração das chaves gravadas."""
+        if self.memory_sample_rate <= 0 or random.random() >= self.memory_sample_rate:
+            return
+        try:
+            usage = await redis.memory_usage(short_key)
+        except (RedisError, AttributeError):
+            return
+        if usage:
+            self.memory_samples += 1
+            if self.memory_samples == 1:
+                self.memory_per_link.value = usage
+            else:
+                self.memory_per_link.update(usage)
+
+    def stats(self) -> dict:
+        classes = {}
+        for ttl_class in (BASE, HOT):
+            lookups = self.hits[ttl_class] + self.misses[ttl_class]
+            classes[ttl_class] = {
+                "hits": self.hits[ttl_class],
+                "misses": self.misses[ttl_class],
+                "hit_ratio": self.hits[ttl_class] / lookups if lookups else 0.0,
+            }
+        return {
+            "classes": classes,
+            "hot_keys": len(self._hot),
+            "promotions": self.promotions,
+            "compressed": self.compressed,
+            "bytes_saved": self.bytes_saved,
+            "memory_per_link": self.memory_per_link.value,
+            "memory_samples": self.memory_samples,
+        }
+
+
+# Instância compartilhada por worker
+cache_policy = CachePolicy(
+    base_ttl=settings.CACHE_TTL,
+    hot_ttl=settings.CACHE_HOT_TTL,
+    hot_threshold=settings.CACHE_HOT_THRESHOLD,
+    hot_window=settings.CACHE_HOT_WINDOW,
+    jitter=settings.CACHE_TTL_JITTER,
+    compression=settings.CACHE_COMPRESSION,
+    compress_min_bytes=settings.CACHE_COMPRESS_MIN_BYTES,
+    memory_sample_rate=settings.CACHE_MEMORY_SAMPLE_RATE,
+)
@@ -0,0 +1,309 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+from typing import AsyncContextManager, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.keygen import generate_short_key
+from app.core.logger import logger
+from app.models.id_counter import IdCounter
+from app.models.url import URL, URLHash
+from app.repositories.url_repository import URLRepository
+from app.services.dedup import url_digest
+
+NDJSON = "ndjson"
+CSV = "csv"
+FORMATS = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+FIELDS = ("id", "short_key", "original_url", "clicks", "created_at", "redirect_status")
+
+# (id, short_key, original_url, clicks, created_at, redirect_status)
+Record = Tuple[int, str, str, int, Optional[datetime], Optional[int]]
+SessionScope = Callable[[], AsyncContextManager[AsyncSession]]
+
+# Staging por conexão: o COPY cai aqui e o INSERT ... ON CONFLICT torna o
+# chunk idempotente (reaplicar após uma queda não duplica nem falha)
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS urls_import (
+    id BIGINT, short_key VARCHAR(10), original_url VARCHAR,
+    clicks INTEGER, created_at TIMESTAMP WITH TIME ZONE, redirect_status SMALLINT,
+    url_hash BYTEA
+) ON COMMIT DELETE ROWS
+"""
+MERGE_STAGING = """
+INSERT INTO urls (id, short_key, original_url, clicks, created_at, redirect_status)
+SELECT id, short_key, original_url, COALESCE(clicks, 0), COALESCE(created_at, now()), redirect_status
+FROM urls_import
+ON CONFLICT (id) DO NOTHING
+"""
+# Índice de dedup das linhas que estão em `urls` com a mesma URL do arquivo
+# (id já ocupado por outra URL não ganha hash). A primeira chave de cada URL
+# fica; nas seguintes o ON CONFLICT mantém a que já estava
+MERGE_HASHES = """
+INSERT INTO url_hashes (url_hash, short_key)
+SELECT DISTINCT ON (s.url_hash) s.url_hash, s.short_key
+FROM urls_import s JOIN urls u ON u.id = s.id AND u.original_url = s.original_url
+WHERE s.url_hash IS NOT NULL
+ORDER BY s.url_hash, s.id
+ON CONFLICT (url_hash) DO NOTHING
+"""
+STAGING_FIELDS = FIELDS + ("url_hash",)
+
+
+def format_for(path: str) -> str:
+    """Formato pela extensão (.csv / .ndjson, .jsonl; com ou sem .gz)."""
+    name = path[:-3] if path.endswith(".gz") else path
+    return CSV if name.endswith(".csv") else NDJSON
+
+
+# -----------------------------------------------------------------------------
+# Exportação
+# -----------------------------------------------------------------------------
+
+def _encode_rows(rows, fmt: str) -> str:
+    if fmt == NDJSON:
+        return "".join(
+            json.dumps({
+                "id": row.id,
+                "short_key": row.short_key,
+                "original_url": row.original_url,
+                "clicks": row.clicks or 0,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "redirect_status": row.redirect_status,
+            }, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(
+        (row.id, row.short_key, row.original_url, row.clicks or 0,
+         row.created_at.isoformat() if row.created_at else "",
+         row.redirect_status or "")
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+async def export_corpus(
+    session_scope: SessionScope,
+    fmt: str = NDJSON,
+    compress: bool = False,
+    batch_size: int = 10000,
+    after_id: int = 0,
+) -> AsyncIterator[bytes]:
+    """
+    Exporta `urls` em ordem de id como NDJSON ou CSV (gzip opcional), um
+    lote por vez: a memória não depende do tamanho da tabela. Cada página
+    abre e devolve a própria sessão antes de ser enviada, então um cliente
+    lento não segura uma conexão (nem um snapshot da réplica) o export inteiro.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+    # wbits=31: stream gzip (cabeçalho + CRC), compatível com gunzip
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(chunk: str) -> bytes:
+        data = chunk.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if fmt == CSV:
+        yield emit(",".join(FIELDS) + "\n")
+    last_id = after_id
+    while True:
+        async with session_scope() as session:
+            rows = await URLRepository(session).page_after(last_id, batch_size)
+        if not rows:
+            break
+        last_id = rows[-1].id
+        yield emit(_encode_rows(rows, fmt))
+    if compressor:
+        yield compressor.flush()
+
+
+# -----------------------------------------------------------------------------
+# Importação
+# -----------------------------------------------------------------------------
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Record]:
+    """Lê o arquivo (gzip detectado pelos magic bytes) registro a registro."""
+    fmt = fmt or format_for(path)
+    with open(path, "rb") as probe:
+        gzipped = probe.read(2) == b"\x1f\x8b"
+    opener = gzip.open if gzipped else open
+    with opener(path, "rt", encoding="utf-8", newline="") as handle:
+        if fmt == CSV:
+            items = csv.DictReader(handle)
+        else:
+            items = (json.loads(line) for line in handle if line.strip())
+        for number, item in enumerate(items, start=1):
+            try:
+                url_id = int(item["id"])
+                short_key = item.get("short_key") or generate_short_key(url_id)
+                if short_key != generate_short_key(url_id):
+                    raise ValueError(f"short_key '{short_key}' não corresponde ao id {url_id}")
+                yield (
+                    url_id,
+                    short_key,
+                    item["original_url"],
+                    int(item.get("clicks") or 0),
+                    _parse_datetime(item.get("created_at")),
+                    # Exports anteriores à coluna não têm o campo: padrão global
+                    int(item["redirect_status"]) if item.get("redirect_status") else None,
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{path}: registro {number} inválido: {e}") from e
+
+
+def _dedup_hash(record: Record) -> Optional[bytes]:
+    """Hash de url_hashes do registro; None para link com status próprio."""
+    return url_digest(record[2]) if record[5] is None else None
+
+
+class CorpusImporter:
+    """
+    Carga em massa de `urls` a partir de um export (NDJSON/CSV, gzip ou não).
+
+    No Postgres cada chunk vai por COPY para uma tabela temporária e entra em
+    `urls` com INSERT ... ON CONFLICT (id) DO NOTHING, num commit por chunk;
+    fora dele (SQLite de dev) é um INSERT multi-linha. Na mesma transação o
+    hash de cada URL entra em url_hashes, como na criação pela API (links
+    com status próprio ficam de fora: nunca são deduplicados). Depois de cada commit
+    o checkpoint (JSON) registra quantos registros do arquivo já entraram, e
+    uma nova execução com o mesmo checkpoint retoma dali. Reaplicar o último
+    chunk (queda entre o commit e o checkpoint) é inofensivo.
+
+    No fim, a sequence e o contador de blocos de IDs passam do maior id
+    importado. Importe com a criação parada (ou ids acima dos já alugados):
+    blocos entregues antes da carga não enxergam os ids novos.
+    """
+
+    def __init__(
+        self,
+        session_factory: SessionScope,
+        chunk_size: int = 10000,
+        checkpoint_path: Optional[str] = None,
+        bloom=None,
+    ):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+        self.bloom = bloom
+
+    def _load_checkpoint(self, source: str) -> dict:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {"source": source, "records": 0, "inserted": 0, "max_id": 0}
+        with open(self.checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get("source") != source:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} é de {checkpoint.get('source')}, não de {source}"
+            )
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict) -> None:
+        if not self.checkpoint_path:
+            return
+        # Escreve ao lado e troca: uma queda no meio não corrompe o checkpoint
+        partial = self.checkpoint_path + ".tmp"
+        with open(partial, "w") as handle:
+            json.dump(checkpoint, handle)
+        os.replace(partial, self.checkpoint_path)
+
+    async def _load_chunk(self, session: AsyncSession, chunk: List[Record]) -> int:
+        connection = await session.connection()
+        if session.bind.dialect.name == "postgresql":
+            await connection.execute(text(STAGING_DDL))  # Abre a transação antes do COPY
+            raw = (await connection.get_raw_connection()).driver_connection
+            staged = [record + (_dedup_hash(record),) for record in chunk]
+            await raw.copy_records_to_table("urls_import", records=staged, columns=STAGING_FIELDS)
+            result = await connection.execute(text(MERGE_STAGING))
+            await connection.execute(text(MERGE_HASHES))
+        else:
+            result = await connection.execute(
+                insert(URL).prefix_with("OR IGNORE", dialect="sqlite"),
+                [dict(zip(FIELDS, record)) for record in chunk],
+            )
+            await self._merge_hashes_plain(connection, chunk)
+        await session.commit()
+        return max(result.rowcount, 0)
+
+    @staticmethod
+    async def _merge_hashes_plain(connection, chunk: List[Record]) -> None:
+        """MERGE_HASHES sem a tabela de staging (SQLite de dev)."""
+        stored = dict((await connection.execute(
+            select(URL.id, URL.original_url).where(URL.id.in_([record[0] for record in chunk]))
+        )).all())
+        hashes = {}
+        for record in chunk:
+            url_hash = _dedup_hash(record)
+            if url_hash is not None and stored.get(record[0]) == record[2]:
+                hashes.setdefault(url_hash, record[1])
+        if hashes:
+            await connection.execute(
+                insert(URLHash).prefix_with("OR IGNORE", dialect="sqlite"),
+                [{"url_hash": url_hash, "short_key": key} for url_hash, key in hashes.items()],
+            )
+
+    async def _advance_id_counters(self, max_id: int) -> None:
+        """Sequence e id_counters acima do maior id importado (nunca para trás)."""
+        async with self.session_factory() as session:
+            if session.bind.dialect.name == "postgresql":
+                await session.execute(
+                    text("SELECT setval('urls_id_seq', GREATEST(:max_id, (SELECT last_value FROM urls_id_seq)))"),
+                    {"max_id": max_id},
+                )
+            await session.execute(
+                update(IdCounter).where(IdCounter.next_value <= max_id).values(next_value=max_id + 1)
+            )
+            await session.commit()
+
+    async def run(self, path: str, fmt: Optional[str] = None) -> dict:
+        source = os.path.abspath(path)
+        checkpoint = self._load_checkpoint(source)
+        skip = checkpoint["records"]
+        if skip:
+            logger.info(f"Import: retomando {path} após {skip} registros")
+        start = time.perf_counter()
+
+        chunk: List[Record] = []
+        records = read_records(path, fmt)
+        for position, record in enumerate(records, start=1):
+            if position <= skip:
+                continue
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                await self._commit_chunk(chunk, checkpoint)
+                chunk = []
+        if chunk:
+            await self._commit_chunk(chunk, checkpoint)
+
+        if checkpoint["max_id"]:
+            await self._advance_id_counters(checkpoint["max_id"])
+        return {
+            "records": checkpoint["records"],
+            "inserted": checkpoint["inserted"],
+            "skipped": skip,
+            "max_id": checkpoint["max_id"],
+            "seconds": time.perf_counter() - start,
+        }
+
+    async def _commit_chunk(self, chunk: List[Record], checkpoint: dict) -> None:
+        async with self.session_factory() as session:
+            inserted = await self._load_chunk(session, chunk)
+        if self.bloom is not None:
+            await self.bloom.add_many([record[1] for record in chunk])
+        checkpoint["records"] += len(chunk)
+        checkpoint["inserted"] += inserted
+        checkpoint["max_id"] = max(checkpoint["max_id"], max(record[0] for record in chunk))
+        self._save_checkpoint(checkpoint)
+        logger.info(f"Import: {checkpoint['records']} registros ({checkpoint['inserted']} novos)")
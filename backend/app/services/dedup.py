@@ -0,0 +1,103 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.services.local_cache import LocalCache
+
+REDIS_PREFIX = "dedup:"
+DIGEST_SIZE = 16
+
+
+def url_digest(original_url: str) -> bytes:
+    """Hash de largura fixa da URL longa (blake2b, 16 bytes) - PK de url_hashes."""
+    return hashlib.blake2b(original_url.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class URLDeduplicator:
+    """
+    Lembra quais URLs longas foram encurtadas recentemente (hash -> chave).
+
+    Consulta o cache do worker e depois o Redis (`dedup:<hash hex>`). Um miss
+    aqui NÃO significa que a URL é nova: o URLService ainda consulta a tabela
+    url_hashes no master antes de gravar.
+    """
+
+    def __init__(self, redis_client: redis.Redis, local: Optional[LocalCache] = None, ttl: int = 86400):
+        self.redis = redis_client
+        self.local = local
+        self.ttl = ttl
+
+        # Métricas
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    async def lookup(self, digest: bytes) -> Optional[str]:
+        key = digest.hex()
+        if self.local is not None:
+            short_key = self.local.get(key)
+            if short_key:
+                self.local_hits += 1
+                return short_key
+        try:
+            short_key = await self.redis.get(REDIS_PREFIX + key)
+        except RedisError:
+            short_key = None  # Sem Redis, o índice do banco ainda garante a dedup
+        if short_key:
+            self.redis_hits += 1
+            if self.local is not None:
+                self.local.set(key, short_key)
+            return short_key
+        self.misses += 1
+        return None
+
+    async def lookup_many(self, digests: Iterable[bytes]) -> Dict[bytes, str]:
+        """Lote: cache do worker e um MGET para o resto."""
+        found: Dict[bytes, str] = {}
+        pending: List[bytes] = []
+        for digest in dict.fromkeys(digests):
+            short_key = self.local.get(digest.hex()) if self.local is not None else None
+            if short_key:
+                self.local_hits += 1
+                found[digest] = short_key
+            else:
+                pending.append(digest)
+        if not pending:
+            return found
+        try:
+            values = await self.redis.mget([REDIS_PREFIX + digest.hex() for digest in pending])
+        except RedisError:
+            values = [None] * len(pending)
+        for digest, short_key in zip(pending, values):
+            if short_key:
+                self.redis_hits += 1
+                found[digest] = short_key
+                if self.local is not None:
+                    self.local.set(digest.hex(), short_key)
+            else:
+                self.misses += 1
+        return found
+
+    async def remember(self, pairs: Dict[bytes, str]) -> None:
+        """Registra hash -> chave no worker e no Redis (um pipeline)."""
+        if not pairs:
+            return
+        if self.local is not None:
+            for digest, short_key in pairs.items():
+                self.local.set(digest.hex(), short_key)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for digest, short_key in pairs.items():
+                    pipe.set(REDIS_PREFIX + digest.hex(), short_key, ex=self.ttl)
+                await pipe.execute()
+        except RedisError:
+            pass  # Só perde o atalho; o índice do banco continua valendo
+
+    def stats(self) -> dict:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+        }
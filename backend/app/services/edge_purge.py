@@ -0,0 +1,60 @@
+import asyncio
+from typing import Dict, Optional, Sequence, Union
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Header que o Nginx aceita (só de redes internas) para ignorar o cache e
+# regravar a entrada com a resposta nova do backend (proxy_cache_bypass)
+REFRESH_HEADER = "X-Cache-Refresh"
+
+
+class EdgePurger:
+    """
+    Invalida uma chave nas bordas (Nginx/CDN) depois de ela mudar no backend.
+
+    Cada URL de REDIRECT_PURGE_URLS ("{short_key}" substituído) recebe um GET
+    com X-Cache-Refresh: 1. O Nginx open source não tem PURGE: o header faz o
+    proxy_cache_bypass buscar a resposta atual e sobrescrever a entrada em
+    cache. Sem URLs configuradas, a borda converge em s-maxage.
+    """
+
+    def __init__(
+        self,
+        url_templates: Sequence[str],
+        timeout: float = 2.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url_templates = [url for url in url_templates if url]
+        self.timeout = timeout
+        self._transport = transport
+
+    async def purge(self, short_key: str) -> Dict[str, Union[int, str]]:
+        """URL de purge -> status HTTP recebido (ou o erro). Nunca levanta."""
+        if not self.url_templates:
+            return {}
+        urls = [template.format(short_key=short_key) for template in self.url_templates]
+        async with httpx.AsyncClient(
+            timeout=self.timeout, transport=self._transport, follow_redirects=False
+        ) as client:
+            results = await asyncio.gather(
+                *[client.get(url, headers={REFRESH_HEADER: "1"}) for url in urls],
+                return_exceptions=True,
+            )
+        report: Dict[str, Union[int, str]] = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Purge de {short_key} falhou em {url}: {result!r}")
+                report[url] = repr(result)
+            else:
+                report[url] = result.status_code
+        return report
+
+
+# Instância compartilhada por worker
+edge_purger = EdgePurger(
+    [url.strip() for url in settings.REDIRECT_PURGE_URLS.split(",")],
+    timeout=settings.REDIRECT_PURGE_TIMEOUT,
+)
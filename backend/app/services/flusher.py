@@ -0,0 +1,67 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from app.core.logger import logger
+
+
+class PeriodicFlusher(ABC):
+    """
+    Base para buffers em memória drenados em background (write-behind).
+
+    Subclasses implementam `flush()` e `has_pending` (abstratos). O loop chama flush a
+    cada `flush_interval` segundos, ou antes se `wakeup()` for chamado; no
+    `stop()` o buffer é drenado uma última vez.
+    """
+
+    name = "flusher"
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._wakeup_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.flush_errors = 0
+
+    @property
+    @abstractmethod
+    def has_pending(self) -> bool:
+        """Há algo no buffer para o próximo flush."""
+
+    @abstractmethod
+    async def flush(self) -> int:
+        """Drena o buffer; devolve quantos itens foram gravados."""
+
+    def wakeup(self) -> None:
+        """Antecipa o próximo flush (ex: buffer cheio)."""
+        self._wakeup_event.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Flush de {self.name} falhou, tentando no próximo ciclo: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Para o loop e drena o que restou no buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.has_pending:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Dados de {self.name} perdidos no shutdown: {e}")
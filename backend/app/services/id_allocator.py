@@ -0,0 +1,192 @@
+import asyncio
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from redis.asyncio import Redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.logger import logger
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository
+
+# Intervalos [start, end] inclusivos, em ordem
+Ranges = List[Tuple[int, int]]
+
+
+async def _max_url_id(session_factory: async_sessionmaker) -> int:
+    async with session_factory() as session:
+        result = await session.execute(select(func.coalesce(func.max(URL.id), 0)))
+        return result.scalar_one()
+
+
+def _to_ranges(ids: Iterable[int]) -> Ranges:
+    """IDs soltos -> intervalos contíguos (nextvals concorrentes podem intercalar)."""
+    ranges: Ranges = []
+    for value in sorted(ids):
+        if ranges and ranges[-1][1] == value - 1:
+            ranges[-1] = (ranges[-1][0], value)
+        else:
+            ranges.append((value, value))
+    return ranges
+
+
+class DatabaseBlockSource:
+    """
+    Aluga blocos de IDs da mesma fonte de todas as outras escritas.
+
+    No Postgres é a sequence urls_id_seq (nextval em lote): reserve_id com
+    ID_ALLOCATOR=none, o DEFAULT da coluna e o import enxergam os mesmos
+    IDs, então nenhum caminho entrega um ID já alugado. No SQLite de dev a
+    sequence é emulada pelo contador de `id_counters` (ver URLRepository).
+    Vários nextval concorrentes podem intercalar: o bloco vem como uma lista
+    de intervalos, quase sempre um só.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def lease(self, size: int) -> Ranges:
+        async with self.session_factory() as session:
+            return _to_ranges(await URLRepository(session).reserve_ids(size))
+
+
+# Só sobe o contador (nunca para trás), atomicamente em relação aos INCRBY
+ADVANCE_COUNTER_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+class RedisBlockSource:
+    """
+    Aluga blocos com INCRBY num contador do Redis (sem tocar no master).
+
+    Se o contador sumir (flush/failover sem persistência), ele é semeado de
+    novo a partir do maior ID do banco + `seed_margin`, folga que cobre os
+    blocos já entregues e ainda não gravados.
+
+    A sequence do banco não vê este contador: use só quando TODOS os
+    workers alocam pelo Redis (nada de ID_ALLOCATOR=none ou "database" ao
+    mesmo tempo, nem durante um deploy).
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        session_factory: async_sessionmaker,
+        key: str = "ids:urls:next",
+        seed_margin: int = 1_000_000,
+    ):
+        self.redis = redis_client
+        self.session_factory = session_factory
+        self.key = key
+        self.seed_margin = seed_margin
+
+    async def lease(self, size: int) -> Ranges:
+        if not await self.redis.exists(self.key):
+            seed = await _max_url_id(self.session_factory) + self.seed_margin
+            # NX: se outro worker semeou antes, o valor dele prevalece
+            await self.redis.set(self.key, seed, nx=True)
+        end = await self.redis.incrby(self.key, size)
+        return [(end - size + 1, end)]
+
+    async def advance_past(self, max_id: int) -> None:
+        """Garante que o próximo bloco comece depois de `max_id` (ex.: após um import)."""
+        await self.redis.eval(ADVANCE_COUNTER_LUA, 1, self.key, max_id)
+
+
+class IdAllocator:
+    """
+    Entrega IDs localmente a partir de blocos alugados (ex: 10k por vez).
+
+    Cada worker tem o seu; o caminho comum é só incrementar um inteiro, sem
+    ida ao master. Quando o bloco atual passa de `prefetch_ratio` de uso, o
+    próximo é alugado em background para a troca não custar latência.
+    IDs não usados de um bloco viram lacunas (nunca são reusados).
+    """
+
+    def __init__(self, source, block_size: int = 10000, prefetch_ratio: float = 0.9):
+        self.source = source
+        self.block_size = block_size
+        self.prefetch_at = int(block_size * prefetch_ratio)
+        self._next = 0
+        self._end = -1  # Sem bloco: next > end
+        self._pending: Deque[Tuple[int, int]] = deque()  # Demais intervalos do bloco
+        self._used_in_block = 0
+        self._prefetch: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.leases = 0
+
+    @property
+    def remaining(self) -> int:
+        pending = sum(end - start + 1 for start, end in self._pending)
+        return max(0, self._end - self._next + 1) + pending
+
+    async def allocate(self) -> int:
+        # Laço: o bloco novo pode ter sido consumido por outras tasks na espera
+        while self._next > self._end:
+            await self._advance()
+        value = self._next
+        self._next += 1
+        self._used_in_block += 1
+        if self._used_in_block == self.prefetch_at:
+            self._start_prefetch()
+        return value
+
+    async def allocate_many(self, count: int) -> List[int]:
+        """IDs para um lote (podem atravessar mais de um bloco)."""
+        ids: List[int] = []
+        while len(ids) < count:
+            while self._next > self._end:
+                await self._advance()
+            take = min(count - len(ids), self._end - self._next + 1)
+            ids.extend(range(self._next, self._next + take))
+            self._next += take
+            before = self._used_in_block
+            self._used_in_block += take
+            if before < self.prefetch_at <= self._used_in_block:
+                self._start_prefetch()
+        return ids
+
+    def _start_prefetch(self) -> None:
+        if self._prefetch is None:
+            self._prefetch = asyncio.ensure_future(self._lease())
+
+    async def _lease(self) -> Ranges:
+        block = await self.source.lease(self.block_size)
+        self.leases += 1
+        logger.info(f"Bloco de IDs alugado: {block[0][0]}-{block[-1][1]} ({len(block)} intervalo(s))")
+        return block
+
+    async def _advance(self) -> None:
+        async with self._lock:
+            if self._next <= self._end:
+                return  # Outra task já trocou de bloco enquanto esperávamos
+
+            if self._pending:
+                self._next, self._end = self._pending.popleft()
+                return
+
+            block = None
+            if self._prefetch is not None:
+                prefetch, self._prefetch = self._prefetch, None
+                try:
+                    block = await prefetch
+                except Exception as e:
+                    logger.warning(f"Prefetch de IDs falhou, alugando de novo: {e}")
+            if block is None:
+                block = await self._lease()
+
+            (self._next, self._end), *rest = block
+            self._pending.extend(rest)
+            self._used_in_block = 0
+
+    async def close(self) -> None:
+        """Cancela o prefetch em andamento (o restante do bloco vira lacuna)."""
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+            self._prefetch = None
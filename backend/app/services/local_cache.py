@@ -0,0 +1,131 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+# Overhead aproximado por entrada (tupla + nó do OrderedDict + objetos str)
+ENTRY_OVERHEAD = 120
+
+
+class LocalCache:
+    """
+    Cache L1 em memória do processo (LRU com TTL), na frente do Redis.
+
+    Limitado por número de entradas E por bytes aproximados. Todas as operações
+    são síncronas (sem await), então no event loop de um worker uvicorn elas são
+    atômicas: as tasks asyncio podem compartilhar a mesma instância sem lock.
+    NÃO é thread-safe (cada worker/processo tem o seu).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[str, tuple[Any, float, int]]" = OrderedDict()
+        self.current_bytes = 0
+
+        # Contadores (expostos para métricas)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[1] > self._clock()
+
+    @staticmethod
+    def _entry_size(key: str, value: Any) -> int:
+        if isinstance(value, str):
+            return len(key) + len(value) + ENTRY_OVERHEAD
+        return len(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retorna o valor (e marca como recém usado) ou None se ausente/expirado."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, size = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.current_bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            # Valor maior que o cache inteiro: não vale a pena guardar
+            return
+
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[2]
+
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at, size)
+        self.current_bytes += size
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.current_bytes = 0
+
+    def _evict(self) -> None:
+        """Remove as entradas menos usadas até respeitar os limites."""
+        while self._data and (
+            len(self._data) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Instância compartilhada por worker (None se o L1 estiver desabilitado)
+local_cache: Optional[LocalCache] = (
+    LocalCache(
+        max_entries=settings.L1_CACHE_MAX_ENTRIES,
+        max_bytes=settings.L1_CACHE_MAX_BYTES,
+        ttl=settings.L1_CACHE_TTL,
+    )
+    if settings.L1_CACHE_ENABLED
+    else None
+)
@@ -0,0 +1,174 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from app.services.flusher import PeriodicFlusher
+
+CREATE = "create"
+REDIRECT = "redirect"
+
+REDIS_PREFIX = "rl:"
+
+# Janela deslizante aproximada (duas janelas fixas ponderadas), atômica:
+# soma o que este worker serviu desde o último sync e devolve a estimativa
+# global da janela.
+#   KEYS[1] = contador da janela atual, KEYS[2] = da janela anterior
+#   ARGV[1] = incremento, ARGV[2] = fração já decorrida da janela atual,
+#   ARGV[3] = TTL do contador (2 janelas)
+SLIDING_WINDOW_LUA = """
+local current = redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+return math.floor(previous * (1 - tonumber(ARGV[2])) + current)
+"""
+
+
+class RouteLimit(NamedTuple):
+    limit: int   # requisições por janela, somando todos os workers
+    burst: int   # rajada aceita pelo bucket local
+
+
+class RateLimiter(PeriodicFlusher):
+    """
+    Rate limit por cliente (API key ou IP) e por classe de rota.
+
+    Decisão sempre local e síncrona: um token bucket por (rota, cliente) no
+    worker, com a taxa global da rota. O que o worker serviu é acumulado e,
+    a cada `flush_interval`, enviado ao Redis num pipeline (script Lua de
+    janela deslizante). Cliente que estourou o limite global fica bloqueado
+    localmente até a janela virar - o limite entre workers converge com
+    atraso de um sync, sem ida ao Redis por requisição.
+    """
+
+    name = "rate limit"
+
+    def __init__(
+        self,
+        redis_client: Optional[Redis],
+        limits: Dict[str, RouteLimit],
+        window: float = 60.0,
+        sync_interval: float = 1.0,
+        max_clients: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        super().__init__(sync_interval)
+        self.redis = redis_client
+        self.limits = limits
+        self.window = window
+        self.max_clients = max_clients
+        self._clock = clock
+        self._wall_clock = wall_clock
+
+        # (rota, cliente) -> [tokens, último refill]
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        # (rota, cliente) -> servidas desde o último sync
+        self._unsynced: Dict[Tuple[str, str], int] = {}
+        # (rota, cliente) -> bloqueado até (clock) pelo limite global
+        self._blocked: Dict[Tuple[str, str], float] = {}
+
+        # Métricas
+        self.allowed = 0
+        # (rota, motivo) -> recusadas; motivo "local" (bucket) ou "global" (Redis)
+        self.shed: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._unsynced)
+
+    def check(self, route: str, client: str) -> Optional[float]:
+        """
+        None se a requisição pode seguir; senão, segundos até tentar de novo
+        (para o Retry-After). Síncrono e sem I/O.
+        """
+        limit = self.limits.get(route)
+        if limit is None:
+            return None
+        key = (route, client)
+        now = self._clock()
+
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if now < blocked_until:
+                self._count_shed(route, "global")
+                return blocked_until - now
+            del self._blocked[key]
+
+        retry_after = self._take(key, limit, now)
+        if retry_after:
+            self._count_shed(route, "local")
+            return retry_after
+
+        self.allowed += 1
+        self._unsynced[key] = self._unsynced.get(key, 0) + 1
+        return None
+
+    def _count_shed(self, route: str, reason: str) -> None:
+        self.shed[(route, reason)] = self.shed.get((route, reason), 0) + 1
+
+    def _take(self, key: Tuple[str, str], limit: RouteLimit, now: float) -> float:
+        rate = limit.limit / self.window
+        state = self._buckets.get(key)
+        if state is None:
+            state = self._buckets[key] = [float(limit.burst), now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        tokens = min(limit.burst, state[0] + (now - state[1]) * rate)
+        state[1] = now
+        if tokens >= 1:
+            state[0] = tokens - 1
+            return 0.0
+        state[0] = tokens
+        return (1 - tokens) / rate
+
+    @staticmethod
+    def _window_keys(route: str, client: str, window_id: int) -> Tuple[str, str]:
+        prefix = f"{REDIS_PREFIX}{route}:{client}:"
+        return f"{prefix}{window_id}", f"{prefix}{window_id - 1}"
+
+    async def flush(self) -> int:
+        """Envia as contagens ao Redis e bloqueia quem passou do limite global."""
+        now = self._clock()
+        self._blocked = {key: until for key, until in self._blocked.items() if until > now}
+        if not self._unsynced or self.redis is None:
+            self._unsynced.clear()
+            return 0
+
+        pending, self._unsynced = self._unsynced, {}
+        items = list(pending.items())
+        ttl = int(math.ceil(self.window * 2))
+        window_id, offset = divmod(self._wall_clock(), self.window)
+        elapsed = offset / self.window
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for (route, client), count in items:
+                    current, previous = self._window_keys(route, client, int(window_id))
+                    pipe.eval(SLIDING_WINDOW_LUA, 2, current, previous, count, elapsed, ttl)
+                estimates = await pipe.execute()
+        except Exception:
+            # Contagens voltam para o próximo sync (o limite local segue valendo)
+            self.flush_errors += 1
+            for key, count in items:
+                self._unsynced[key] = self._unsynced.get(key, 0) + count
+            raise
+
+        # Bloqueio até a janela virar (a anterior passa a pesar cada vez menos)
+        retry_after = max(1.0, self.window - offset)
+        for (key, _), estimate in zip(items, estimates):
+            if int(estimate) > self.limits[key[0]].limit:
+                self._blocked[key] = now + retry_after
+        return len(items)
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "shed": {f"{route}:{reason}": count for (route, reason), count in self.shed.items()},
+            "tracked_clients": len(self._buckets),
+            "blocked_clients": len(self._blocked),
+        }
@@ -0,0 +1,158 @@
+"""
+Status e headers de cache dos redirects.
+
+301/308 são permanentes: navegador e borda guardam por
+REDIRECT_PERMANENT_MAX_AGE e o clique seguinte nem chega ao servidor.
+302/307 são temporários: `max-age` (navegador) costuma ser 0, para todo
+clique passar pela borda, e `s-maxage` deixa o Nginx/CDN responder sozinho
+por REDIRECT_EDGE_MAX_AGE - o backend só vê uma requisição por chave por
+janela. Cliques servidos pela borda aparecem apenas no access log dela
+($upstream_cache_status = HIT).
+
+O status vem do link (coluna redirect_status) ou do padrão global. Os caches
+(L1 e Redis) guardam a "entrada" do link: a URL, ou "302|url" quando o link
+tem status próprio - URLs começam com http(s)://, então não há ambiguidade.
+"""
+import hashlib
+import time
+from email.utils import formatdate
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from app.core.config import settings
+
+REDIRECT_STATUSES = (301, 302, 307, 308)
+PERMANENT_STATUSES = frozenset((301, 308))
+
+Headers = Tuple[Tuple[bytes, bytes], ...]
+
+
+def cache_entry(original_url: str, status: Optional[int] = None) -> str:
+    """Valor guardado no L1/Redis para o link."""
+    return original_url if status is None else f"{status}|{original_url}"
+
+
+def parse_entry(entry: str) -> Tuple[str, Optional[int]]:
+    """(original_url, status do link ou None) a partir da entrada do cache."""
+    if entry[3:4] == "|" and entry[:3].isdigit():
+        return entry[4:], int(entry[:3])
+    return entry, None
+
+
+@lru_cache(maxsize=4096)
+def redirect_headers(url: str) -> Headers:
+    """
+    Location (e corpo vazio) já em bytes, memoizados por URL (chaves quentes
+    não re-codificam nada). O `quote` é o mesmo do RedirectResponse do Starlette.
+    """
+    location = quote(url, safe=":/%#?=@[]!$&'()*+,;")
+    return ((b"location", location.encode("latin-1")), (b"content-length", b"0"))
+
+
+def _etag(url: str, status: int) -> bytes:
+    """ETag fraco: muda junto com o destino ou o status do link."""
+    digest = hashlib.blake2b(f"{status} {url}".encode("utf-8"), digest_size=8).hexdigest()
+    return f'W/"{digest}"'.encode("latin-1")
+
+
+class RedirectPolicy:
+    """
+    Monta status e headers (Cache-Control, Expires, ETag) de um redirect.
+
+    Tudo que não depende do relógio é pré-calculado: Cache-Control por
+    status na construção, Location + ETag por (url, status) numa LRU. O
+    Expires é formatado no máximo uma vez por segundo.
+    """
+
+    def __init__(
+        self,
+        default_status: int = 301,
+        permanent_max_age: int = 86400,
+        max_age: int = 0,
+        edge_max_age: int = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        if default_status not in REDIRECT_STATUSES:
+            raise ValueError(f"REDIRECT_STATUS inválido: {default_status} (use {REDIRECT_STATUSES})")
+        self.default_status = default_status
+        self.permanent_max_age = permanent_max_age
+        self.max_age = max_age
+        self.edge_max_age = edge_max_age
+        self._clock = clock
+
+        # status -> (Cache-Control em bytes, max-age do navegador ou None se no-store)
+        self._cache_control: Dict[int, Tuple[bytes, Optional[int]]] = {
+            status: self._build_cache_control(status) for status in REDIRECT_STATUSES
+        }
+        self._expires_second = -1
+        self._expires: Dict[int, bytes] = {}
+        self._link_headers = lru_cache(maxsize=4096)(self._build_link_headers)
+
+    def _build_cache_control(self, status: int) -> Tuple[bytes, Optional[int]]:
+        if status in PERMANENT_STATUSES:
+            browser, edge = self.permanent_max_age, None
+        else:
+            browser, edge = self.max_age, self.edge_max_age
+        if browser <= 0 and not edge:
+            return b"no-store", None
+        value = f"public, max-age={max(browser, 0)}"
+        if edge:
+            value += f", s-maxage={edge}"
+        return value.encode("latin-1"), max(browser, 0)
+
+    def _build_link_headers(self, url: str, status: int) -> Tuple[Headers, bytes]:
+        etag = _etag(url, status)
+        cache_control = self._cache_control[status][0]
+        return redirect_headers(url) + ((b"cache-control", cache_control), (b"etag", etag)), etag
+
+    def _expires_header(self, max_age: int) -> bytes:
+        now = self._clock()
+        second = int(now)
+        if second != self._expires_second:
+            self._expires_second = second
+            self._expires = {}
+        value = self._expires.get(max_age)
+        if value is None:
+            value = formatdate(second + max_age, usegmt=True).encode("latin-1")
+            self._expires[max_age] = value
+        return value
+
+    def status_for(self, link_status: Optional[int] = None) -> int:
+        return link_status if link_status in REDIRECT_STATUSES else self.default_status
+
+    def respond(
+        self, url: str, link_status: Optional[int] = None, if_none_match: Optional[str] = None
+    ) -> Tuple[int, Headers]:
+        """
+        (status, headers ASGI) do redirect. Se o If-None-Match já tem o ETag
+        (revalidação do Nginx com proxy_cache_revalidate, ou do navegador),
+        devolve 304 só com os headers de cache.
+        """
+        status = self.status_for(link_status)
+        headers, etag = self._link_headers(url, status)
+        max_age = self._cache_control[status][1]
+        if max_age is not None:
+            headers += ((b"expires", self._expires_header(max_age)),)
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return 304, tuple(header for header in headers if header[0] not in (b"location", b"content-length"))
+        return status, headers
+
+
+def _etag_matches(if_none_match: str, etag: bytes) -> bool:
+    """Comparação fraca (RFC 9110): ignora o prefixo W/."""
+    tag = etag.decode("latin-1").removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+# Instância compartilhada por worker
+redirect_policy = RedirectPolicy(
+    default_status=settings.REDIRECT_STATUS,
+    permanent_max_age=settings.REDIRECT_PERMANENT_MAX_AGE,
+    max_age=settings.REDIRECT_MAX_AGE,
+    edge_max_age=settings.REDIRECT_EDGE_MAX_AGE,
+)
@@ -0,0 +1,172 @@
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, NamedTuple, Tuple
+
+from app.core.logger import logger
+from app.services.flusher import PeriodicFlusher
+
+CACHE = "cache"    # target: (redis, cache_policy); item: (short_key, entrada do cache)
+BLOOM = "bloom"    # target: bloom filter;          item: short_key
+DEDUP = "dedup"    # target: URLDeduplicator;       item: (url_hash, short_key)
+
+
+class SideEffect(NamedTuple):
+    kind: str
+    target: Hashable
+    item: Any
+    enqueued_at: float
+    attempts: int = 0
+
+
+async def _write_cache(target, items: List[Tuple[str, str]]) -> None:
+    redis, policy = target
+    async with redis.pipeline(transaction=False) as pipe:
+        for short_key, entry in items:
+            pipe.set(short_key, policy.encode(entry), ex=policy.ttl(short_key))
+        await pipe.execute()
+    for short_key, _ in items:
+        await policy.maybe_sample_memory(redis, short_key)
+
+
+async def _add_bloom(bloom, items: List[str]) -> None:
+    await bloom.add_many(items)
+
+
+async def _remember_hashes(deduplicator, items: List[Tuple[bytes, str]]) -> None:
+    await deduplicator.remember(dict(items))
+
+
+HANDLERS: Dict[str, Callable[[Any, list], Awaitable[None]]] = {
+    CACHE: _write_cache,
+    BLOOM: _add_bloom,
+    DEDUP: _remember_hashes,
+}
+
+
+async def run_side_effect(kind: str, target: Hashable, items: list) -> None:
+    """Executa um lote de efeitos na hora, sem fila."""
+    await HANDLERS[kind](target, items)
+
+
+class SideEffectQueue(PeriodicFlusher):
+    """
+    Fila em memória para os efeitos colaterais da criação (cache, Bloom,
+    dedup), executados depois que o POST /urls já respondeu.
+
+    A cada `flush_interval` (ou ao juntar `batch_size` itens) a fila é
+    drenada em lotes; dentro de um lote os itens são agrupados por tipo e
+    destino - N criações viram um pipeline no Redis e um add_many no Bloom.
+    Lote que falha volta para a frente da fila e é tentado de novo com
+    backoff exponencial, até `max_attempts`. Fila cheia recusa o item e quem
+    chamou executa o efeito na hora (backpressure, sem perda).
+    """
+
+    name = "efeitos da criação"
+
+    def __init__(
+        self,
+        capacity: int = 50_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        max_attempts: int = 5,
+        backoff: float = 0.1,
+        max_backoff: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(flush_interval)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._items: Deque[SideEffect] = deque()
+        self._retry_at = 0.0
+
+        # Métricas
+        self.submitted = 0
+        self.rejected = 0   # Fila cheia: executados inline
+        self.processed = 0
+        self.retried = 0
+        self.dropped = 0    # Desistência após max_attempts
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._items)
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    @property
+    def lag(self) -> float:
+        """Idade (s) do item mais antigo ainda na fila."""
+        return self._clock() - self._items[0].enqueued_at if self._items else 0.0
+
+    def submit(self, kind: str, target: Hashable, item: Any) -> bool:
+        """Enfileira um efeito. False se a fila estiver cheia (execute inline)."""
+        if len(self._items) >= self.capacity:
+            self.rejected += 1
+            return False
+        self._items.append(SideEffect(kind, target, item, self._clock()))
+        self.submitted += 1
+        if len(self._items) >= self.batch_size:
+            self.wakeup()
+        return True
+
+    async def flush(self) -> int:
+        if not self._items or self._clock() < self._retry_at:
+            return 0
+        done = 0
+        while self._items:
+            batch = [self._items.popleft() for _ in range(min(self.batch_size, len(self._items)))]
+            groups: Dict[Tuple[str, Hashable], List[SideEffect]] = {}
+            for effect in batch:
+                groups.setdefault((effect.kind, effect.target), []).append(effect)
+
+            failed: List[SideEffect] = []
+            for (kind, target), effects in groups.items():
+                try:
+                    await HANDLERS[kind](target, [effect.item for effect in effects])
+                    self.processed += len(effects)
+                except Exception as e:
+                    logger.warning(f"Efeito '{kind}' falhou para {len(effects)} itens: {e}")
+                    failed.extend(effects)
+
+            done += len(batch) - len(failed)
+            if failed:
+                self._requeue(failed)
+                break
+        return done
+
+    def _requeue(self, failed: List[SideEffect]) -> None:
+        self.flush_errors += 1
+        retry = [
+            effect._replace(attempts=effect.attempts + 1)
+            for effect in failed if effect.attempts + 1 < self.max_attempts
+        ]
+        if len(retry) < len(failed):
+            self.dropped += len(failed) - len(retry)
+            logger.error(f"{len(failed) - len(retry)} efeitos descartados após {self.max_attempts} tentativas")
+        if retry:
+            self.retried += len(retry)
+            # De volta para a frente da fila, na ordem original
+            self._items.extendleft(reversed(retry))
+            attempts = max(effect.attempts for effect in retry)
+            self._retry_at = self._clock() + min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+
+    async def stop(self) -> None:
+        """Drena a fila ignorando o backoff (última chance antes do shutdown)."""
+        self._retry_at = 0.0
+        await super().stop()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "lag": self.lag,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
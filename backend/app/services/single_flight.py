@@ -0,0 +1,75 @@
+import asyncio
+import math
+import random
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalescência de requisições (padrão "singleflight" do Go).
+
+    Enquanto uma carga para a chave X estiver em andamento, novas chamadas para
+    X não disparam outra carga: aguardam o mesmo Future e recebem o mesmo
+    resultado (ou a mesma exceção). Escopo: um event loop (um worker uvicorn).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0   # Cargas efetivamente executadas
+        self.shared = 0  # Chamadas que pegaram carona numa carga em andamento
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        # shield: se quem disparou a carga for cancelado (cliente desconectou),
+        # a carga continua para os demais que estão esperando
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+
+class MovingAverage:
+    """Média móvel exponencial (EWMA) - usada para estimar o custo de recomputar."""
+
+    def __init__(self, alpha: float = 0.1, initial: float = 0.0):
+        self.alpha = alpha
+        self.value = initial
+
+    def update(self, sample: float) -> float:
+        self.value += self.alpha * (sample - self.value)
+        return self.value
+
+
+def should_refresh_early(ttl_remaining: float, delta: float, beta: float = 1.0) -> bool:
+    """
+    Expiração antecipada probabilística (XFetch, Vattani et al. 2015).
+
+    Decide se esta requisição deve recarregar a entrada ANTES de ela expirar.
+    A probabilidade cresce conforme o TTL restante se aproxima do custo de
+    recomputar (delta), então chaves quentes são renovadas por UMA requisição
+    antes do vencimento e o "thundering herd" nunca se forma.
+
+    :param ttl_remaining: Segundos até a entrada expirar
+    :param delta: Tempo (segundos) que a recomputação costuma levar
+    :param beta: > 1 favorece renovar mais cedo; 0 desliga
+    """
+    if beta <= 0 or delta <= 0:
+        return False
+    # 1 - random() está em (0, 1], evitando log(0)
+    return -delta * beta * math.log(1.0 - random.random()) >= ttl_remaining
+
+
+# Instância compartilhada pelo worker para o caminho de redirect
+redirect_flight = SingleFlight()
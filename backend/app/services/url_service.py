@@ -1,57 +1,381 @@
-import string
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError
 from app.repositories.url_repository import URLRepository
 from app.core.config import settings
-from app.services.bloom_filter import BloomFilter
+from app.core import metrics
+from app.core.keygen import decode_short_key, generate_short_key, generate_short_keys, is_valid_short_key
+from app.core.logger import cache_tier_var
+from app.core.replica_router import ReplicaRouter
+from app.core.resources import resources
+from app.services.bloom_filter import AnyBloomFilter
+from app.services.cache_policy import CachePolicy, cache_policy as shared_cache_policy
+from app.services.dedup import URLDeduplicator, url_digest
+from app.services.id_allocator import IdAllocator
+from app.services.local_cache import LocalCache, local_cache as shared_local_cache
+from app.services.redirect_policy import cache_entry, parse_entry
+from app.services.side_effects import (
+    BLOOM, CACHE, DEDUP, SideEffectQueue, run_side_effect
+)
+from app.services.single_flight import MovingAverage, redirect_flight, should_refresh_early
+
+# Custo médio (s) de uma carga no banco - o "delta" da renovação antecipada
+db_load_time = MovingAverage(alpha=0.1, initial=0.005)
+
+def _observe(histogram, since: float) -> float:
+    """Registra o tempo desde `since` e devolve o novo marco."""
+    now = time.perf_counter()
+    histogram.observe(now - since)
+    return now
 
-# Alfabeto para Base62 (0-9, a-z, A-Z) conforme requisitos
-BASE62 = string.digits + string.ascii_letters 
 
 class URLService:
-    def __init__(self, repository: URLRepository):
+    def __init__(
+        self,
+        repository: URLRepository,
+        local_cache: Optional[LocalCache] = None,
+        redis_client: Optional[redis.Redis] = None,
+        bloom: Optional[AnyBloomFilter] = None,
+        id_allocator: Optional[IdAllocator] = None,
+        read_router: Optional[ReplicaRouter] = None,
+        cache_policy: Optional[CachePolicy] = None,
+        deduplicator: Optional[URLDeduplicator] = None,
+        side_effects: Optional[SideEffectQueue] = None,
+    ):
         self.repository = repository
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
-
-    def _encode_base62(self, num: int) -> str:
-        """Converte ID numérico para Base62 (menor hash possível)."""
-        if num == 0:
-            return BASE62[0]
-        arr = []
-        base = len(BASE62)
-        while num:
-            num, rem = divmod(num, base)
-            arr.append(BASE62[rem])
-        arr.reverse()
-        return ''.join(arr)
-
-    async def shorten_url(self, original_url: str) -> str:
-        # 1. Persistir para gerar ID
-        url_record = await self.repository.create(original_url)
+        # Cliente do pool compartilhado do processo (nada de from_url por requisição)
+        self.redis = redis_client if redis_client is not None else resources.redis
+        # Cache L1 compartilhado pelo worker (padrão) ou injetado (testes)
+        self.local_cache = local_cache if local_cache is not None else shared_local_cache
+        # Bloom Filter compartilhado (None se desabilitado)
+        self.bloom = bloom if bloom is not None else resources.bloom
+        # IDs de blocos alugados pelo worker (None = um nextval por criação)
+        self.id_allocator = id_allocator if id_allocator is not None else resources.id_allocator
+        # Roteador de réplicas (para reler no master chaves recém-criadas)
+        self.read_router = read_router if read_router is not None else resources.read_router
+        # TTLs, popularidade e codificação dos valores no Redis
+        self.cache_policy = cache_policy if cache_policy is not None else shared_cache_policy
+        # Hashes de URLs recém-encurtadas (None = dedup desligada)
+        self.deduplicator = deduplicator if deduplicator is not None else resources.deduplicator
+        # Fila dos efeitos da criação (None = executados antes de responder)
+        self.side_effects = side_effects if side_effects is not None else resources.side_effects
+
+    async def _after_create(self, kind: str, target, items: list) -> None:
+        """Enfileira um efeito da criação; sem fila (ou com ela cheia), executa já."""
+        queue = self.side_effects
+        if queue is not None:
+            for position, item in enumerate(items):
+                if not queue.submit(kind, target, item):
+                    items = items[position:]
+                    break
+            else:
+                return
+        await run_side_effect(kind, target, items)
+
+    async def _find_duplicates(self, digests: Sequence[bytes]) -> Dict[bytes, str]:
+        """Chaves já existentes para estes hashes: worker/Redis, depois o índice do banco."""
+        found = await self.deduplicator.lookup_many(digests)
+        missing = [digest for digest in dict.fromkeys(digests) if digest not in found]
+        if missing:
+            from_db = await self.repository.get_keys_by_hashes(missing)
+            await self.deduplicator.remember(from_db)
+            found.update(from_db)
+        return found
+
+    async def shorten_url(self, original_url: str, redirect_status: Optional[int] = None) -> str:
+        """
+        Cria o link. `redirect_status` (301/302/307/308) fixa o status do
+        redirect deste link; None segue REDIRECT_STATUS.
+        """
+        started = mark = time.perf_counter()
+
+        # 0. Dedup: URL longa já encurtada devolve a chave existente, sem escrita.
+        #    Link com status próprio é sempre novo (o existente pode ter outro)
+        digest = None
+        if self.deduplicator is not None and redirect_status is None:
+            digest = url_digest(original_url)
+            existing = (await self._find_duplicates([digest])).get(digest)
+            if existing:
+                return f"{settings.BASE_URL}/{existing}"
+
+        # 1. Reservar o ID antes de gravar (do bloco local, sem ida ao master)
+        if self.id_allocator is not None:
+            url_id = await self.id_allocator.allocate()
+        else:
+            url_id = await self.repository.reserve_id()
         
-        # 2. Gerar Hash baseado no ID (garante unicidade sem colisão)
-        short_key = self._encode_base62(url_record.id)
+        # 2. Gerar a chave Sqids baseada no ID (garante unicidade sem colisão)
+        short_key = generate_short_key(url_id)
+        mark = _observe(metrics.CREATE_ID, mark)
         
-        # 3. Atualizar registro com a chave
-        await self.repository.update_short_key(url_record.id, short_key)
+        # 3. Persistir a linha completa de uma vez (um INSERT, um commit)
+        try:
+            await self.repository.create(
+                original_url, url_id, short_key, url_hash=digest, redirect_status=redirect_status
+            )
+        except IntegrityError:
+            if digest is None:
+                raise
+            # Corrida: outra requisição gravou a mesma URL entre a consulta e o INSERT
+            existing = (await self.repository.get_keys_by_hashes([digest])).get(digest)
+            if existing is None:
+                raise
+            await self.deduplicator.remember({digest: existing})
+            return f"{settings.BASE_URL}/{existing}"
+        mark = _observe(metrics.CREATE_INSERT, mark)
         
-        # 4. Bloom Filter "Write" check entraria aqui (conforme diagrama)
+        # 4. Registra a chave no Bloom Filter. Inline quando o redirect usa o
+        #    filtro para o 404 rápido (senão um acesso logo após a criação
+        #    daria 404); do contrário vai para a fila como os demais efeitos
+        if self.bloom is not None:
+            if settings.BLOOM_NEGATIVE_LOOKUPS:
+                await self.bloom.add(short_key)
+                mark = _observe(metrics.CREATE_BLOOM, mark)
+            else:
+                await self._after_create(BLOOM, self.bloom, [short_key])
         
-        # 5. Salvar no Cache (Write-through strategy)
-        await self.redis.set(short_key, original_url, ex=3600) # Expira em 1h
+        # 5. Cache: L1 na hora (síncrono); Redis (TTL base da política) e dedup
+        #    pela fila, agrupados com as outras criações
+        entry = cache_entry(original_url, redirect_status)
+        if self.local_cache is not None:
+            self.local_cache.set(short_key, entry)
+        await self._after_create(CACHE, (self.redis, self.cache_policy), [(short_key, entry)])
+        if digest is not None:
+            await self._after_create(DEDUP, self.deduplicator, [(digest, short_key)])
+        _observe(metrics.CREATE_CACHE, mark)
+        _observe(metrics.CREATE_TOTAL, started)
         
         return f"{settings.BASE_URL}/{short_key}"
 
-    async def get_original_url(self, short_key: str) -> str:
+    async def shorten_many(self, original_urls: Sequence[str]) -> List[str]:
+        """
+        Encurta um lote (já validado) e devolve as URLs curtas na mesma ordem.
+        IDs reservados em bloco, um INSERT multi-linha; cache e dedup vão para a
+        fila de efeitos (um pipeline no Redis por flush).
+        """
+        if not original_urls:
+            return []
+
+        # 0. Dedup: só URLs ainda não encurtadas (nem repetidas no lote) viram linhas
+        digests = None
+        new_urls = list(original_urls)
+        if self.deduplicator is not None:
+            all_digests = [url_digest(url) for url in original_urls]
+            keys_by_digest = await self._find_duplicates(all_digests)
+            fresh = {
+                digest: url for digest, url in zip(all_digests, original_urls)
+                if digest not in keys_by_digest
+            }
+            digests, new_urls = list(fresh), list(fresh.values())
+
+        short_keys: List[str] = []
+        if new_urls:
+            # 1. Reservar todos os IDs de uma vez
+            if self.id_allocator is not None:
+                url_ids = await self.id_allocator.allocate_many(len(new_urls))
+            else:
+                url_ids = await self.repository.reserve_ids(len(new_urls))
+            short_keys = generate_short_keys(url_ids)
+
+            # 2. Gravar todas as linhas num INSERT multi-linha (uma transação)
+            try:
+                await self.repository.bulk_create(
+                    list(zip(url_ids, new_urls, short_keys)), url_hashes=digests
+                )
+            except IntegrityError:
+                if digests is None:
+                    raise
+                # Corrida com outra criação da mesma URL: resolve item a item
+                return [await self.shorten_url(url) for url in original_urls]
+
+            # 3. Bloom Filter (inline se usado no 404 rápido) e cache, pela fila
+            if self.bloom is not None:
+                if settings.BLOOM_NEGATIVE_LOOKUPS:
+                    await self.bloom.add_many(short_keys)
+                else:
+                    await self._after_create(BLOOM, self.bloom, short_keys)
+            await self._after_create(
+                CACHE, (self.redis, self.cache_policy), list(zip(short_keys, new_urls))
+            )
+
+        if digests is None:
+            return [f"{settings.BASE_URL}/{short_key}" for short_key in short_keys]
+
+        created = dict(zip(digests, short_keys))
+        await self._after_create(DEDUP, self.deduplicator, list(created.items()))
+        keys_by_digest.update(created)
+        return [f"{settings.BASE_URL}/{keys_by_digest[digest]}" for digest in all_digests]
+
+    async def get_original_url(self, short_key: str) -> Optional[str]:
+        redirect = await self.get_redirect(short_key)
+        return redirect[0] if redirect else None
+
+    async def get_redirect(
+        self, short_key: str, cache_missed: bool = False
+    ) -> Optional[Tuple[str, Optional[int]]]:
+        """
+        (original_url, status do link ou None = padrão global), ou None se não existe.
+        `cache_missed`: o chamador já viu miss no L1 e no Redis (FastRedirectMiddleware).
+        """
+        entry = await self._lookup_entry(short_key, cache_missed)
+        return parse_entry(entry) if entry else None
+
+    async def invalidate(self, short_key: str) -> None:
+        """
+        Tira a chave do Redis e do L1 deste worker (purge). Os L1 dos outros
+        workers expiram em até L1_CACHE_TTL.
+        """
+        await self.redis.delete(short_key)
+        if self.local_cache is not None:
+            self.local_cache.delete(short_key)
+
+    async def _lookup_entry(self, short_key: str, cache_missed: bool = False) -> Optional[str]:
+        """Entrada do link ("url" ou "status|url"): L1 -> Redis -> Bloom -> banco."""
+        # Chave que o codec não geraria (tamanho, alfabeto, forma) -> 404 sem cache nem banco
+        if not is_valid_short_key(short_key):
+            return None
+        if not cache_missed:
+            cached_url = await self._lookup_cache(short_key)
+            if cached_url:
+                return cached_url
+        return await self._lookup_source(short_key)
+
+    async def _lookup_cache(self, short_key: str) -> Optional[str]:
+        """L1 e Redis (com a renovação antecipada do XFetch)."""
+        # 0. Cache L1 (memória do processo) -> hit não sai do worker
+        if self.local_cache is not None:
+            mark = time.perf_counter()
+            cached_url = self.local_cache.get(short_key)
+            if cached_url:
+                _observe(metrics.L1_HIT, mark)
+                cache_tier_var.set("l1")
+                await self.cache_policy.on_hit(self.redis, short_key)
+                return cached_url
+            _observe(metrics.L1_MISS, mark)
+
         # 1. Tentar Cache (Redis) -> Fluxo "200" do diagrama
-        cached_url = await self.redis.get(short_key)
+        beta = settings.CACHE_EARLY_REFRESH_BETA
+        mark = time.perf_counter()
+        if beta > 0:
+            # GET + PTTL no mesmo round trip para decidir a renovação antecipada
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.get(short_key)
+                    pipe.pttl(short_key)
+                    cached_url, ttl_ms = await pipe.execute()
+            except RedisError:
+                _observe(metrics.REDIS_ERROR, mark)
+                raise
+            if cached_url and ttl_ms > 0 and should_refresh_early(
+                ttl_ms / 1000, db_load_time.value, beta
+            ):
+                # Renova antes de expirar (uma requisição só, via single-flight)
+                cached_url = await redirect_flight.do(
+                    short_key, lambda: self._load_from_db(short_key)
+                ) or cached_url
+        else:
+            try:
+                cached_url = await self.redis.get(short_key)
+            except RedisError:
+                _observe(metrics.REDIS_ERROR, mark)
+                raise
+
+        self.cache_policy.record_lookup(short_key, hit=bool(cached_url))
+        _observe(metrics.REDIS_HIT if cached_url else metrics.REDIS_MISS, mark)
         if cached_url:
+            cache_tier_var.set("redis")
+            cached_url = self.cache_policy.decode(cached_url)
+            await self.cache_policy.on_hit(self.redis, short_key)
+            if self.local_cache is not None:
+                self.local_cache.set(short_key, cached_url)
             return cached_url
-            
-        # 2. Cache Miss -> Buscar no DB
-        url_record = await self.repository.get_by_key(short_key)
+        return None
+
+    async def _lookup_source(self, short_key: str) -> Optional[str]:
+        """Bloom Filter e banco, depois de um miss nos caches."""
+        # 2. Bloom Filter: "com certeza não existe" -> 404 sem tocar no banco
+        bloom_checked = False
+        if self.bloom is not None and settings.BLOOM_NEGATIVE_LOOKUPS:
+            mark = time.perf_counter()
+            try:
+                maybe_exists = await self.bloom.may_contain(short_key)
+                # None: filtro incompleto (sem a sentinela) -> vale o banco
+                bloom_checked = maybe_exists is not None
+            except RedisError:
+                _observe(metrics.BLOOM_ERROR, mark)
+                maybe_exists = None  # Na dúvida, consulta o banco
+            if maybe_exists is False:
+                _observe(metrics.BLOOM_ABSENT, mark)
+                cache_tier_var.set("bloom")
+                return None
+            if bloom_checked:
+                _observe(metrics.BLOOM_MAYBE, mark)
+
+        # 3. Cache Miss -> Buscar no DB (uma consulta por chave em andamento no worker)
+        mark = time.perf_counter()
+        entry = await redirect_flight.do(
+            short_key, lambda: self._load_from_db(short_key, bloom_checked)
+        )
+        _observe(metrics.DB_NOT_FOUND if entry is None else metrics.DB_FOUND, mark)
+        cache_tier_var.set("db")
+        if entry is None:
+            if bloom_checked:
+                self.bloom.record_false_positive()
+        elif self.local_cache is not None:
+            self.local_cache.set(short_key, entry)
+        return entry
+
+    async def _load_from_db(self, short_key: str, bloom_checked: bool = False) -> Optional[str]:
+        """
+        Carrega do banco, popula o Redis e devolve a entrada. Executada sob
+        single-flight: a carga é compartilhada por todas as requisições que
+        esperam a chave e sobrevive ao cancelamento de quem a disparou, então
+        usa uma sessão própria do roteador de leituras, não a da requisição.
+        """
+        if self.read_router is None:
+            return await self._load_with(self.repository, short_key, bloom_checked)
+        async with self.read_router.session() as session:
+            return await self._load_with(URLRepository(session), short_key, bloom_checked)
+
+    async def _load_with(
+        self, repository: URLRepository, short_key: str, bloom_checked: bool
+    ) -> Optional[str]:
+        start = time.perf_counter()
+        url_record = await repository.get_by_key(short_key)
+        db_load_time.update(time.perf_counter() - start)
+
+        if url_record is None and await self._may_be_unreplicated(repository, short_key, bloom_checked):
+            # Read-your-writes: a réplica pode ainda não ter aplicado o INSERT
+            async with self.read_router.master_session() as session:
+                url_record = await URLRepository(session).get_by_key(short_key)
+
         if url_record:
-            # Popula o cache (Lazy Loading)
-            await self.redis.set(short_key, url_record.original_url, ex=3600)
-            return url_record.original_url
+            # Popula o cache (Lazy Loading; chave quente volta com o TTL quente)
+            entry = cache_entry(url_record.original_url, url_record.redirect_status)
+            await self.cache_policy.set(self.redis, short_key, entry)
+            return entry
             
-        return None
\ No newline at end of file
+        return None
+
+    async def _may_be_unreplicated(
+        self, repository: URLRepository, short_key: str, bloom_checked: bool
+    ) -> bool:
+        """
+        Vale reler no master? Só se a leitura veio de uma réplica e a chave
+        pode existir: é canônica (o Sqids a geraria) e o Bloom Filter diz
+        "talvez". Chave inventada nunca chega ao master.
+        """
+        if not settings.READ_MASTER_FALLBACK or self.read_router is None:
+            return False
+        if decode_short_key(short_key) is None:
+            return False
+        if self.read_router.is_master(repository.db.bind):
+            return False
+        if self.bloom is None or bloom_checked:
+            return True
+        try:
+            return await self.bloom.may_contain(short_key) is not False
+        except RedisError:
+            return True
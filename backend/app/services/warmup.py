@@ -0,0 +1,148 @@
+import asyncio
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import redis.asyncio as redis
+
+from app.core.keygen import is_valid_short_key
+from app.core.logger import logger
+from app.repositories.url_repository import URLRepository
+from app.services.cache_policy import CachePolicy
+from app.services.local_cache import LocalCache
+from app.services.redirect_policy import cache_entry
+
+# Linha do access log do Nginx: ... "GET /8kMx9 HTTP/1.1" ...
+ACCESS_LOG_REQUEST = re.compile(r'"(?:GET|HEAD) /([0-9A-Za-z]+)[ ?]')
+
+
+def top_keys_from_log(path: str, limit: int) -> List[str]:
+    """
+    Chaves mais acessadas de um access log (formato do Nginx) ou de um
+    arquivo com uma chave por linha. Lido em streaming, linha a linha.
+    """
+    counts: Counter = Counter()
+    with open(path, encoding="utf-8", errors="replace") as log:
+        for line in log:
+            match = ACCESS_LOG_REQUEST.search(line)
+            key = match.group(1) if match else line.strip()
+            if is_valid_short_key(key):
+                counts[key] += 1
+    return [key for key, _ in counts.most_common(limit)]
+
+
+class CacheWarmer:
+    """
+    Pré-carrega as chaves mais quentes no Redis e no cache L1 do worker.
+
+    O conjunto quente vem do ranking de `URL.clicks` ou de um access log. As
+    URLs são lidas e gravadas em chunks de `chunk_size` chaves (uma consulta
+    e um pipeline por chunk), com no máximo `concurrency` chunks em paralelo
+    para não saturar réplica nem Redis logo após um deploy.
+
+    Com `lock_key`, só um worker da frota grava no Redis por vez (SET NX,
+    apagado no fim); todos os outros ainda enchem o próprio L1 com as
+    mesmas linhas.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        redis_client: redis.Redis,
+        cache_policy: CachePolicy,
+        local_cache: Optional[LocalCache] = None,
+        chunk_size: int = 500,
+        concurrency: int = 4,
+        lock_key: Optional[str] = None,
+        lock_ttl: int = 300,
+    ):
+        self.session_factory = session_factory
+        self.redis = redis_client
+        self.cache_policy = cache_policy
+        self.local_cache = local_cache
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.lock_key = lock_key
+        self.lock_ttl = lock_ttl
+
+    async def _top_by_clicks(self, limit: int) -> List[Tuple[str, str]]:
+        async with self.session_factory() as session:
+            rows = await URLRepository(session).top_by_clicks(limit)
+        return [(key, cache_entry(url, status)) for key, url, status in rows]
+
+    async def _resolve_chunk(self, keys: Sequence[str]) -> List[Tuple[str, str]]:
+        async with self._semaphore:
+            async with self.session_factory() as session:
+                rows = await URLRepository(session).get_many_by_keys(keys)
+        found = {key: cache_entry(url, status) for key, url, status in rows}
+        # Mantém a ordem do ranking
+        return [(key, found[key]) for key in keys if key in found]
+
+    async def _resolve(self, keys: Sequence[str]) -> List[Tuple[str, str]]:
+        chunks = await asyncio.gather(*[
+            self._resolve_chunk(keys[i:i + self.chunk_size])
+            for i in range(0, len(keys), self.chunk_size)
+        ])
+        return [row for chunk in chunks for row in chunk]
+
+    async def _write_chunk(self, rows: Sequence[Tuple[str, str]]) -> None:
+        async with self._semaphore:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for short_key, entry in rows:
+                    # Chaves do topo já entram com o TTL quente
+                    pipe.set(
+                        short_key,
+                        self.cache_policy.encode(entry),
+                        ex=self.cache_policy.ttl(short_key, hot=True),
+                    )
+                await pipe.execute()
+
+    async def _write_redis(self, rows: Sequence[Tuple[str, str]]) -> bool:
+        """Grava no Redis se ninguém da frota estiver gravando. Retorna se gravou."""
+        token = uuid.uuid4().hex
+        if self.lock_key and not await self.redis.set(self.lock_key, token, nx=True, ex=self.lock_ttl):
+            return False
+        try:
+            await asyncio.gather(*[
+                self._write_chunk(rows[i:i + self.chunk_size])
+                for i in range(0, len(rows), self.chunk_size)
+            ])
+        finally:
+            # Só apaga o próprio lock (o TTL pode ter vencido e outro worker pego)
+            if self.lock_key and await self.redis.get(self.lock_key) == token:
+                await self.redis.delete(self.lock_key)
+        return True
+
+    async def load(self, rows: Sequence[Tuple[str, str]]) -> int:
+        """Grava (short_key, entrada do cache) no Redis e no L1. Retorna o total."""
+        await self._write_redis(rows)
+        if self.local_cache is not None:
+            # Do menos para o mais quente: os do topo ficam no fim da LRU
+            for short_key, entry in reversed(rows[:self.local_cache.max_entries]):
+                self.local_cache.set(short_key, entry)
+        return len(rows)
+
+    async def run(
+        self, source: str = "clicks", top_n: int = 10000, access_log: str = ""
+    ) -> dict:
+        """Executa o warm-up e devolve o relatório (chaves, duração, fonte)."""
+        start = time.perf_counter()
+        if source == "clicks":
+            rows = await self._top_by_clicks(top_n)
+        elif source == "log":
+            if not access_log:
+                raise ValueError("WARMUP_SOURCE='log' exige WARMUP_ACCESS_LOG")
+            keys = await asyncio.to_thread(top_keys_from_log, access_log, top_n)
+            rows = await self._resolve(keys)
+        else:
+            raise ValueError(f"Fonte de warm-up desconhecida: {source}")
+
+        loaded = await self.load(rows)
+        report = {"source": source, "keys": loaded, "seconds": time.perf_counter() - start}
+        logger.info(
+            f"Warm-up do cache: {report['keys']} chaves em {report['seconds']:.2f}s "
+            f"(fonte: {source})"
+        )
+        return report
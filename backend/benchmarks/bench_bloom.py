@@ -0,0 +1,155 @@
+"""
+Microbenchmark do BloomFilter: implementação antiga (k GETBITs sequenciais,
+SHA-256 + MD5 em hexdigest) vs. atual (um pipeline, BLAKE2b de 16 bytes).
+
+Usa um Redis falso com latência de rede simulada por round trip, então mede
+latência por lookup e CPU gasto no processo sem precisar de um Redis real:
+
+    python -m benchmarks.bench_bloom --lookups 2000 --rtt-ms 0.2
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("DATABASE_WRITE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_READ_URLS", "")
+
+from app.services.bloom_filter import BloomFilter  # noqa: E402
+
+
+class LatencyRedis:
+    """Redis em memória que 'dorme' um RTT a cada round trip."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.bits = set()
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+
+    async def getbit(self, key, offset):
+        await self._round_trip()
+        return int((key, offset) in self.bits)
+
+    async def setbit(self, key, offset, value):
+        await self._round_trip()
+        self.bits.add((key, offset))
+
+    def pipeline(self, transaction=True):
+        return LatencyPipeline(self)
+
+
+class LatencyPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def getbit(self, key, offset):
+        self.commands.append(("get", key, offset))
+
+    def setbit(self, key, offset, value):
+        self.commands.append(("set", key, offset))
+
+    async def execute(self):
+        await self.redis._round_trip()
+        results = []
+        for op, key, offset in self.commands:
+            if op == "set":
+                self.redis.bits.add((key, offset))
+                results.append(0)
+            else:
+                results.append(int((key, offset) in self.redis.bits))
+        self.commands = []
+        return results
+
+
+class LegacyBloomFilter(BloomFilter):
+    """Cópia fiel do caminho antigo, para comparação."""
+
+    def _locate(self, item):
+        encoded = item.encode("utf-8")
+        h1 = int(hashlib.sha256(encoded).hexdigest(), 16)
+        h2 = int(hashlib.md5(encoded).hexdigest(), 16)
+        return self.redis_keys[0], [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    async def exists(self, item):
+        key, positions = self._locate(item)
+        for position in positions:
+            bit = await self.redis.getbit(key, position)
+            if not bit:
+                return False
+        return True
+
+
+def bench_hashing(bloom: BloomFilter, keys) -> float:
+    """CPU (µs) por item só do cálculo das k posições."""
+    start = time.process_time()
+    for key in keys:
+        bloom._locate(key)
+    return (time.process_time() - start) / len(keys) * 1e6
+
+
+async def bench_lookups(bloom: BloomFilter, keys) -> dict:
+    # Todos presentes: o pior caso (k bits lidos por lookup)
+    await bloom.add_many(keys)
+    bloom.redis.round_trips = 0
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    for key in keys:
+        await bloom.exists(key)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    return {
+        "latency_us": wall / len(keys) * 1e6,
+        "cpu_us": cpu / len(keys) * 1e6,
+        "round_trips": bloom.redis.round_trips / len(keys),
+    }
+
+
+async def bench_batch(bloom: BloomFilter, keys, batch: int) -> float:
+    """Latência (µs) por item usando exists_many em lotes."""
+    start = time.perf_counter()
+    for i in range(0, len(keys), batch):
+        await bloom.exists_many(keys[i:i + batch])
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+async def main(lookups: int, rtt_ms: float, item_count: int):
+    keys = [f"key{i:08d}" for i in range(lookups)]
+    rtt = rtt_ms / 1000
+
+    legacy = LegacyBloomFilter(LatencyRedis(rtt), item_count=item_count, shards=1)
+    current = BloomFilter(LatencyRedis(rtt), item_count=item_count)
+
+    print(f"k={current.hash_count} m={current.size} lookups={lookups} rtt={rtt_ms}ms")
+    print(f"{'impl':<10}{'hash cpu µs':>14}{'lookup µs':>12}{'cpu µs':>10}{'RTs':>6}")
+    for name, bloom in (("legacy", legacy), ("current", current)):
+        hashing = bench_hashing(bloom, keys)
+        result = await bench_lookups(bloom, keys)
+        print(
+            f"{name:<10}{hashing:>14.2f}{result['latency_us']:>12.1f}"
+            f"{result['cpu_us']:>10.1f}{result['round_trips']:>6.1f}"
+        )
+
+    batched = await bench_batch(current, keys, batch=100)
+    print(f"current exists_many(100): {batched:.1f} µs/item")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--rtt-ms", type=float, default=0.2)
+    parser.add_argument("--item-count", type=int, default=100_000_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.lookups, args.rtt_ms, args.item_count))
@@ -0,0 +1,67 @@
+"""
+Microbenchmark do codec de chaves: `sqids.encode([id])` por id (caminho
+antigo) vs. ShortKeyCodec, um a um e em lote, e o decode canônico antigo
+(decode + reencode pelo Sqids) vs. o atual (tabelas + memo).
+
+Só CPU, sem Redis nem banco:
+
+    python -m benchmarks.bench_keygen --count 20000
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("DATABASE_WRITE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_READ_URLS", "")
+
+from app.core.keygen import (  # noqa: E402
+    _decode_canonical, codec, decode_short_keys, generate_short_key, generate_short_keys, sqids,
+)
+
+
+def legacy_decode(short_key):
+    """decode_short_key antigo: decodifica e reencoda pelo Sqids."""
+    ids = sqids.decode(short_key)
+    if len(ids) != 1 or sqids.encode(ids) != short_key:
+        return None
+    return ids[0]
+
+
+def per_op_us(call, count: int) -> float:
+    start = time.perf_counter()
+    call()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main(count: int, seed: int):
+    rng = random.Random(seed)
+    ids = [rng.randrange(1, 2**40) for _ in range(count)]
+    keys = generate_short_keys(ids)
+    assert keys[:1000] == [sqids.encode([i]) for i in ids[:1000]]
+
+    rows = [
+        ("sqids.encode([id])", per_op_us(lambda: [sqids.encode([i]) for i in ids], count)),
+        ("generate_short_key", per_op_us(lambda: [generate_short_key(i) for i in ids], count)),
+        ("generate_short_keys", per_op_us(lambda: generate_short_keys(ids), count)),
+        ("legacy decode", per_op_us(lambda: [legacy_decode(k) for k in keys], count)),
+        ("codec.decode", per_op_us(lambda: [codec.decode(k) for k in keys], count)),
+    ]
+    _decode_canonical.cache_clear()
+    rows.append(("decode_short_keys (frio)", per_op_us(lambda: decode_short_keys(keys), count)))
+    rows.append(("decode_short_keys (memo)", per_op_us(lambda: decode_short_keys(keys), count)))
+
+    baseline = rows[0][1]
+    print(f"ids={count}")
+    print(f"{'impl':<28}{'µs/op':>10}{'vs sqids':>10}")
+    for name, us in rows:
+        print(f"{name:<28}{us:>10.2f}{baseline / us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.count, args.seed)
@@ -0,0 +1,192 @@
+"""
+Benchmark de redirect com hit de cache: rota completa do FastAPI
+(roteamento + DI + sessão + RedirectResponse) vs. caminho rápido ASGI
+(FastRedirectMiddleware, headers pré-codificados).
+
+Chama as aplicações ASGI direto no processo (sem socket nem cliente HTTP),
+então mede só o custo do servidor. Reporta p50/p99 e requisições/s:
+
+    python -m benchmarks.bench_redirect --requests 20000 --concurrency 50
+    python -m benchmarks.bench_redirect --tier redis --redis-rtt-ms 0.2
+
+Com --target, dispara contra um servidor rodando (uvicorn/nginx):
+
+    python -m benchmarks.bench_redirect --target http://localhost:8000 --target-keys abcde,fghij
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("DATABASE_WRITE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_READ_URLS", "")
+
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.api.fast_redirect import FastRedirectMiddleware  # noqa: E402
+from app.api.v1.endpoints import get_read_service, router  # noqa: E402
+from app.core.database import SessionMaster, get_read_db  # noqa: E402
+from app.core.keygen import generate_short_key  # noqa: E402
+from app.repositories.url_repository import URLRepository  # noqa: E402
+from app.services.local_cache import LocalCache  # noqa: E402
+from app.services.url_service import URLService  # noqa: E402
+
+
+class MemoryRedis:
+    """Redis em memória com latência de rede simulada por comando."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.data = {}
+
+    async def get(self, key):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def expire(self, key, seconds):
+        return int(key in self.data)
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def drive(
+    call: Callable[[str], Awaitable[int]], keys: List[str], requests: int, concurrency: int
+) -> dict:
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            key = random.choice(keys)
+            start = time.perf_counter()
+            status = await call(key)
+            latencies.append(time.perf_counter() - start)
+            assert status == 301, status
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+def asgi_caller(app) -> Callable[[str], Awaitable[int]]:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def call(key: str) -> int:
+        status = 0
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/{key}",
+            "raw_path": f"/{key}".encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"bench"), (b"referer", b"https://t.co/x")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        await app(scope, receive, send)
+        return status
+
+    return call
+
+
+def build_apps(tier: str, keys: List[str], rtt: float):
+    """Mesmo cache para as duas variantes; só muda quem responde o hit."""
+    redis = MemoryRedis(rtt)
+    # tier=redis: L1 com TTL zero (tudo expira na hora) força a ida ao Redis
+    local_cache = LocalCache(max_entries=len(keys) * 2, ttl=3600 if tier == "l1" else 0)
+    for key in keys:
+        redis.data[key] = f"https://example.com/{key}"
+        local_cache.set(key, redis.data[key])
+
+    async def override_read_db():
+        # Sessão preguiçosa: num hit de cache nenhuma conexão é aberta
+        async with SessionMaster() as session:
+            yield session
+
+    async def override_read_service(db: AsyncSession = Depends(get_read_db)):
+        return URLService(URLRepository(db), local_cache=local_cache, redis_client=redis)
+
+    apps = []
+    for fast_path in (False, True):
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_read_db] = override_read_db
+        app.dependency_overrides[get_read_service] = override_read_service
+        if fast_path:
+            app.add_middleware(FastRedirectMiddleware, local_cache=local_cache, redis_client=redis)
+        apps.append(app)
+    return apps
+
+
+async def run_local(args):
+    keys = [generate_short_key(i) for i in range(1, args.keys + 1)]
+    full, fast = build_apps(args.tier, keys, args.redis_rtt_ms / 1000)
+
+    print(f"tier={args.tier} requests={args.requests} concurrency={args.concurrency} keys={args.keys}")
+    print(f"{'path':<8}{'req/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    results = {}
+    for name, app in (("route", full), ("fast", fast)):
+        await drive(asgi_caller(app), keys, min(1000, args.requests), args.concurrency)  # aquecimento
+        results[name] = await drive(asgi_caller(app), keys, args.requests, args.concurrency)
+        r = results[name]
+        print(f"{name:<8}{r['rps']:>12.0f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+    print(f"speedup x{results['fast']['rps'] / results['route']['rps']:.1f}")
+
+
+async def run_remote(args):
+    import httpx
+
+    keys = args.target_keys.split(",")
+    async with httpx.AsyncClient(
+        base_url=args.target,
+        follow_redirects=False,
+        limits=httpx.Limits(max_connections=args.concurrency),
+    ) as client:
+        async def call(key: str) -> int:
+            return (await client.get(f"/{key}")).status_code
+
+        result = await drive(call, keys, args.requests, args.concurrency)
+    print(f"target={args.target} requests={args.requests} concurrency={args.concurrency}")
+    print(f"req/s={result['rps']:.0f} p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=1000, help="Chaves distintas (modo local)")
+    parser.add_argument("--tier", choices=("l1", "redis"), default="l1", help="Onde está o hit")
+    parser.add_argument("--redis-rtt-ms", type=float, default=0.0)
+    parser.add_argument("--target", help="URL base de um servidor rodando")
+    parser.add_argument("--target-keys", default="", help="Chaves existentes no servidor, separadas por vírgula")
+    args = parser.parse_args()
+    asyncio.run(run_remote(args) if args.target else run_local(args))
@@ -0,0 +1,395 @@
+"""
+Suíte de benchmarks dos caminhos quentes do encurtador.
+
+Monta a aplicação ASGI no processo com os mesmos dublês dos testes
+(MockRedis de tests/conftest.py + SQLite em memória) e mede:
+
+- create: POST /urls (criações/s, p50/p99)
+- redirect_hit: GET /{key} com popularidade Zipf e cache quente
+- redirect_miss: GET /{key} com cache frio (cada chave vai ao banco)
+- redirect_not_found: GET de chaves válidas que não existem (Bloom Filter)
+- bloom: exists() de chaves presentes/ausentes
+- keygen: generate_short_key(s) / decode_short_key(s)
+
+Os resultados vão para um JSON; com --baseline, cada métrica é comparada ao
+baseline e a execução falha (exit 1) se alguma piorar mais que --tolerance:
+
+    python -m benchmarks.run --output benchmarks/results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("DATABASE_WRITE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_READ_URLS", "")
+
+# Reaproveita os dublês dos testes (MockRedis, SQLite em memória)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tests"))
+
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from conftest import MockRedis, TestingSessionLocal, engine  # noqa: E402
+from app.api.fast_redirect import FastRedirectMiddleware  # noqa: E402
+from app.api.v1.endpoints import get_read_service, get_write_service, router  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, get_db, get_read_db  # noqa: E402
+from app.core.keygen import decode_short_key, decode_short_keys, generate_short_key, generate_short_keys  # noqa: E402
+from app.core.replica_router import ReplicaRouter  # noqa: E402
+from app.repositories.url_repository import URLRepository  # noqa: E402
+from app.services.bloom_filter import BloomFilter  # noqa: E402
+from app.services.cache_policy import CachePolicy  # noqa: E402
+from app.services.id_allocator import IdAllocator, Ranges  # noqa: E402
+from app.services.local_cache import LocalCache  # noqa: E402
+from app.services.url_service import URLService  # noqa: E402
+from benchmarks.bench_redirect import percentile  # noqa: E402
+
+# métrica -> {"value", "unit", "better": "higher" | "lower"}
+Metrics = Dict[str, dict]
+
+
+class Zipf:
+    """Amostrador Zipf(s) sobre n itens: poucos links concentram os acessos."""
+
+    def __init__(self, n: int, s: float = 1.1, seed: int = 42):
+        weights = [1 / (rank ** s) for rank in range(1, n + 1)]
+        self.cumulative = list(itertools.accumulate(weights))
+        self.random = random.Random(seed)
+
+    def sample(self) -> int:
+        point = self.random.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point)
+
+
+class MemoryBlockSource:
+    """
+    Blocos de IDs em memória. O SQLite dos testes é uma conexão só e o
+    prefetch do alocador (outra sessão em paralelo) colidiria com as
+    requisições; com blocos grandes o custo do lease some na média de qualquer jeito.
+    """
+
+    def __init__(self):
+        self.next_value = 1
+
+    async def lease(self, size: int) -> Ranges:
+        start = self.next_value
+        self.next_value += size
+        return [(start, start + size - 1)]
+
+
+class Environment:
+    """App ASGI + dublês compartilhados pelos cenários."""
+
+    def __init__(self):
+        self.redis = MockRedis()
+        self.local_cache = LocalCache(max_entries=10000)
+        self.cache_policy = CachePolicy(jitter=0)
+        self.bloom = BloomFilter(self.redis, item_count=1_000_000)
+        self.id_allocator = IdAllocator(MemoryBlockSource(), block_size=1000)
+        self.read_router = ReplicaRouter(
+            [(engine, TestingSessionLocal)], (engine, TestingSessionLocal)
+        )
+        self.app = self._build_app()
+
+    def service(self, db: AsyncSession) -> URLService:
+        return URLService(
+            URLRepository(db),
+            local_cache=self.local_cache,
+            redis_client=self.redis,
+            bloom=self.bloom,
+            id_allocator=self.id_allocator,
+            read_router=self.read_router,
+            cache_policy=self.cache_policy,
+        )
+
+    def _build_app(self) -> FastAPI:
+        # O SQLite em memória é UMA conexão (StaticPool): requisições que usam
+        # o banco se revezam nela, como num banco de um único escritor
+        db_lock = asyncio.Lock()
+
+        async def override_db():
+            async with db_lock:
+                async with TestingSessionLocal() as session:
+                    yield session
+
+        async def override_service(db: AsyncSession = Depends(get_db)):
+            return self.service(db)
+
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_db] = override_db
+        app.dependency_overrides[get_read_db] = override_db
+        app.dependency_overrides[get_write_service] = override_service
+        app.dependency_overrides[get_read_service] = override_service
+        app.add_middleware(
+            FastRedirectMiddleware,
+            local_cache=self.local_cache,
+            redis_client=self.redis,
+            cache_policy=self.cache_policy,
+        )
+        return app
+
+    async def reset(self) -> None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        # Banco novo: o bloco de IDs já alugado não vale mais
+        self.id_allocator = IdAllocator(MemoryBlockSource(), block_size=1000)
+
+    async def seed(self, count: int) -> List[str]:
+        """Cria `count` links pelo service (banco + Bloom + Redis)."""
+        keys: List[str] = []
+        async with TestingSessionLocal() as session:
+            service = self.service(session)
+            for start in range(0, count, 1000):
+                urls = [f"https://example.com/seed/{i}" for i in range(start, min(count, start + 1000))]
+                keys += [short_url.rsplit("/", 1)[1] for short_url in await service.shorten_many(urls)]
+        # Todo link passou pelo filtro: ele pode responder "não existe"
+        await self.bloom.mark_ready()
+        return keys
+
+
+async def asgi_request(app, method: str, path: str, body: bytes = b"") -> int:
+    """Uma requisição ASGI direta (sem socket nem cliente HTTP). Retorna o status."""
+    status = 0
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    headers = [(b"host", b"bench")]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await app(
+        {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        },
+        receive,
+        send,
+    )
+    return status
+
+
+async def measure(
+    call: Callable[[int], Awaitable[int]], requests: int, concurrency: int, expected: int
+) -> Tuple[float, List[float]]:
+    """Executa `requests` chamadas com `concurrency` tasks. Retorna (req/s, latências)."""
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            status = await call(i)
+            latencies.append(time.perf_counter() - start)
+            if status != expected:
+                raise RuntimeError(f"status {status}, esperado {expected}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return requests / (time.perf_counter() - start), latencies
+
+
+def latency_metrics(prefix: str, rps: float, latencies: List[float]) -> Metrics:
+    return {
+        f"{prefix}.rps": {"value": rps, "unit": "req/s", "better": "higher"},
+        f"{prefix}.p50_ms": {"value": percentile(latencies, 0.50) * 1000, "unit": "ms", "better": "lower"},
+        f"{prefix}.p99_ms": {"value": percentile(latencies, 0.99) * 1000, "unit": "ms", "better": "lower"},
+    }
+
+
+def ops_metric(name: str, count: int, elapsed: float) -> Metrics:
+    return {name: {"value": count / elapsed, "unit": "ops/s", "better": "higher"}}
+
+
+# -----------------------------------------------------------------------------
+# Cenários
+# -----------------------------------------------------------------------------
+
+async def bench_create(env: Environment, args) -> Metrics:
+    await env.reset()
+    bodies = [json.dumps({"url": f"https://example.com/create/{i}"}).encode() for i in range(args.requests)]
+    rps, latencies = await measure(
+        lambda i: asgi_request(env.app, "POST", "/urls", bodies[i]), args.requests, args.concurrency, 201
+    )
+    return latency_metrics("create", rps, latencies)
+
+
+async def bench_redirects(env: Environment, args) -> Metrics:
+    await env.reset()
+    env.redis.store.clear()
+    env.local_cache.clear()
+    keys = await env.seed(args.keys)
+    zipf = Zipf(len(keys), s=args.zipf_s)
+    metrics: Metrics = {}
+
+    # Hit: cache quente (L1 + Redis), popularidade Zipf
+    sample = [keys[zipf.sample()] for _ in range(args.requests)]
+    rps, latencies = await measure(
+        lambda i: asgi_request(env.app, "GET", f"/{sample[i]}"), args.requests, args.concurrency, 301
+    )
+    metrics.update(latency_metrics("redirect_hit", rps, latencies))
+
+    # Miss: Redis e L1 vazios, cada chave é lida uma vez (vai ao banco)
+    env.redis.store.clear()
+    env.local_cache.clear()
+    cold = random.Random(7).sample(keys, min(len(keys), args.requests))
+    rps, latencies = await measure(
+        lambda i: asgi_request(env.app, "GET", f"/{cold[i]}"), len(cold), args.concurrency, 301
+    )
+    metrics.update(latency_metrics("redirect_miss", rps, latencies))
+
+    # Not found: chaves canônicas que nunca foram criadas (Bloom responde)
+    missing = [generate_short_key(10_000_000 + i) for i in range(args.requests)]
+    negative_lookups = settings.BLOOM_NEGATIVE_LOOKUPS
+    settings.BLOOM_NEGATIVE_LOOKUPS = True
+    try:
+        rps, latencies = await measure(
+            lambda i: asgi_request(env.app, "GET", f"/{missing[i]}"), len(missing), args.concurrency, 404
+        )
+    finally:
+        settings.BLOOM_NEGATIVE_LOOKUPS = negative_lookups
+    metrics.update(latency_metrics("redirect_not_found", rps, latencies))
+    return metrics
+
+
+async def bench_bloom(env: Environment, args) -> Metrics:
+    present = [generate_short_key(i) for i in range(1, args.keys + 1)]
+    absent = [generate_short_key(10_000_000 + i) for i in range(args.keys)]
+    await env.bloom.add_many(present)
+    lookups = present + absent
+    start = time.perf_counter()
+    for key in lookups:
+        await env.bloom.exists(key)
+    metrics = ops_metric("bloom.exists", len(lookups), time.perf_counter() - start)
+    start = time.perf_counter()
+    for i in range(0, len(lookups), 100):
+        await env.bloom.exists_many(lookups[i:i + 100])
+    metrics.update(ops_metric("bloom.exists_many", len(lookups), time.perf_counter() - start))
+    return metrics
+
+
+async def bench_keygen(env: Environment, args) -> Metrics:
+    ids = [random.Random(1).randrange(1, 2**40) for _ in range(args.keygen_ops)]
+    start = time.perf_counter()
+    keys = [generate_short_key(i) for i in ids]
+    metrics = ops_metric("keygen.encode", len(ids), time.perf_counter() - start)
+    start = time.perf_counter()
+    generate_short_keys(ids)
+    metrics.update(ops_metric("keygen.encode_many", len(ids), time.perf_counter() - start))
+    start = time.perf_counter()
+    for key in keys:
+        decode_short_key(key)
+    metrics.update(ops_metric("keygen.decode", len(keys), time.perf_counter() - start))
+    start = time.perf_counter()
+    decode_short_keys(keys)
+    metrics.update(ops_metric("keygen.decode_many", len(keys), time.perf_counter() - start))
+    return metrics
+
+
+SCENARIOS = {
+    "create": bench_create,
+    "redirect": bench_redirects,
+    "bloom": bench_bloom,
+    "keygen": bench_keygen,
+}
+
+
+# -----------------------------------------------------------------------------
+# Baseline
+# -----------------------------------------------------------------------------
+
+def compare(results: Metrics, baseline: Metrics, tolerance: float) -> List[str]:
+    """Métricas que pioraram mais que `tolerance` (fração) em relação ao baseline."""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference or not reference["value"]:
+            continue
+        change = (current["value"] - reference["value"]) / reference["value"]
+        worse = -change if current["better"] == "higher" else change
+        if worse > tolerance:
+            regressions.append(
+                f"{name}: {reference['value']:.3f} -> {current['value']:.3f} {current['unit']} "
+                f"({worse:+.0%} pior)"
+            )
+    return regressions
+
+
+async def main(args) -> int:
+    env = Environment()
+    results: Metrics = {}
+    for name in args.scenarios:
+        results.update(await SCENARIOS[name](env, args))
+    await engine.dispose()
+
+    print(f"{'metric':<28}{'value':>14}  unit")
+    for name, metric in results.items():
+        print(f"{name:<28}{metric['value']:>14.3f}  {metric['unit']}")
+
+    if args.output:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+            "metrics": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nresultados salvos em {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["metrics"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSÕES (tolerância {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nsem regressões em relação a {args.baseline} (tolerância {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="Requisições por cenário HTTP")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--keys", type=int, default=5000, help="Links distintos criados")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Expoente da distribuição Zipf")
+    parser.add_argument("--keygen-ops", type=int, default=50000)
+    parser.add_argument("--output", help="Arquivo JSON para os resultados")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Piora tolerada (fração)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
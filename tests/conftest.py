@@ -5,8 +5,10 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.core.database import Base, get_db
-from app.api.v1.endpoints import get_write_service
+from app.core.database import Base, get_db, get_read_db
+from app.api.v1.endpoints import get_read_service, get_write_service
+from app.core.resources import resources
+from app.api import fast_redirect
 
 # 1. Configura Banco em Memória (SQLite) para testes
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -38,39 +40,197 @@ class MockRedis:
     """Simula o Redis em memória"""
     def __init__(self):
         self.store = {}
+        self.bits = {}    # Strings binárias (SETBIT/GETRANGE...) como bytearray
+        self.hashes = {}
+        self.ttls = {}    # Último TTL (segundos) gravado por chave
     
     async def get(self, key):
         return self.store.get(key)
     
-    async def set(self, key, value, ex=None):
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
         self.store[key] = value
+        if ex is not None:
+            self.ttls[key] = ex
         return True
     
+    async def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+    
+    async def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return int(key in self.store)
+    
+    async def memory_usage(self, key):
+        value = self.store.get(key)
+        return None if value is None else 50 + len(key) + len(value)
+    
+    async def incrby(self, key, amount=1):
+        self.store[key] = int(self.store.get(key, 0)) + amount
+        return self.store[key]
+    
+    async def setbit(self, key, offset, value):
+        buf = self.bits.setdefault(key, bytearray())
+        byte, bit = divmod(offset, 8)
+        if len(buf) <= byte:
+            buf.extend(bytes(byte + 1 - len(buf)))
+        mask = 0x80 >> bit
+        old = int(bool(buf[byte] & mask))
+        buf[byte] = (buf[byte] | mask) if value else (buf[byte] & ~mask)
+        return old
+    
+    async def getbit(self, key, offset):
+        buf = self.bits.get(key, b"")
+        byte, bit = divmod(offset, 8)
+        return int(byte < len(buf) and bool(buf[byte] & (0x80 >> bit)))
+    
+    async def strlen(self, key):
+        return len(self.bits.get(key, b""))
+    
+    async def getrange(self, key, start, end):
+        return bytes(self.bits.get(key, b"")[start:end + 1])
+    
+    async def setrange(self, key, offset, value):
+        buf = self.bits.setdefault(key, bytearray())
+        if len(buf) < offset:
+            buf.extend(bytes(offset - len(buf)))
+        buf[offset:offset + len(value)] = value
+        return len(buf)
+    
+    async def rename(self, src, dst):
+        for space in (self.store, self.bits, self.hashes):
+            if src in space:
+                space[dst] = space.pop(src)
+        return True
+    
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            for space in (self.store, self.bits, self.hashes):
+                if space.pop(key, None) is not None:
+                    removed += 1
+        return removed
+    
+    async def exists(self, *keys):
+        return sum(
+            1 for key in keys
+            if key in self.store or key in self.bits or key in self.hashes
+        )
+    
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+    
+    async def hset(self, key, field=None, value=None, mapping=None):
+        values = self.hashes.setdefault(key, {})
+        if mapping:
+            values.update({k: str(v) for k, v in mapping.items()})
+        if field is not None:
+            values[field] = str(value)
+        return True
+    
+    async def hsetnx(self, key, field, value):
+        values = self.hashes.setdefault(key, {})
+        if field in values:
+            return 0
+        values[field] = str(value)
+        return 1
+    
+    async def hincrby(self, key, field, amount=1):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+        return int(values[field])
+    
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+    
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+    
     async def close(self):
         pass
 
+class FakeClock:
+    """Relógio controlável (chamável como time.time) para testar tempo sem sleep"""
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class MockPipeline:
+    """Enfileira comandos e executa todos no execute() (um 'round trip')"""
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.commands = []
+    
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        return [await method(*args, **kwargs) for method, args, kwargs in commands]
+
 # 4. Mock do Service com Redis Fake
 @pytest_asyncio.fixture
 async def test_url_service(db_session):
     from app.repositories.url_repository import URLRepository
     from app.services.url_service import URLService
+    from app.services.local_cache import LocalCache
+    from app.services.bloom_filter import BloomFilter
+    from app.services.id_allocator import DatabaseBlockSource, IdAllocator
+    from app.core.replica_router import ReplicaRouter
+    from app.services.side_effects import SideEffectQueue
     
     repo = URLRepository(db_session)
-    service = URLService(repo)
-    service.redis = MockRedis()
+    redis = MockRedis()
+    # Cache L1 novo por teste (o compartilhado vazaria estado entre testes)
+    service = URLService(
+        repo,
+        local_cache=LocalCache(),
+        redis_client=redis,
+        bloom=BloomFilter(redis, item_count=10000),
+        id_allocator=IdAllocator(DatabaseBlockSource(TestingSessionLocal), block_size=100),
+        # O SQLite de testes é master e "réplica" ao mesmo tempo
+        read_router=ReplicaRouter(
+            [(engine, TestingSessionLocal)], (engine, TestingSessionLocal)
+        ),
+        # Fila própria, sem loop: os testes drenam com `side_effects.flush()`
+        side_effects=SideEffectQueue(),
+    )
     return service
 
 # 5. Cliente HTTP Assíncrono
 @pytest_asyncio.fixture
-async def client(db_session, test_url_service):
+async def client(db_session, test_url_service, monkeypatch):
     async def override_get_db():
         yield db_session
     
     async def override_get_service():
         return test_url_service
 
+    # Leitura e escrita no mesmo SQLite (e no mesmo service de testes)
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     app.dependency_overrides[get_write_service] = override_get_service
+    app.dependency_overrides[get_read_service] = override_get_service
+
+    # Rate limiter novo por teste (os buckets não vazam entre testes)
+    resources._rate_limiter = None
+    # O FastRedirectMiddleware lê o L1 compartilhado e resources.redis: aponta
+    # os dois para o Redis falso e o L1 deste teste, que são novos a cada teste
+    monkeypatch.setattr(fast_redirect, "shared_local_cache", test_url_service.local_cache)
+    monkeypatch.setattr(resources, "_redis", test_url_service.redis)
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
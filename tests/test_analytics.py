@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+
+from app.repositories.analytics_repository import ClickRollupRepository
+from app.services.analytics import ClickAnalytics, referrer_host
+from conftest import FakeClock, TestingSessionLocal
+
+# 2026-10-18 12:30:00 UTC
+NOW = datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc).timestamp()
+
+
+def test_referrer_is_reduced_to_host():
+    """Teste: o referrer vira só o host (sem path/query)"""
+    assert referrer_host("https://News.Example.com/a?b=1") == "news.example.com"
+    assert referrer_host(None) == "(direct)"
+    assert referrer_host("lixo") == "(unknown)"
+
+
+def test_ring_buffer_drops_oldest_events():
+    """Teste: buffer cheio descarta os eventos mais antigos, sem crescer"""
+    analytics = ClickAnalytics(TestingSessionLocal, buffer_size=2)
+    for key in ("a", "b", "c"):
+        analytics.record(key)
+    assert analytics.dropped == 1
+    assert [event.short_key for event in analytics._drain()] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_flush_upserts_rollups(db_session):
+    """Teste: flushes seguidos somam nos mesmos buckets (upsert)"""
+    clock = FakeClock(NOW)
+    analytics = ClickAnalytics(TestingSessionLocal, clock=clock, batch_size=3)
+    analytics.record("abc12", referrer="https://t.co/x", country="br")
+    analytics.record("abc12", country="US")
+    await analytics.flush()
+    clock.now += 60  # Próximo minuto, mesma hora
+    analytics.record("abc12", referrer="https://t.co/y", country="BR")
+    await analytics.flush()
+
+    repo = ClickRollupRepository(db_session)
+    start = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+    end = start + timedelta(hours=1)
+    minutes = await repo.series("abc12", "m", start, end)
+    assert [count for _, count in minutes] == [2, 1]
+    assert minutes[0][0] == datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc)
+    assert await repo.series("abc12", "h", start, end) == [(start, 3)]
+    assert await repo.top_values("abc12", "h", "referrer", start, end) == [
+        ("t.co", 2), ("(direct)", 1)
+    ]
+    day = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    assert await repo.top_values("abc12", "d", "country", day, day + timedelta(days=1)) == [
+        ("BR", 2), ("US", 1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_rollups(db_session):
+    """Teste: rollups que falharam são somados no próximo flush"""
+    def broken_session():
+        raise ConnectionError("db down")
+
+    analytics = ClickAnalytics(broken_session, clock=FakeClock(NOW))
+    analytics.record("abc12")
+    with pytest.raises(ConnectionError):
+        await analytics.flush()
+    assert analytics.has_pending
+    assert analytics.flush_errors == 1
+
+    analytics.session_factory = TestingSessionLocal
+    assert await analytics.flush() == 7  # total em m/h/d + referrer e país em h/d
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint(client: AsyncClient, db_session, test_url_service):
+    """Teste: GET /urls/{key}/stats devolve a série e os tops do intervalo"""
+    short_url = await test_url_service.shorten_url("https://python.org")
+    short_key = short_url.rsplit("/", 1)[1]
+    analytics = ClickAnalytics(TestingSessionLocal, clock=FakeClock(NOW))
+    analytics.record(short_key, referrer="https://t.co/x", country="BR")
+    analytics.record(short_key, country="BR")
+    await analytics.flush()
+
+    response = await client.get(
+        f"/urls/{short_key}/stats",
+        params={"granularity": "minute", "start": "2026-10-18T12:00:00Z", "end": "2026-10-18T13:00:00Z"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert data["series"] == [{"bucket": "2026-10-18T12:30:00Z", "clicks": 2}]
+    assert data["countries"] == [{"value": "BR", "clicks": 2}]
+
+    assert (await client.get("/urls/naoexiste/stats")).status_code == 404
+    response = await client.get(
+        f"/urls/{short_key}/stats",
+        params={"granularity": "minute", "start": "2026-01-01T00:00:00Z", "end": "2026-10-01T00:00:00Z"},
+    )
+    assert response.status_code == 422
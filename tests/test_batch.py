@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+
+
+@pytest.mark.asyncio
+async def test_batch_create_keeps_order_and_reports_errors(client: AsyncClient, test_url_service):
+    """Teste: lote com itens inválidos cria os válidos, na ordem de entrada"""
+    payload = {"urls": ["https://python.org", "javascript:alert(1)", "https://pypi.org"]}
+
+    response = await client.post("/urls/batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    assert [item["index"] for item in data["results"]] == [0, 1, 2]
+    assert data["results"][1]["error"]
+    assert data["results"][2]["original_url"] == "https://pypi.org/"
+
+    # Cache preenchido para as chaves criadas (pela fila de efeitos)
+    await test_url_service.side_effects.flush()
+    short_key = data["results"][0]["short_url"].split("/")[-1]
+    assert test_url_service.redis.store[short_key] == "https://python.org/"
+
+
+@pytest.mark.asyncio
+async def test_batch_create_rejects_oversized_batch(client: AsyncClient, monkeypatch):
+    """Teste: lote acima de BATCH_MAX_SIZE é recusado com 413"""
+    monkeypatch.setattr(settings, "BATCH_MAX_SIZE", 2)
+
+    response = await client.post("/urls/batch", json={"urls": ["https://a.com"] * 3})
+
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_batch_stream_ndjson(client: AsyncClient, monkeypatch):
+    """Teste: NDJSON de entrada vira NDJSON de saída, em blocos"""
+    monkeypatch.setattr(settings, "BATCH_STREAM_CHUNK", 2)
+    lines = [json.dumps({"url": f"https://example.com/{i}"}) for i in range(5)]
+    lines.insert(2, "isto não é json")
+
+    response = await client.post("/urls/batch/stream", content="\n".join(lines))
+
+    assert response.status_code == 200
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["index"] for item in items] == list(range(6))
+    assert "error" in items[2]
+    assert len({item["short_url"] for item in items if "short_url" in item}) == 5
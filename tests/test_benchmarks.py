@@ -0,0 +1,20 @@
+import argparse
+
+import pytest
+
+from benchmarks.run import SCENARIOS, Environment
+
+
+@pytest.mark.asyncio
+async def test_benchmark_suite_runs_at_tiny_size(db_session):
+    """Teste: todos os cenários da suíte rodam de ponta a ponta (contrato dos dublês em dia)"""
+    args = argparse.Namespace(requests=20, concurrency=4, keys=50, zipf_s=1.1, keygen_ops=50)
+    env = Environment()
+    results = {}
+    for scenario in SCENARIOS.values():
+        results.update(await scenario(env, args))
+
+    assert {"create.rps", "redirect_hit.rps", "redirect_miss.rps", "redirect_not_found.rps"} <= set(results)
+    assert all(metric["value"] > 0 for metric in results.values())
+    # Os 404 do cenário saíram do Bloom Filter, não do banco
+    assert env.bloom.negatives >= args.requests
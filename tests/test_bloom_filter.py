@@ -0,0 +1,200 @@
+import pytest
+
+from app.core.config import settings
+from app.core.keygen import generate_short_key
+from app.core.keygen import generate_short_keys
+from app.core.replica_router import ReplicaRouter
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository
+from app.services.bloom_filter import BloomFilter, ScalableBloomFilter, restore_snapshot, snapshot_high_water
+from app.services.local_cache import LocalCache
+from app.services.url_service import URLService
+from conftest import MockRedis, TestingSessionLocal, engine
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Chaves buscadas no banco (URLRepository.get_by_key), em ordem"""
+    calls = []
+    get_by_key = URLRepository.get_by_key
+
+    async def counting_get_by_key(self, short_key):
+        calls.append(short_key)
+        return await get_by_key(self, short_key)
+
+    monkeypatch.setattr(URLRepository, "get_by_key", counting_get_by_key)
+    return calls
+
+
+def _service(session, redis, bloom):
+    # A carga sob single-flight abre a própria sessão: o roteador aponta para o SQLite de testes
+    router = ReplicaRouter([(engine, TestingSessionLocal)], (engine, TestingSessionLocal))
+    return URLService(
+        URLRepository(session), local_cache=LocalCache(), redis_client=redis, bloom=bloom, read_router=router
+    )
+
+
+@pytest.mark.asyncio
+async def test_added_keys_exist():
+    """Teste: chave adicionada sempre 'pode existir' (sem falso negativo)"""
+    bloom = BloomFilter(MockRedis(), item_count=1000)
+    for i in range(100):
+        await bloom.add(f"key{i}")
+
+    for i in range(100):
+        assert await bloom.exists(f"key{i}")
+
+
+@pytest.mark.asyncio
+async def test_negative_lookup_skips_database(monkeypatch, db_session, lookups):
+    """Teste: chave fora do filtro vira 404 sem consultar o banco"""
+    monkeypatch.setattr(settings, "BLOOM_NEGATIVE_LOOKUPS", True)
+    redis = MockRedis()
+    bloom = BloomFilter(redis, item_count=1000)
+    await bloom.mark_ready()
+    service = _service(db_session, redis, bloom)
+
+    assert await service.get_original_url(generate_short_key(404)) is None
+    assert lookups == []
+    assert bloom.negatives == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["fixed", "scalable"])
+async def test_missing_sentinel_falls_through_to_database(monkeypatch, db_session, lookups, mode):
+    """Teste: filtro sumiu do Redis (FLUSHALL/failover) -> nada de 404 pelo filtro, vale o banco"""
+    monkeypatch.setattr(settings, "BLOOM_NEGATIVE_LOOKUPS", True)
+    monkeypatch.setattr(settings, "READ_MASTER_FALLBACK", False)
+    redis = MockRedis()
+    bloom = BloomFilter(redis, item_count=1000) if mode == "fixed" else ScalableBloomFilter(redis, 1000)
+    await bloom.mark_ready()
+    service = _service(db_session, redis, bloom)
+
+    redis.store.clear()  # FLUSHALL: bits e sentinela se vão juntos
+    assert await service.get_original_url(generate_short_key(404)) is None
+    assert len(lookups) == 1
+    assert bloom.unavailable == 1 and bloom.negatives == 0 and bloom.false_positives == 0
+
+
+@pytest.mark.asyncio
+async def test_false_positive_is_recorded(monkeypatch, db_session, lookups):
+    """Teste: filtro diz 'pode existir', banco não acha -> conta falso positivo"""
+    monkeypatch.setattr(settings, "BLOOM_NEGATIVE_LOOKUPS", True)
+    monkeypatch.setattr(settings, "READ_MASTER_FALLBACK", False)  # Sem réplica aqui
+    redis = MockRedis()
+    bloom = BloomFilter(redis, item_count=1000)
+    await bloom.add(generate_short_key(13))  # Simula colisão: bits ligados sem linha no banco
+    await bloom.mark_ready()
+    service = _service(db_session, redis, bloom)
+
+    assert await service.get_original_url(generate_short_key(13)) is None
+    assert len(lookups) == 1
+    assert bloom.false_positives == 1
+    assert bloom.observed_fp_rate == 1.0
+
+
+@pytest.mark.asyncio
+async def test_exists_many_uses_one_round_trip():
+    """Teste: exists_many resolve o lote inteiro num único pipeline"""
+    redis = MockRedis()
+    executed = []
+    original_pipeline = redis.pipeline
+
+    def counting_pipeline(transaction=True):
+        pipe = original_pipeline(transaction)
+        original_execute = pipe.execute
+
+        async def execute():
+            executed.append(len(pipe.commands))
+            return await original_execute()
+
+        pipe.execute = execute
+        return pipe
+
+    redis.pipeline = counting_pipeline
+    bloom = BloomFilter(redis, item_count=1000)
+    await bloom.add_many(["a1", "b2", "c3"])
+    executed.clear()
+
+    result = await bloom.exists_many(["a1", "zz", "c3"])
+
+    assert result == [True, False, True]
+    assert executed == [3 * bloom.hash_count]
+
+
+@pytest.mark.asyncio
+async def test_sharded_filter_routes_deterministically():
+    """Teste: cada item cai sempre no mesmo shard e os shards são usados"""
+    redis = MockRedis()
+    bloom = BloomFilter(redis, item_count=10000, shards=4)
+    keys = [f"key{i}" for i in range(200)]
+    await bloom.add_many(keys)
+
+    assert bloom._locate("key7") == bloom._locate("key7")
+    assert set(redis.bits) == set(bloom.redis_keys)
+    assert all(await bloom.exists_many(keys))
+
+
+@pytest.mark.asyncio
+async def test_scalable_filter_grows_generations():
+    """Teste: ao passar da capacidade, abre nova geração e não perde itens"""
+    redis = MockRedis()
+    bloom = ScalableBloomFilter(redis, initial_capacity=50)
+    keys = [f"key{i}" for i in range(200)]
+    for i in range(0, len(keys), 10):
+        await bloom.add_many(keys[i:i + 10])
+
+    assert len(bloom.generations) >= 2
+    assert all(await bloom.exists_many(keys))
+
+    # Outro worker (estado local zerado) enxerga as gerações pelo Redis
+    other = ScalableBloomFilter(redis, initial_capacity=50)
+    assert all(await other.exists_many(keys))
+    assert len(other.generations) == len(bloom.generations)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip(tmp_path):
+    """Teste: snapshot em arquivo restaura o filtro num Redis vazio"""
+    path = str(tmp_path / "bloom.snap")
+    source = BloomFilter(MockRedis(), item_count=10000, shards=3)
+    await source.add_many(["a1", "b2", "c3"])
+    await source.snapshot(path, source.redis)
+
+    target = BloomFilter(MockRedis(), item_count=10000, shards=3)
+    await target.load(path, target.redis)
+    assert await target.exists_many(["a1", "b2", "c3"]) == [True, True, True]
+
+    wrong = BloomFilter(MockRedis(), item_count=10000, shards=2)
+    with pytest.raises(ValueError):
+        await wrong.load(path, wrong.redis)
+
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_backfills_keys_created_after_it(db_session, tmp_path, monkeypatch):
+    """Teste: chaves criadas depois do snapshot voltam ao filtro antes da sentinela"""
+    monkeypatch.setattr(settings, "BLOOM_SNAPSHOT_ID_MARGIN", 2)
+    keys = generate_short_keys(range(1, 21))
+    db_session.add_all([URL(id=i, original_url=f"https://e.com/{i}", short_key=keys[i - 1]) for i in range(1, 11)])
+    await db_session.commit()
+
+    path = str(tmp_path / "bloom.snap")
+    source = BloomFilter(MockRedis(), item_count=10000)
+    await source.add_many(keys[:10])
+    await source.mark_ready()
+    high_water = await snapshot_high_water(TestingSessionLocal)
+    await source.snapshot(path, source.redis, high_water)
+    assert high_water == 8
+
+    # Depois do snapshot: mais 10 links; o Redis do filtro se perde
+    db_session.add_all([URL(id=i, original_url=f"https://e.com/{i}", short_key=keys[i - 1]) for i in range(11, 21)])
+    await db_session.commit()
+
+    target = BloomFilter(MockRedis(), item_count=10000)
+    await target.load(path, target.redis)
+    assert await target.may_contain(keys[0]) is None  # Sem sentinela até o back-fill
+
+    added = await restore_snapshot(target, path, target.redis, TestingSessionLocal, batch_size=4)
+    assert added == 12  # ids 9..20
+    assert all(await target.exists_many(keys))
+    assert await target.may_contain(keys[-1]) is True
@@ -0,0 +1,77 @@
+import pytest
+
+from app.core.keygen import generate_short_key
+from app.services.cache_policy import COMPRESSED_PREFIX, CachePolicy
+from app.services.local_cache import LocalCache
+from app.services.url_service import URLService
+from conftest import FakeClock, MockRedis
+
+
+def test_ttl_jitter_stays_in_range():
+    """Teste: o jitter espalha os TTLs dentro de ±jitter do base"""
+    policy = CachePolicy(base_ttl=1000, jitter=0.1)
+    ttls = {policy.ttl("abcde") for _ in range(200)}
+    assert min(ttls) >= 900 and max(ttls) <= 1100
+    assert len(ttls) > 1
+
+
+def test_hot_key_is_promoted_once_per_window():
+    """Teste: limiar atingido promove a chave; na próxima janela, renova de novo"""
+    clock = FakeClock(1000.0)
+    policy = CachePolicy(hot_threshold=3, hot_window=60, jitter=0, clock=clock)
+    assert [policy.touch("abcde") for _ in range(5)] == [False, False, True, False, False]
+    assert policy.ttl_class("abcde") == "hot"
+    assert policy.ttl("abcde") == policy.hot_ttl
+
+    clock.now += 61
+    assert [policy.touch("abcde") for _ in range(3)] == [False, False, True]
+    assert policy.promotions == 2
+
+
+def test_compression_only_when_it_saves_bytes():
+    """Teste: URL longa é comprimida e volta igual; curta fica crua"""
+    policy = CachePolicy(compression=True, compress_min_bytes=50)
+    long_url = "https://example.com/campanha?" + "&".join(f"utm_param{i}=valor" for i in range(30))
+    packed = policy.encode(long_url)
+    assert packed.startswith(COMPRESSED_PREFIX)
+    assert len(packed) < len(long_url)
+    assert policy.decode(packed) == long_url
+    assert policy.encode("https://python.org") == "https://python.org"
+    assert policy.bytes_saved == len(long_url) - len(packed)
+
+
+@pytest.mark.asyncio
+async def test_service_extends_ttl_of_hot_keys(test_url_service):
+    """Teste: criação grava o TTL base; chave quente ganha EXPIRE com TTL quente"""
+    redis = test_url_service.redis
+    policy = CachePolicy(base_ttl=600, hot_ttl=86400, hot_threshold=3, jitter=0, memory_sample_rate=1.0)
+    test_url_service.cache_policy = policy
+
+    short_key = (await test_url_service.shorten_url("https://python.org")).rsplit("/", 1)[1]
+    await test_url_service.side_effects.flush()
+    assert redis.ttls[short_key] == 600
+    assert policy.memory_samples == 1
+
+    test_url_service.local_cache = LocalCache(ttl=0)  # Força as leituras no Redis
+    for _ in range(3):
+        assert await test_url_service.get_original_url(short_key) == "https://python.org"
+    assert redis.ttls[short_key] == 86400
+
+    # Lookups seguintes contam na classe quente
+    await test_url_service.get_original_url(short_key)
+    assert policy.stats()["classes"]["base"]["hits"] == 3
+    assert policy.stats()["classes"]["hot"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_service_reads_compressed_values():
+    """Teste: valor comprimido no Redis é decodificado na leitura"""
+    redis = MockRedis()
+    policy = CachePolicy(compression=True, compress_min_bytes=10)
+    long_url = "https://example.com/" + "a" * 300
+    short_key = generate_short_key(1)
+    await policy.set(redis, short_key, long_url)
+    assert redis.store[short_key].startswith(COMPRESSED_PREFIX)
+
+    service = URLService(None, local_cache=LocalCache(), redis_client=redis, cache_policy=policy)
+    assert await service.get_original_url(short_key) == long_url
@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy.future import select
+
+from app.core.keygen import generate_short_key
+from app.models.url import URL
+from app.services.click_counter import ClickCounter
+from app.services.flusher import PeriodicFlusher
+from conftest import TestingSessionLocal
+
+# A chave é o id codificado (as buscas e o UPDATE decodificam a chave)
+KEY1, KEY2 = generate_short_key(1), generate_short_key(2)
+
+
+async def _clicks(session, short_key):
+    result = await session.execute(select(URL.clicks).where(URL.short_key == short_key))
+    return result.scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_flush_applies_aggregated_clicks(db_session):
+    """Teste: cliques agregados em memória viram um UPDATE em lote"""
+    db_session.add_all([
+        URL(id=1, original_url="https://python.org", short_key=KEY1, clicks=0),
+        URL(id=2, original_url="https://pypi.org", short_key=KEY2, clicks=10),
+    ])
+    await db_session.commit()
+
+    counter = ClickCounter(TestingSessionLocal, batch_size=1)
+    for _ in range(3):
+        counter.record(KEY1)
+    counter.record(KEY2)
+
+    assert await counter.flush() == 4
+    db_session.expire_all()
+    assert await _clicks(db_session, KEY1) == 3
+    assert await _clicks(db_session, KEY2) == 11
+    assert counter.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_counts():
+    """Teste: se o banco falhar, as contagens voltam ao buffer (at-least-once)"""
+    def broken_session():
+        raise ConnectionError("db down")
+
+    counter = ClickCounter(broken_session)
+    counter.record(KEY1)
+    counter.record(KEY1)
+
+    with pytest.raises(ConnectionError):
+        await counter.flush()
+
+    assert counter.pending == 2
+    assert counter.flush_errors == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_buffer(db_session):
+    """Teste: o shutdown drena o buffer antes de sair"""
+    db_session.add(URL(id=1, original_url="https://python.org", short_key=KEY1, clicks=0))
+    await db_session.commit()
+
+    counter = ClickCounter(TestingSessionLocal, flush_interval=3600)
+    counter.start()
+    counter.record(KEY1)
+    await counter.stop()
+
+    db_session.expire_all()
+    assert await _clicks(db_session, KEY1) == 1
+
+
+@pytest.mark.asyncio
+async def test_buffer_cap_drops_new_keys_while_db_is_down():
+    """Teste: com o banco fora o buffer não passa do teto; chaves já presentes seguem somando"""
+    def broken_session():
+        raise ConnectionError("db down")
+
+    counter = ClickCounter(broken_session, max_buffered_keys=2)
+    for short_key in (KEY1, KEY2, generate_short_key(3), KEY1):
+        counter.record(short_key)
+    with pytest.raises(ConnectionError):
+        await counter.flush()
+    counter.record(generate_short_key(4))
+
+    assert counter.pending == 3 and counter.has_pending
+    assert counter.dropped == 2
+    assert counter.recorded == 3
+
+
+def test_flusher_requires_flush_and_has_pending():
+    """Teste: PeriodicFlusher é abstrata; subclasse incompleta nem instancia"""
+    class NoFlush(PeriodicFlusher):
+        has_pending = False
+
+    with pytest.raises(TypeError):
+        PeriodicFlusher(1.0)
+    with pytest.raises(TypeError):
+        NoFlush(1.0)
@@ -0,0 +1,129 @@
+import csv
+import gzip
+import io
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from app.api.v1.admin import get_export_sessions
+from app.core.config import settings
+from app.core.keygen import generate_short_key
+from app.main import app
+from app.models.id_counter import IdCounter
+from app.models.url import URL, URLHash
+from app.services.corpus import CorpusImporter, export_corpus
+from app.services.dedup import url_digest
+from conftest import TestingSessionLocal
+
+
+async def _seed(session, ids):
+    for url_id in ids:
+        session.add(URL(id=url_id, original_url=f"https://example.com/{url_id}",
+                        short_key=generate_short_key(url_id), clicks=url_id))
+    await session.commit()
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_export_pages_by_id_in_every_format(db_session):
+    """Teste: NDJSON, CSV e gzip saem na ordem de id, página a página, e retomam por after_id"""
+    await _seed(db_session, [3, 1, 2, 5])
+
+    lines = (await _collect(export_corpus(TestingSessionLocal, batch_size=2))).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3, 5]
+    assert json.loads(lines[0])["short_key"] == generate_short_key(1)
+
+    data = await _collect(export_corpus(TestingSessionLocal, "csv", compress=True, batch_size=3, after_id=2))
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(data).decode())))
+    assert [row["id"] for row in rows] == ["3", "5"]
+    assert rows[1]["original_url"] == "https://example.com/5"
+
+
+@pytest.mark.asyncio
+async def test_export_opens_a_session_per_page(db_session):
+    """Teste: nenhuma sessão fica aberta enquanto a página é enviada"""
+    await _seed(db_session, [1, 2, 3, 4, 5])
+    open_sessions = []
+
+    @asynccontextmanager
+    async def scope():
+        open_sessions.append(True)
+        async with TestingSessionLocal() as session:
+            yield session
+        open_sessions.pop()
+
+    pages = 0
+    async for _ in export_corpus(scope, batch_size=2):
+        assert open_sessions == []
+        pages += 1
+    assert pages == 3
+
+
+@pytest.mark.asyncio
+async def test_import_resumes_from_checkpoint(db_session, tmp_path):
+    """Teste: import em chunks grava checkpoint, retoma de onde parou e avança os contadores de id"""
+    await _seed(db_session, range(1, 6))
+    exported = tmp_path / "urls.ndjson.gz"
+    exported.write_bytes(await _collect(export_corpus(TestingSessionLocal, compress=True)))
+
+    # Banco novo, com um contador de blocos ainda abaixo dos ids importados
+    await db_session.execute(URL.__table__.delete())
+    db_session.add(IdCounter(name="urls", next_value=2))
+    await db_session.commit()
+
+    checkpoint = tmp_path / "urls.ckpt"
+    checkpoint.write_text(json.dumps({
+        "source": str(exported), "records": 2, "inserted": 2, "max_id": 2,
+    }))
+    importer = CorpusImporter(TestingSessionLocal, chunk_size=2, checkpoint_path=str(checkpoint))
+    report = await importer.run(str(exported))
+
+    assert report["skipped"] == 2
+    assert report["records"] == 5 and report["inserted"] == 5 and report["max_id"] == 5
+    ids = (await db_session.execute(select(URL.id).order_by(URL.id))).scalars().all()
+    assert ids == [3, 4, 5]  # 1 e 2 já constavam do checkpoint
+    assert json.loads(checkpoint.read_text())["records"] == 5
+    next_value = (await db_session.execute(select(IdCounter.next_value))).scalar_one()
+    assert next_value == 6
+
+    # Reaplicar o mesmo arquivo do zero não duplica nada
+    await CorpusImporter(TestingSessionLocal, chunk_size=2).run(str(exported))
+    assert (await db_session.execute(select(func.count()).select_from(URL))).scalar_one() == 5
+
+    # O índice de dedup volta junto: a mesma URL longa reencontra a chave importada
+    hashes = dict((await db_session.execute(select(URLHash.url_hash, URLHash.short_key))).all())
+    assert len(hashes) == 5
+    assert hashes[url_digest("https://example.com/4")] == generate_short_key(4)
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_key_that_does_not_match_id(tmp_path):
+    """Teste: chave que não é a do id (corpus de outro codec) interrompe o import"""
+    corpus = tmp_path / "urls.ndjson"
+    corpus.write_text(json.dumps({"id": 7, "short_key": "abcde", "original_url": "https://x.com"}) + "\n")
+    with pytest.raises(ValueError, match="registro 1"):
+        await CorpusImporter(TestingSessionLocal).run(str(corpus))
+
+
+@pytest.mark.asyncio
+async def test_admin_export_requires_token(client: AsyncClient, db_session, monkeypatch):
+    """Teste: /admin/export some sem ADMIN_TOKEN, exige o Bearer e faz streaming com ele"""
+    await _seed(db_session, [1, 2])
+    app.dependency_overrides[get_export_sessions] = lambda: TestingSessionLocal
+
+    assert (await client.get("/admin/export")).status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    assert (await client.get("/admin/export", headers={"Authorization": "Bearer nope"})).status_code == 401
+
+    response = await client.get("/admin/export?format=csv", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[0] == "id,short_key,original_url,clicks,created_at,redirect_status"
+    assert len(response.text.splitlines()) == 3
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.models.url import URL
+from app.services.dedup import URLDeduplicator, url_digest
+from app.services.local_cache import LocalCache
+
+
+@pytest.fixture
+def dedup_service(test_url_service):
+    test_url_service.deduplicator = URLDeduplicator(
+        test_url_service.redis, local=LocalCache()
+    )
+    return test_url_service
+
+
+async def count_rows(service):
+    return (await service.repository.db.execute(select(func.count(URL.id)))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_same_url_returns_existing_key(dedup_service):
+    """Teste: a mesma URL longa devolve a mesma chave, sem nova linha"""
+    first = await dedup_service.shorten_url("https://python.org/docs")
+    await dedup_service.side_effects.flush()
+    second = await dedup_service.shorten_url("https://python.org/docs")
+    other = await dedup_service.shorten_url("https://python.org/blog")
+
+    assert first == second != other
+    assert await count_rows(dedup_service) == 2
+    assert dedup_service.deduplicator.local_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_database_index_is_the_fallback(dedup_service):
+    """Teste: sem nada no worker nem no Redis, a tabela url_hashes encontra a URL"""
+    first = await dedup_service.shorten_url("https://pypi.org")
+    dedup_service.deduplicator.local.clear()
+    dedup_service.redis.store.clear()
+
+    assert await dedup_service.shorten_url("https://pypi.org") == first
+    assert await count_rows(dedup_service) == 1
+    # O achado no banco volta para o Redis
+    assert dedup_service.redis.store["dedup:" + url_digest("https://pypi.org").hex()]
+
+
+@pytest.mark.asyncio
+async def test_batch_dedups_existing_and_repeated(dedup_service):
+    """Teste: lote reaproveita chaves existentes e repetidas dentro do próprio lote"""
+    existing = await dedup_service.shorten_url("https://a.example")
+    urls = ["https://b.example", "https://a.example", "https://b.example", "https://c.example"]
+
+    short_urls = await dedup_service.shorten_many(urls)
+
+    assert short_urls[1] == existing
+    assert short_urls[0] == short_urls[2]
+    assert len(set(short_urls)) == 3
+    assert await count_rows(dedup_service) == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_insert_returns_winner(dedup_service, monkeypatch):
+    """Teste: se outra criação gravou a URL entre a consulta e o INSERT, devolve a dela"""
+    winner = await dedup_service.shorten_url("https://race.example")
+    dedup_service.deduplicator.local.clear()
+    dedup_service.redis.store.clear()
+
+    # A consulta prévia "não vê" a linha; o INSERT esbarra no índice único
+    lookups = []
+    original = dedup_service.repository.get_keys_by_hashes
+
+    async def stale_then_real(hashes):
+        lookups.append(hashes)
+        return {} if len(lookups) == 1 else await original(hashes)
+
+    monkeypatch.setattr(dedup_service.repository, "get_keys_by_hashes", stale_then_real)
+
+    assert await dedup_service.shorten_url("https://race.example") == winner
+    assert len(lookups) == 2
+    assert await count_rows(dedup_service) == 1
@@ -0,0 +1,146 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.api.fast_redirect import CACHE_MISS_STATE, FastRedirectMiddleware
+from app.core.keygen import generate_short_key
+from app.core.resources import resources
+from app.services.local_cache import LocalCache
+from app.services.redirect_policy import redirect_headers
+from conftest import MockRedis
+
+KEY1, KEY2, MISSING = generate_short_key(1), generate_short_key(2), generate_short_key(3)
+
+
+class InnerApp:
+    """Pilha completa de mentira: só registra o que chegou nela"""
+    def __init__(self):
+        self.paths = []
+        self.states = []
+        self.routes = []
+
+    async def __call__(self, scope, receive, send):
+        self.paths.append(scope["path"])
+        self.states.append(dict(scope.get("state", {})))
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+class Route:
+    def __init__(self, path):
+        self.path = path
+
+
+@pytest.fixture
+def fast_app():
+    inner = InnerApp()
+    inner.routes = [Route("/health"), Route("/{short_key}")]
+    cache = LocalCache()
+    redis = MockRedis()
+    middleware = FastRedirectMiddleware(inner, local_cache=cache, redis_client=redis)
+
+    async def app(scope, receive, send):
+        scope["app"] = inner  # Como o Starlette faz antes da pilha de middlewares
+        await middleware(scope, receive, send)
+
+    return middleware, inner, cache, redis, app
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_skip_the_full_stack(fast_app, monkeypatch):
+    """Teste: hit no L1 ou no Redis responde do middleware e conta o clique"""
+    middleware, inner, cache, redis, app = fast_app
+    clicks = []
+    monkeypatch.setattr(resources, "record_click", lambda key, **kw: clicks.append((key, kw)))
+    cache.set(KEY1, "https://python.org/a b")
+    await redis.set(KEY2, "https://pypi.org")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(f"/{KEY1}", headers={"referer": "https://t.co/x"})
+        assert response.status_code == 301
+        assert response.headers["location"] == "https://python.org/a%20b"
+        assert (await client.get(f"/{KEY2}")).headers["location"] == "https://pypi.org"
+
+    assert inner.paths == []
+    assert KEY2 in cache  # Hit do Redis sobe para o L1
+    assert [key for key, _ in clicks] == [KEY1, KEY2]
+    assert clicks[0][1]["referrer"] == "https://t.co/x"
+    assert middleware.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_misses_and_other_paths_fall_through(fast_app):
+    """Teste: miss, formato inválido e rotas fixas seguem para a pilha completa"""
+    middleware, inner, cache, redis, app = fast_app
+    cache.set("health", "https://evil.example")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for path in (f"/{MISSING}", "/zzzzz", "/chave_inexistente_123", "/health", "/urls/abcde/stats"):
+            assert (await client.get(path)).status_code == 404
+        assert (await client.post(f"/{KEY1}")).status_code == 404
+
+    assert inner.paths == [
+        f"/{MISSING}", "/zzzzz", "/chave_inexistente_123", "/health", "/urls/abcde/stats", f"/{KEY1}"
+    ]
+    # Só o miss legítimo consultou o cache ("zzzzz" não é uma chave canônica)
+    assert middleware.fallbacks == 1
+    assert inner.states[0] == {CACHE_MISS_STATE: MISSING}
+    assert all(CACHE_MISS_STATE not in state for state in inner.states[1:])
+
+
+@pytest.mark.asyncio
+async def test_full_stack_skips_the_redis_get_after_a_fast_miss(test_url_service, monkeypatch):
+    """Teste: com o miss já visto no middleware, o URLService vai direto ao banco"""
+    short_key = (await test_url_service.shorten_url("https://python.org")).rsplit("/", 1)[1]
+    await test_url_service.invalidate(short_key)
+    gets = []
+    original_get = test_url_service.redis.get
+
+    async def counting_get(key):
+        gets.append(key)
+        return await original_get(key)
+
+    monkeypatch.setattr(test_url_service.redis, "get", counting_get)
+    assert await test_url_service.get_redirect(short_key, cache_missed=True) == ("https://python.org", None)
+    assert gets == []
+    # Sem o aviso do middleware, o Redis (agora populado) responde
+    test_url_service.local_cache.clear()
+    assert await test_url_service.get_original_url(short_key) == "https://python.org"
+    assert gets == [short_key]
+
+
+def test_redirect_headers_are_memoized():
+    """Teste: URLs repetidas reaproveitam os headers já codificados"""
+    assert redirect_headers("https://python.org") is redirect_headers("https://python.org")
+
+
+@pytest.mark.asyncio
+async def test_fast_path_applies_link_status_and_etag(fast_app):
+    """Teste: status do link (entrada "307|url") e revalidação por ETag também no caminho rápido"""
+    middleware, inner, cache, redis, app = fast_app
+    cache.set(KEY1, "307|https://python.org")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(f"/{KEY1}")
+        assert response.status_code == 307
+        assert response.headers["location"] == "https://python.org"
+        assert "s-maxage" in response.headers["cache-control"]
+        revalidated = await client.get(f"/{KEY1}", headers={"if-none-match": response.headers["etag"]})
+        assert revalidated.status_code == 304
+
+    assert inner.paths == []
+
+
+@pytest.mark.asyncio
+async def test_client_fixture_isolates_the_fast_path(client, test_url_service):
+    """Teste: no app de testes o caminho rápido usa o L1 e o Redis falsos do teste"""
+    from app.services.local_cache import local_cache as process_cache
+
+    process_cache.set(MISSING, "https://stale.example")
+    try:
+        assert (await client.get(f"/{MISSING}")).status_code == 404
+    finally:
+        process_cache.delete(MISSING)
+
+    await test_url_service.redis.set(KEY1, "https://pypi.org")
+    assert (await client.get(f"/{KEY1}")).headers["location"] == "https://pypi.org"
+    assert test_url_service.local_cache.get(KEY1) == "https://pypi.org"
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository
+from app.services.id_allocator import DatabaseBlockSource, IdAllocator, RedisBlockSource
+from conftest import MockRedis, TestingSessionLocal
+
+
+class MemorySource:
+    """Fonte de blocos em memória, contando os leases"""
+    def __init__(self):
+        self.next_value = 1
+        self.leases = 0
+
+    async def lease(self, size):
+        await asyncio.sleep(0)
+        self.leases += 1
+        start = self.next_value
+        self.next_value += size
+        return [(start, start + size - 1)]
+
+
+@pytest.mark.asyncio
+async def test_ids_are_unique_across_concurrent_tasks():
+    """Teste: tasks concorrentes nunca recebem o mesmo ID"""
+    source = MemorySource()
+    allocator = IdAllocator(source, block_size=10)
+
+    ids = await asyncio.gather(*[allocator.allocate() for _ in range(95)])
+
+    assert len(set(ids)) == 95
+    assert source.leases <= 11
+
+
+@pytest.mark.asyncio
+async def test_allocate_many_spans_blocks():
+    """Teste: um lote maior que o bloco atravessa vários leases"""
+    allocator = IdAllocator(MemorySource(), block_size=10)
+    first = await allocator.allocate()
+    batch = await allocator.allocate_many(25)
+
+    assert batch == list(range(first + 1, first + 26))
+
+
+@pytest.mark.asyncio
+async def test_database_source_seeds_above_existing_ids(db_session):
+    """Teste: o contador começa acima do maior ID e sobrevive a 'restarts'"""
+    db_session.add(URL(id=500, original_url="https://python.org", short_key="abc12"))
+    await db_session.commit()
+
+    first = IdAllocator(DatabaseBlockSource(TestingSessionLocal), block_size=100)
+    assert await first.allocate() == 501
+
+    # Novo worker (ou restart): aluga o bloco seguinte, sem reusar IDs
+    second = IdAllocator(DatabaseBlockSource(TestingSessionLocal), block_size=100)
+    assert await second.allocate() == 601
+
+
+@pytest.mark.asyncio
+async def test_redis_source_leases_disjoint_blocks(db_session):
+    """Teste: INCRBY no Redis entrega blocos disjuntos"""
+    redis = MockRedis()
+    source = RedisBlockSource(redis, TestingSessionLocal, seed_margin=0)
+
+    assert await source.lease(10) == [(1, 10)]
+    assert await source.lease(10) == [(11, 20)]
+
+
+class InterleavedSource(MemorySource):
+    """Bloco com lacunas, como nextvals concorrentes no Postgres"""
+    async def lease(self, size):
+        self.leases += 1
+        start = self.next_value
+        self.next_value += size + 2
+        return [(start, start + 1), (start + 4, start + size + 1)]
+
+
+@pytest.mark.asyncio
+async def test_interleaved_blocks_and_concurrent_switch():
+    """Teste: intervalos de um bloco são usados em ordem e a troca concorrente não repete IDs"""
+    source = InterleavedSource()
+    allocator = IdAllocator(source, block_size=4)
+
+    assert await allocator.allocate_many(4) == [1, 2, 5, 6]
+    ids = await asyncio.gather(*[allocator.allocate() for _ in range(20)])
+    assert len(set(ids)) == 20
+    assert not {3, 4} & set(ids)
+
+
+@pytest.mark.asyncio
+async def test_repository_and_allocator_share_the_counter(db_session):
+    """Teste: reserve_id (ID_ALLOCATOR=none) e os blocos nunca entregam o mesmo ID"""
+    allocator = IdAllocator(DatabaseBlockSource(TestingSessionLocal), block_size=10)
+    leased = await allocator.allocate_many(3)
+    reserved = await URLRepository(db_session).reserve_ids(3)
+
+    assert leased == [1, 2, 3]
+    assert reserved == [11, 12, 13]
+    assert await allocator.allocate() == 4
@@ -0,0 +1,39 @@
+import random
+import sys
+
+from app.core.keygen import (
+    codec, decode_short_key, decode_short_keys, generate_short_key, generate_short_keys,
+    is_valid_short_key, sqids,
+)
+
+
+def test_codec_matches_sqids():
+    """Teste: chaves idênticas às do Sqids (as já gravadas continuam válidas)"""
+    rng = random.Random(1)
+    ids = list(range(2000)) + [rng.randrange(2**40) for _ in range(500)] + [sys.maxsize]
+    assert generate_short_keys(ids) == [sqids.encode([i]) for i in ids]
+
+
+def test_blocklisted_ids_use_the_sqids_alternative():
+    """Teste: id cuja chave cairia na blocklist recebe a chave alternativa do Sqids"""
+    # 1300 é o primeiro id cuja chave "natural" contém uma palavra bloqueada
+    assert generate_short_key(1300) == sqids.encode([1300])
+    assert decode_short_key(generate_short_key(1300)) == 1300
+
+
+def test_decode_round_trip_and_batch():
+    """Teste: decode é o inverso do encode, também em lote"""
+    keys = generate_short_keys([1, 42, 10**12])
+    assert decode_short_keys(keys + ["zzzzz"]) == [1, 42, 10**12, None]
+
+
+def test_strict_validation_rejects_non_canonical_keys():
+    """Teste: tamanho, alfabeto e forma canônica são conferidos antes de qualquer I/O"""
+    key = generate_short_key(7)
+    assert is_valid_short_key(key)
+    # Mesmos caracteres do alfabeto, mas o Sqids nunca geraria estas
+    for bad in ("abcde", "zzzzz", key + "0", "a-b_c", "abc", "a" * 11):
+        assert not is_valid_short_key(bad)
+        assert decode_short_key(bad) is None
+    # O Sqids decodifica "abcde" num id, mas o id não volta para "abcde"
+    assert sqids.decode("abcde") and codec.decode("abcde") is None
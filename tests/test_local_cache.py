@@ -0,0 +1,51 @@
+from app.services.local_cache import LocalCache
+from conftest import FakeClock
+
+
+def test_hit_and_miss_counters():
+    """Teste: get conta hits e misses"""
+    cache = LocalCache()
+    cache.set("abc12", "https://python.org")
+
+    assert cache.get("abc12") == "https://python.org"
+    assert cache.get("nope1") is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_lru_eviction_by_entries():
+    """Teste: ao passar do limite de entradas, remove a menos usada"""
+    cache = LocalCache(max_entries=2)
+    cache.set("a", "https://a.com")
+    cache.set("b", "https://b.com")
+    cache.get("a")  # 'a' passa a ser a mais recente
+    cache.set("c", "https://c.com")
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.evictions == 1
+
+
+def test_eviction_by_bytes():
+    """Teste: o limite em bytes também força eviction"""
+    cache = LocalCache(max_entries=100, max_bytes=600)
+    for i in range(10):
+        cache.set(f"k{i}", "https://example.com/" + "x" * 100)
+
+    assert cache.current_bytes <= 600
+    assert len(cache) < 10
+    assert cache.evictions > 0
+
+
+def test_ttl_expiration():
+    """Teste: entradas expiram após o TTL"""
+    clock = FakeClock()
+    cache = LocalCache(ttl=10, clock=clock)
+    cache.set("abc12", "https://python.org")
+
+    clock.now = 9.9
+    assert cache.get("abc12") == "https://python.org"
+    clock.now = 10.0
+    assert cache.get("abc12") is None
+    assert cache.expirations == 1
+    assert cache.current_bytes == 0
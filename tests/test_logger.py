@@ -0,0 +1,88 @@
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.logger import (
+    ContextQueueHandler, JsonFormatter, SamplingFilter, request_id_var, short_key_var
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def make_logger(name, log_queue):
+    log = logging.getLogger(name)
+    log.propagate = False
+    log.handlers = [ContextQueueHandler(log_queue)]
+    return log
+
+
+def test_json_lines_carry_request_context():
+    """Teste: aspas viram JSON válido e o contexto da task vai junto pela fila"""
+    log_queue = queue.Queue()
+    output = ListHandler()
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output)
+    log = make_logger("test.json", log_queue)
+
+    request_id_var.set("req-1")
+    short_key_var.set("abcde")
+    listener.start()
+    try:
+        log.warning('URL "estranha"\ncom quebra', extra={"status": 404})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.exception("falhou")
+    finally:
+        listener.stop()
+        request_id_var.set(None)
+        short_key_var.set(None)
+
+    first, second = [json.loads(line) for line in output.lines]
+    assert first["message"] == 'URL "estranha"\ncom quebra'
+    assert first["request_id"] == "req-1"
+    assert first["short_key"] == "abcde"
+    assert first["status"] == 404
+    assert "cache_tier" not in first
+    assert "ValueError: boom" in second["exception"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    """Teste: fila cheia (stdout lento) descarta e conta, sem bloquear"""
+    log = make_logger("test.full", queue.Queue(maxsize=2))
+    for i in range(5):
+        log.warning("msg %d", i)
+    assert log.handlers[0].dropped == 3
+
+
+def test_sampling_keeps_warnings_and_errors():
+    """Teste: amostragem corta info, mas nunca warning/erro"""
+    sampler = SamplingFilter(rate=0.0)
+    info = logging.makeLogRecord({"levelno": logging.INFO})
+    warning = logging.makeLogRecord({"levelno": logging.WARNING})
+    presampled = logging.makeLogRecord({"levelno": logging.INFO, "sampled": True})
+    assert not sampler.filter(info)
+    assert sampler.filter(warning)
+    assert sampler.filter(presampled)
+    assert SamplingFilter(rate=1.0).filter(info)
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_propagated(client: AsyncClient):
+    """Teste: X-Request-ID recebido volta na resposta; sem ele, um novo é gerado"""
+    response = await client.get("/health", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["x-request-id"] == "abc-123"
+
+    generated = (await client.get("/health")).headers["x-request-id"]
+    assert len(generated) == 32
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from app.core.metrics import EventLoopLagMonitor
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_stage_latencies(client: AsyncClient):
+    """Teste: criação e redirect aparecem nos histogramas por etapa"""
+    inserts = sample("shortener_create_stage_seconds_count", stage="insert")
+
+    created = await client.post("/urls", json={"url": "https://python.org"})
+    short_key = created.json()["short_url"].split("/")[-1]
+    response = await client.get(f"/{short_key}", follow_redirects=False)
+    assert response.status_code == 301
+
+    assert sample("shortener_create_stage_seconds_count", stage="insert") == inserts + 1
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'outcome="hit",stage="l1"' in body
+    assert "shortener_l1_cache_hit_ratio" in body
+    assert "shortener_replica_healthy" in body
+    assert "shortener_db_round_trip_seconds" in body
+
+
+@pytest.mark.asyncio
+async def test_redirect_miss_is_timed_per_stage(client: AsyncClient, test_url_service):
+    """Teste: miss em L1 e Redis mede cada etapa até o banco"""
+    created = await client.post("/urls", json={"url": "https://pypi.org"})
+    short_key = created.json()["short_url"].split("/")[-1]
+    test_url_service.local_cache.clear()
+    await test_url_service.redis.delete(short_key)
+
+    before = {
+        (stage, outcome): sample("shortener_redirect_stage_seconds_count", stage=stage, outcome=outcome)
+        for stage, outcome in [("l1", "miss"), ("redis", "miss"), ("db", "found")]
+    }
+    response = await client.get(f"/{short_key}", follow_redirects=False)
+    assert response.status_code == 301
+
+    for (stage, outcome), count in before.items():
+        assert sample("shortener_redirect_stage_seconds_count", stage=stage, outcome=outcome) > count
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_monitor_sees_blocking_code():
+    """Teste: código síncrono bloqueando o loop aparece como atraso"""
+    monitor = EventLoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0)  # Deixa o monitor começar a dormir
+    time.sleep(0.05)        # Bloqueia o loop
+    await asyncio.sleep(0.001)  # Monitor acorda atrasado e registra
+    await monitor.stop()
+    assert monitor.last_lag >= 0.03
@@ -0,0 +1,120 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.api.rate_limit import RateLimitMiddleware
+from app.core.keygen import generate_short_key
+from app.services.rate_limiter import CREATE, REDIRECT, RateLimiter, RouteLimit
+from conftest import FakeClock, MockRedis
+
+
+class SlidingWindowRedis(MockRedis):
+    """MockRedis com o EVAL do script de janela deslizante, em Python"""
+    async def eval(self, script, numkeys, current, previous, count, elapsed, ttl):
+        value = int(self.store.get(current, 0)) + int(count)
+        self.store[current] = value
+        self.ttls[current] = ttl
+        return int(int(self.store.get(previous, 0)) * (1 - float(elapsed)) + value)
+
+
+class BrokenRedis(MockRedis):
+    async def eval(self, *args):
+        raise ConnectionError("redis down")
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def make_limiter(redis=None, clock=None, create=(60, 2), redirect=(600, 5)):
+    return RateLimiter(
+        redis,
+        {CREATE: RouteLimit(*create), REDIRECT: RouteLimit(*redirect)},
+        window=60.0,
+        clock=clock or FakeClock(1000.0),
+        wall_clock=FakeClock(6030.0),  # metade da janela
+    )
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_returns_429_with_retry_after():
+    """Teste: acima da rajada local a resposta é 429 com Retry-After, por cliente"""
+    clock = FakeClock(1000.0)
+    limiter = make_limiter(clock=clock)
+    app = RateLimitMiddleware(ok_app, limiter=limiter, api_keys=["k1"])
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        statuses = [(await client.post("/urls")).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        blocked = await client.post("/urls")
+        assert blocked.headers["retry-after"] == "1"  # 1 req/s de reposição
+        assert blocked.json() == {"detail": "Too Many Requests"}
+
+        # Outro cliente (API key conhecida) e outra classe de rota têm buckets próprios
+        assert (await client.post("/urls", headers={"X-API-Key": "k1"})).status_code == 200
+        assert (await client.get(f"/{generate_short_key(1)}")).status_code == 200
+        # Rotas fora das classes não são limitadas
+        assert (await client.get("/urls/abcde/stats")).status_code == 200
+
+        clock.now += 1.0  # Reposição de um token
+        assert (await client.post("/urls")).status_code == 200
+
+    assert limiter.shed == {(CREATE, "local"): 2}
+
+
+@pytest.mark.asyncio
+async def test_forged_keys_and_ips_share_the_peer_bucket():
+    """Teste: API key desconhecida e X-Real-IP de peer não confiável não ganham bucket próprio"""
+    limiter = make_limiter()
+    untrusted = RateLimitMiddleware(ok_app, limiter=limiter, api_keys=["k1"], trusted_proxies=[])
+    async with AsyncClient(transport=ASGITransport(app=untrusted), base_url="http://test") as client:
+        statuses = [
+            (await client.post("/urls", headers={"X-API-Key": f"r{i}", "X-Real-IP": f"10.0.0.{i}"})).status_code
+            for i in range(4)
+        ]
+    assert statuses == [200, 200, 429, 429]
+
+    # Atrás do Nginx (peer confiável) o X-Real-IP separa os clientes
+    behind_proxy = RateLimitMiddleware(ok_app, limiter=make_limiter(), trusted_proxies=["127.0.0.0/8"])
+    async with AsyncClient(transport=ASGITransport(app=behind_proxy), base_url="http://test") as client:
+        statuses = [
+            (await client.post("/urls", headers={"X-Real-IP": f"203.0.113.{i}"})).status_code
+            for i in range(4)
+        ]
+    assert statuses == [200] * 4
+
+
+@pytest.mark.asyncio
+async def test_global_limit_is_shared_through_redis():
+    """Teste: dois workers somam as contagens no Redis e bloqueiam o mesmo cliente"""
+    redis = SlidingWindowRedis()
+    clock = FakeClock(1000.0)
+    workers = [make_limiter(redis, clock, create=(4, 10)) for _ in range(2)]
+
+    for worker in workers:
+        for _ in range(3):
+            assert worker.check(CREATE, "ip:1.2.3.4") is None
+        await worker.flush()
+
+    # 6 > 4 na janela: o segundo worker já sabe; o primeiro, no próximo sync
+    assert workers[1].check(CREATE, "ip:1.2.3.4") == pytest.approx(30.0)
+    await workers[0].flush()
+    assert workers[0].check(CREATE, "ip:1.2.3.4") is None  # Sync sem novidade não bloqueia
+    assert workers[1].check(CREATE, "ip:9.9.9.9") is None
+    assert workers[1].shed == {(CREATE, "global"): 1}
+
+    clock.now += 31  # Janela virou: bloqueio expira
+    assert workers[1].check(CREATE, "ip:1.2.3.4") is None
+
+
+@pytest.mark.asyncio
+async def test_sync_failure_keeps_counts():
+    """Teste: Redis fora do ar não perde contagens (vão no próximo sync)"""
+    limiter = make_limiter(BrokenRedis())
+    limiter.check(REDIRECT, "ip:1.2.3.4")
+    limiter.check(REDIRECT, "ip:1.2.3.4")
+
+    with pytest.raises(ConnectionError):
+        await limiter.flush()
+    assert limiter._unsynced == {(REDIRECT, "ip:1.2.3.4"): 2}
+    assert limiter.flush_errors == 1
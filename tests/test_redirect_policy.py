@@ -0,0 +1,194 @@
+import random
+from email.utils import formatdate
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+
+import app.api.v1.endpoints as endpoints
+from app.api.v1.admin import get_edge_purger
+from app.core.config import settings
+from app.core.resources import resources
+from app.main import app
+from app.models.url import URL
+from app.services.edge_purge import EdgePurger
+from app.services.redirect_policy import RedirectPolicy, cache_entry, parse_entry
+
+NOW = 1_800_000_000.4
+
+
+def _headers(raw):
+    return {name.decode(): value.decode() for name, value in raw}
+
+
+def _shared_ttl(cache_control: str):
+    """TTL que um cache compartilhado usaria: s-maxage, senão max-age (no-store/private = não guarda)."""
+    directives = dict(
+        (part.strip().split("=") + [""])[:2] for part in cache_control.split(",") if part.strip()
+    )
+    if "no-store" in directives or "private" in directives:
+        return None
+    ttl = int(directives.get("s-maxage") or directives.get("max-age") or 0)
+    return ttl or None
+
+
+class EdgeCache:
+    """
+    Nginx de mentira na frente do app: proxy_cache_key $uri, TTL pelo
+    Cache-Control da resposta e X-Cache-Refresh: 1 como proxy_cache_bypass.
+    """
+
+    def __init__(self, app, clock):
+        self.app = app
+        self.clock = clock
+        self.store = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        refresh = (b"x-cache-refresh", b"1") in scope["headers"]
+        cached = self.store.get(scope["path"])
+        if scope["method"] == "GET" and cached and not refresh and cached[0] > self.clock():
+            self.hits += 1
+            await send({"type": "http.response.start", "status": cached[1], "headers": cached[2]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        self.misses += 1
+        start = {}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            await send(message)
+
+        await self.app(scope, receive, capture)
+        ttl = _shared_ttl(_headers(start.get("headers", [])).get("cache-control", ""))
+        if scope["method"] == "GET" and ttl:
+            self.store[scope["path"]] = (self.clock() + ttl, start["status"], start["headers"])
+
+    @property
+    def offload(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+
+def test_cache_entry_round_trip():
+    """Teste: o status do link viaja junto da URL no cache, sem ambiguidade"""
+    assert cache_entry("https://python.org") == "https://python.org"
+    assert parse_entry(cache_entry("https://python.org/a|b", 307)) == ("https://python.org/a|b", 307)
+    assert parse_entry("https://python.org/a|b") == ("https://python.org/a|b", None)
+
+
+def test_cache_headers_by_status():
+    """Teste: permanente fica no navegador; temporário só na borda (s-maxage)"""
+    policy = RedirectPolicy(
+        default_status=301, permanent_max_age=86400, max_age=0, edge_max_age=60, clock=lambda: NOW
+    )
+    status, raw = policy.respond("https://python.org/a b")
+    headers = _headers(raw)
+    assert status == 301
+    assert headers["location"] == "https://python.org/a%20b"
+    assert headers["cache-control"] == "public, max-age=86400"
+    assert headers["expires"] == formatdate(int(NOW) + 86400, usegmt=True)
+
+    status, raw = policy.respond("https://python.org/a b", 302)
+    headers = _headers(raw)
+    assert status == 302
+    assert headers["cache-control"] == "public, max-age=0, s-maxage=60"
+    assert headers["etag"] != _headers(policy.respond("https://python.org/a b")[1])["etag"]
+
+    no_cache = RedirectPolicy(default_status=307, max_age=0, edge_max_age=0)
+    headers = _headers(no_cache.respond("https://python.org")[1])
+    assert headers["cache-control"] == "no-store" and "expires" not in headers
+
+    with pytest.raises(ValueError):
+        RedirectPolicy(default_status=303)
+
+
+def test_matching_etag_answers_not_modified():
+    """Teste: revalidação com o ETag atual devolve 304 sem Location"""
+    policy = RedirectPolicy(default_status=302)
+    etag = _headers(policy.respond("https://python.org")[1])["etag"]
+
+    status, raw = policy.respond("https://python.org", if_none_match=f'"x", {etag}')
+    assert status == 304
+    assert "location" not in _headers(raw) and _headers(raw)["etag"] == etag
+    assert policy.respond("https://pypi.org", if_none_match=etag)[0] == 302
+
+
+@pytest.mark.asyncio
+async def test_link_status_is_stored_and_served(client: AsyncClient, test_url_service):
+    """Teste: o status escolhido na criação vale no redirect; sem ele, o padrão global"""
+    created = await client.post("/urls", json={"url": "https://python.org", "redirect_status": 307})
+    assert created.status_code == 201 and created.json()["redirect_status"] == 307
+    temporary = created.json()["short_url"].rsplit("/", 1)[1]
+    permanent = (await test_url_service.shorten_url("https://pypi.org")).rsplit("/", 1)[1]
+    assert (await client.post("/urls", json={"url": "https://x.org", "redirect_status": 303})).status_code == 422
+
+    # Depois de sair do L1, o status vem do banco e volta para o cache junto da URL
+    test_url_service.local_cache.clear()
+    response = await client.get(f"/{temporary}")
+    assert response.status_code == 307
+    assert response.headers["cache-control"] == "public, max-age=0, s-maxage=60"
+    assert test_url_service.local_cache.get(temporary) == "307|https://python.org/"
+
+    response = await client.get(f"/{permanent}")
+    assert response.status_code == 301
+    assert "max-age=86400" in response.headers["cache-control"]
+
+
+@pytest.mark.asyncio
+async def test_edge_absorbs_zipf_traffic_and_refreshes_on_purge(
+    client: AsyncClient, test_url_service, db_session, monkeypatch
+):
+    """Teste: com 302 + s-maxage a borda responde a maior parte; o purge troca o destino na hora"""
+    now = [NOW]
+    monkeypatch.setattr(
+        endpoints, "redirect_policy",
+        RedirectPolicy(default_status=302, max_age=0, edge_max_age=60, clock=lambda: now[0]),
+    )
+    monkeypatch.setattr(settings, "FAST_REDIRECT_ENABLED", False)
+    clicks = []
+    monkeypatch.setattr(resources, "record_click", lambda key, **kw: clicks.append(key))
+    edge = EdgeCache(app, clock=lambda: now[0])
+
+    keys = [
+        (await test_url_service.shorten_url(f"https://example.com/{i}")).rsplit("/", 1)[1]
+        for i in range(50)
+    ]
+    # Zipf (s=1): poucos links concentram o tráfego, como num encurtador real
+    rng = random.Random(7)
+    traffic = rng.choices(keys, weights=[1 / rank for rank in range(1, len(keys) + 1)], k=2000)
+
+    async with AsyncClient(transport=ASGITransport(app=edge), base_url="http://test") as edge_client:
+        for key in traffic:
+            response = await edge_client.get(f"/{key}")
+            assert response.status_code == 302
+            now[0] += 0.05  # 2000 requisições em 100s: cada chave vence uma vez
+
+        # Só os misses chegaram ao backend (e só eles viraram clique no app)
+        assert edge.hits + edge.misses == len(traffic)
+        assert len(clicks) == edge.misses <= 2 * len(set(traffic))
+        assert edge.offload >= 0.9
+
+        # Destino alterado: a borda segue com o antigo até o purge
+        hot = traffic[0]
+        await db_session.execute(
+            update(URL).where(URL.short_key == hot).values(original_url="https://python.org/novo")
+        )
+        await db_session.commit()
+        assert (await edge_client.get(f"/{hot}")).headers["location"] != "https://python.org/novo"
+
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+        app.dependency_overrides[get_edge_purger] = lambda: EdgePurger(
+            ["http://edge/{short_key}"], transport=ASGITransport(app=edge)
+        )
+        purged = await client.post(f"/admin/purge/{hot}", headers={"Authorization": "Bearer s3cret"})
+        assert purged.status_code == 200
+        assert purged.json()["edges"] == {f"http://edge/{hot}": 302}
+
+        misses = edge.misses
+        assert (await edge_client.get(f"/{hot}")).headers["location"] == "https://python.org/novo"
+        assert edge.misses == misses  # Servido do cache já regravado pelo refresh
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.keygen import generate_short_key
+from app.core.replica_router import ReplicaRouter
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository
+from app.services.bloom_filter import BloomFilter
+from app.services.local_cache import LocalCache
+from app.services.url_service import URLService
+from conftest import MockRedis, TestingSessionLocal, engine
+
+
+class FakeEngine:
+    """Engine que só serve para identificar a réplica"""
+    def __init__(self, name):
+        self.url = type("URL", (), {"host": name, "database": None})()
+
+
+def _router(*names, **kwargs):
+    replicas = [(FakeEngine(name), None) for name in names]
+    return ReplicaRouter(replicas, (FakeEngine("master"), None), **kwargs)
+
+
+def test_pick_prefers_least_outstanding_weighted_by_latency():
+    """Teste: vence a réplica com menos carga x latência"""
+    router = _router("r1", "r2", "r3")
+    r1, r2, r3 = router.replicas
+    r1.outstanding, r2.outstanding, r3.outstanding = 4, 1, 0
+    r3.latency = 0.010  # 10x mais lenta
+    assert router.pick() is r2
+
+
+def test_lagging_and_ejected_replicas_leave_rotation():
+    """Teste: réplica atrasada ou ejetada não é escolhida; sem réplicas, master"""
+    router = _router("r1", "r2", max_lag=5.0, eject_after=2)
+    r1, r2 = router.replicas
+    r1.lag = 30.0
+    assert router.pick() is r2
+
+    router._record_failure(r2)
+    assert r2.healthy  # Uma falha só não ejeta
+    router._record_failure(r2)
+    assert not r2.healthy
+    assert router.pick() is None
+
+
+@pytest.mark.asyncio
+async def test_probe_ejects_and_readmits(monkeypatch):
+    """Teste: probes falhos ejetam; o primeiro probe bom readmite"""
+    router = _router("r1", eject_after=2)
+    replica = router.replicas[0]
+    healthy = False
+
+    async def measure_lag(engine):
+        if not healthy:
+            raise ConnectionError("replica down")
+        return 1.5
+
+    monkeypatch.setattr(router, "_measure_lag", measure_lag)
+    await router.probe_all()
+    await router.probe_all()
+    assert not replica.healthy
+
+    healthy = True
+    await router.probe_all()
+    assert replica.healthy
+    assert replica.lag == 1.5
+    assert replica.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_replica_miss_falls_back_to_master(db_session):
+    """Teste: chave recém-criada que a réplica não tem é relida no master"""
+    short_key = generate_short_key(7)
+    db_session.add(URL(id=7, original_url="https://python.org", short_key=short_key))
+    await db_session.commit()
+
+    # "Réplica" atrasada: banco vazio, mesmo schema
+    replica_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(URL.__table__.create)
+    replica_sessions = async_sessionmaker(bind=replica_engine, class_=AsyncSession)
+    router = ReplicaRouter([(replica_engine, replica_sessions)], (engine, TestingSessionLocal))
+
+    redis = MockRedis()
+    bloom = BloomFilter(redis, item_count=1000)
+    await bloom.add(short_key)
+    await bloom.mark_ready()  # Filtro completo (back-fill feito)
+    async with router.session() as session:
+        service = URLService(
+            URLRepository(session),
+            local_cache=LocalCache(),
+            redis_client=redis,
+            bloom=bloom,
+            read_router=router,
+        )
+        assert await service.get_original_url(short_key) == "https://python.org"
+        # Chave fora do filtro (ou não canônica) não vai ao master
+        assert await service.get_original_url(generate_short_key(8)) is None
+        assert await service.get_original_url("naoexiste") is None
+
+    assert router.master_fallbacks == 1
+    await replica_engine.dispose()
@@ -6,12 +6,13 @@ async def test_create_short_url(client: AsyncClient):
     """Teste: Criar uma URL curta com sucesso"""
     payload = {"url": "https://www.google.com"}
     
-    response = await client.post("/shorten", json=payload)
+    response = await client.post("/urls", json=payload)
     
     assert response.status_code == 201
     data = response.json()
     assert "short_url" in data
-    assert data["original_url"] == payload["url"]
+    # HttpUrl normaliza a URL (ex: adiciona a "/" do path vazio)
+    assert data["original_url"].rstrip("/") == payload["url"]
     # Verifica se a URL curta contém a Base URL configurada
     assert "http://localhost:8000" in data["short_url"]
 
@@ -20,7 +21,7 @@ async def test_redirect_url(client: AsyncClient):
     """Teste: Redirecionar uma URL curta existente"""
     # 1. Primeiro criamos a URL
     payload = {"url": "https://python.org"}
-    create_response = await client.post("/shorten", json=payload)
+    create_response = await client.post("/urls", json=payload)
     short_url = create_response.json()["short_url"]
     
     # Extrai a chave (ex: http://localhost:8000/1 -> 1)
@@ -31,7 +32,7 @@ async def test_redirect_url(client: AsyncClient):
     response = await client.get(f"/{short_key}", follow_redirects=False)
     
     assert response.status_code == 301
-    assert response.headers["location"] == payload["url"]
+    assert response.headers["location"].rstrip("/") == payload["url"]
 
 @pytest.mark.asyncio
 async def test_url_not_found(client: AsyncClient):
@@ -46,7 +47,7 @@ async def test_invalid_url_format(client: AsyncClient):
     """Teste: Enviar um JSON inválido ou URL malformada"""
     payload = {"url": "não-é-uma-url"}
     
-    response = await client.post("/shorten", json=payload)
+    response = await client.post("/urls", json=payload)
     
     # Pydantic deve barrar (422 Unprocessable Entity)
     assert response.status_code == 422
\ No newline at end of file
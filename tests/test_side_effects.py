@@ -0,0 +1,96 @@
+import pytest
+
+from app.services.cache_policy import CachePolicy
+from app.services.side_effects import BLOOM, CACHE, SideEffectQueue
+from conftest import FakeClock, MockPipeline, MockRedis
+
+
+class CountingRedis(MockRedis):
+    """Conta quantos pipelines foram executados"""
+    def __init__(self):
+        super().__init__()
+        self.pipelines = 0
+
+    def pipeline(self, transaction=True):
+        self.pipelines += 1
+        return MockPipeline(self)
+
+
+class FlakyBloom:
+    """Bloom que falha nas primeiras `failures` chamadas"""
+    def __init__(self, failures):
+        self.failures = failures
+        self.items = []
+
+    async def add_many(self, items):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("redis fora")
+        self.items.extend(items)
+
+
+@pytest.mark.asyncio
+async def test_cache_writes_are_coalesced_into_one_pipeline():
+    """Teste: N criações viram um único pipeline no Redis"""
+    redis, policy = CountingRedis(), CachePolicy()
+    queue = SideEffectQueue()
+    for i in range(10):
+        assert queue.submit(CACHE, (redis, policy), (f"key{i}", f"https://e.com/{i}"))
+    assert queue.depth == 10
+
+    assert await queue.flush() == 10
+    assert redis.pipelines == 1
+    assert redis.store["key3"] == "https://e.com/3"
+    assert queue.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_with_backoff_then_dropped():
+    """Teste: lote com erro volta para a fila com backoff e é descartado após max_attempts"""
+    clock = FakeClock()
+    bloom = FlakyBloom(failures=5)
+    queue = SideEffectQueue(max_attempts=3, backoff=1.0, clock=clock)
+    queue.submit(BLOOM, bloom, "abc12")
+
+    assert await queue.flush() == 0
+    assert queue.retried == 1 and queue.depth == 1
+    # Ainda no backoff: não tenta de novo
+    assert await queue.flush() == 0
+    assert bloom.failures == 4
+
+    clock.now += 1.0
+    await queue.flush()
+    clock.now += 2.0
+    await queue.flush()
+    assert queue.dropped == 1
+    assert queue.depth == 0
+    assert bloom.items == []
+
+
+@pytest.mark.asyncio
+async def test_retry_succeeds_after_backoff():
+    """Teste: falha transitória é reaplicada no próximo flush após o backoff"""
+    clock = FakeClock()
+    bloom = FlakyBloom(failures=1)
+    queue = SideEffectQueue(backoff=0.5, clock=clock)
+    queue.submit(BLOOM, bloom, "abc12")
+    await queue.flush()
+
+    clock.now += 0.5
+    assert await queue.flush() == 1
+    assert bloom.items == ["abc12"]
+    assert queue.processed == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_and_stop_drains():
+    """Teste: fila cheia recusa (quem chamou roda inline) e o stop drena o resto"""
+    bloom = FlakyBloom(failures=0)
+    queue = SideEffectQueue(capacity=2)
+    assert queue.submit(BLOOM, bloom, "a")
+    assert queue.submit(BLOOM, bloom, "b")
+    assert not queue.submit(BLOOM, bloom, "c")
+    assert queue.rejected == 1
+
+    await queue.stop()
+    assert bloom.items == ["a", "b"]
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.core.keygen import generate_short_key
+from app.models.url import URL
+from app.services.single_flight import SingleFlight, should_refresh_early
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_load():
+    """Teste: chamadas simultâneas para a mesma chave executam uma carga só"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "https://python.org"
+
+    results = await asyncio.gather(*[flight.do("abc12", load) for _ in range(50)])
+
+    assert results == ["https://python.org"] * 50
+    assert calls == 1
+    assert flight.shared == 49
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    """Teste: a exceção chega a todos e a próxima chamada tenta de novo"""
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *[flight.do("abc12", boom) for _ in range(3)], return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return "https://python.org"
+
+    assert await flight.do("abc12", ok) == "https://python.org"
+
+
+@pytest.mark.asyncio
+async def test_shared_db_load_uses_its_own_session(test_url_service, db_session):
+    """Teste: a carga sob single-flight não usa a sessão de quem a disparou"""
+    key = generate_short_key(7)
+    db_session.add(URL(id=7, original_url="https://python.org", short_key=key))
+    await db_session.commit()
+    # A sessão da requisição já foi fechada (cliente desconectou, dependência encerrada)
+    await db_session.close()
+    test_url_service.repository.db = None
+
+    assert await test_url_service.get_original_url(key) == "https://python.org"
+
+
+def test_should_refresh_early_bounds():
+    """Teste: beta=0 desliga; TTL já vencido sempre renova"""
+    assert should_refresh_early(0.001, delta=0.005, beta=0) is False
+    assert should_refresh_early(0.0, delta=0.005, beta=1.0) is True
+    # Com uma hora restante e recomputação de 5ms, praticamente nunca renova
+    assert not any(should_refresh_early(3600, delta=0.005) for _ in range(1000))
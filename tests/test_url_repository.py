@@ -0,0 +1,29 @@
+import pytest
+
+from app.core.keygen import generate_short_key
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository
+
+
+@pytest.mark.asyncio
+async def test_lookup_decodes_key_to_primary_key(db_session):
+    """Teste: a busca por chave vai pela PK (id decodificado), não pela coluna short_key"""
+    key = generate_short_key(42)
+    db_session.add(URL(id=42, original_url="https://python.org", short_key=key, redirect_status=302))
+    await db_session.commit()
+    repo = URLRepository(db_session)
+
+    assert (await repo.get_by_key(key)).id == 42
+    assert await repo.get_many_by_keys([key, generate_short_key(43)]) == [(key, "https://python.org", 302)]
+
+
+@pytest.mark.asyncio
+async def test_non_canonical_key_skips_the_database(db_session):
+    """Teste: chave que o Sqids não geraria nem vira consulta"""
+    class NoQueries:
+        async def execute(self, *args, **kwargs):
+            raise AssertionError("consultou o banco")
+
+    repo = URLRepository(NoQueries())
+    assert await repo.get_by_key("aaaaa") is None
+    assert await repo.get_many_by_keys(["aaaaa", "bbbbb"]) == []
@@ -0,0 +1,78 @@
+import pytest
+import pytest_asyncio
+
+from app.core.keygen import generate_short_key
+from app.models.url import URL
+from app.services.cache_policy import CachePolicy
+from app.services.local_cache import LocalCache
+from app.services.warmup import CacheWarmer, top_keys_from_log
+from conftest import MockRedis, TestingSessionLocal
+
+# Chaves reais (id codificado): o banco é consultado pelo id decodificado
+KEYS = {i: generate_short_key(i) for i in range(1, 11)}
+MISSING = generate_short_key(999)
+
+
+@pytest_asyncio.fixture
+async def ranked_urls(db_session):
+    db_session.add_all([
+        URL(id=i, original_url=f"https://example.com/{i}", short_key=KEYS[i], clicks=i * 10)
+        for i in range(1, 11)
+    ])
+    await db_session.commit()
+
+
+def _warmer(redis, local_cache, **kwargs):
+    policy = CachePolicy(base_ttl=60, hot_ttl=86400, jitter=0)
+    return CacheWarmer(TestingSessionLocal, redis, policy, local_cache=local_cache, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_warm_up_from_click_ranking(ranked_urls):
+    """Teste: top-N por cliques vai para o Redis (TTL quente) e para o L1"""
+    redis = MockRedis()
+    local_cache = LocalCache(max_entries=2)
+    report = await _warmer(redis, local_cache, chunk_size=2).run("clicks", top_n=3)
+
+    assert report["keys"] == 3
+    assert report["seconds"] >= 0
+    assert set(redis.store) == {KEYS[10], KEYS[9], KEYS[8]}
+    assert redis.ttls[KEYS[10]] == 86400
+    # L1 pequeno guarda os mais quentes
+    assert KEYS[10] in local_cache and KEYS[9] in local_cache
+
+
+@pytest.mark.asyncio
+async def test_warm_up_from_access_log(ranked_urls, tmp_path):
+    """Teste: chaves do access log são contadas, resolvidas no banco e carregadas"""
+    log = tmp_path / "access.log"
+    log.write_text(
+        f'1.2.3.4 - - [18/Oct/2026] "GET /{KEYS[3]} HTTP/1.1" 301 0\n' * 3
+        + f'1.2.3.4 - - [18/Oct/2026] "GET /{KEYS[5]}?utm=x HTTP/1.1" 301 0\n' * 2
+        + f'1.2.3.4 - - [18/Oct/2026] "GET /{MISSING} HTTP/1.1" 404 0\n' * 5
+        + '1.2.3.4 - - [18/Oct/2026] "GET /sumiu HTTP/1.1" 404 0\n' * 9
+        + '1.2.3.4 - - [18/Oct/2026] "POST /urls HTTP/1.1" 201 0\n'
+        + f"{KEYS[7]}\n"
+    )
+    assert top_keys_from_log(str(log), 10) == [MISSING, KEYS[3], KEYS[5], KEYS[7]]
+
+    redis = MockRedis()
+    report = await _warmer(redis, None).run("log", top_n=10, access_log=str(log))
+    assert report["keys"] == 3  # MISSING não existe no banco ("sumiu" nem é chave)
+    assert redis.store[KEYS[3]] == "https://example.com/3"
+
+
+@pytest.mark.asyncio
+async def test_fleet_lock_guards_only_the_redis_writes(ranked_urls):
+    """Teste: com outro worker gravando, este ainda enche o L1; o lock some no fim da execução"""
+    redis = MockRedis()
+    await redis.set("warmup:lock", "outro-worker")
+    busy = LocalCache()
+    await _warmer(redis, busy, lock_key="warmup:lock").run("clicks", top_n=3)
+    assert KEYS[10] in busy and KEYS[8] in busy
+    assert KEYS[10] not in redis.store  # Redis fica com quem tem o lock
+
+    await redis.delete("warmup:lock")
+    await _warmer(redis, LocalCache(), lock_key="warmup:lock").run("clicks", top_n=3)
+    assert KEYS[10] in redis.store
+    assert "warmup:lock" not in redis.store  # Próximo deploy não espera o TTL